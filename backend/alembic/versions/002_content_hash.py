@@ -0,0 +1,29 @@
+"""add content hash for result caching
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('analyses', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.add_column('analyses', sa.Column('engine_version', sa.String(), nullable=True))
+    op.add_column('analyses', sa.Column('model_name', sa.String(), nullable=True))
+    op.create_index(op.f('ix_analyses_content_hash'), 'analyses', ['content_hash'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_analyses_content_hash'), table_name='analyses')
+    op.drop_column('analyses', 'model_name')
+    op.drop_column('analyses', 'engine_version')
+    op.drop_column('analyses', 'content_hash')
@@ -0,0 +1,33 @@
+"""record which layers were computed
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+LAYER_COLUMNS = ('digital_footprint', 'pixel_physics', 'lighting_geometry', 'semantic_analysis')
+
+
+def upgrade():
+    op.add_column('analyses', sa.Column('layers', sa.String(), nullable=True))
+    for column in LAYER_COLUMNS:
+        op.alter_column('analyses', column, existing_type=postgresql.JSON(astext_type=sa.Text()), nullable=True)
+
+
+def downgrade():
+    # Partial analyses cannot satisfy the NOT NULL constraint
+    op.execute("DELETE FROM analyses WHERE layers IS NOT NULL AND layers != "
+               "'digital_footprint,pixel_physics,lighting_geometry,semantic_analysis'")
+    for column in LAYER_COLUMNS:
+        op.alter_column('analyses', column, existing_type=postgresql.JSON(astext_type=sa.Text()), nullable=False)
+    op.drop_column('analyses', 'layers')
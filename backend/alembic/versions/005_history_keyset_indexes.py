@@ -0,0 +1,29 @@
+"""composite indexes for keyset-paginated history
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+# revision identifiers
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_analyses_created_at_id', 'analyses', ['created_at', 'id'], unique=False)
+    op.create_index('ix_analyses_verdict_created_at_id', 'analyses', ['verdict', 'created_at', 'id'], unique=False)
+    # Both single-column indexes from 001 are prefixes of the new ones
+    op.drop_index(op.f('ix_analyses_created_at'), table_name='analyses')
+    op.drop_index(op.f('ix_analyses_verdict'), table_name='analyses')
+
+
+def downgrade():
+    op.create_index(op.f('ix_analyses_verdict'), 'analyses', ['verdict'], unique=False)
+    op.create_index(op.f('ix_analyses_created_at'), 'analyses', ['created_at'], unique=False)
+    op.drop_index('ix_analyses_verdict_created_at_id', table_name='analyses')
+    op.drop_index('ix_analyses_created_at_id', table_name='analyses')
@@ -0,0 +1,35 @@
+"""add stored_files for content-addressed uploads
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'stored_files',
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('path', sa.String(), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('last_used_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('evicted_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('content_hash')
+    )
+    op.create_index(op.f('ix_stored_files_last_used_at'), 'stored_files', ['last_used_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_stored_files_last_used_at'), table_name='stored_files')
+    op.drop_table('stored_files')
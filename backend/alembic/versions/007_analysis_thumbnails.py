@@ -0,0 +1,25 @@
+"""record the thumbnails written for each analysis
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # NULL on older rows: they are served without thumbnails
+    op.add_column('analyses', sa.Column('thumbnails', postgresql.JSON(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade():
+    op.drop_column('analyses', 'thumbnails')
@@ -0,0 +1,277 @@
+from fastapi import APIRouter, Depends, Request, HTTPException
+from fastapi.responses import StreamingResponse
+from app.api.analyze import cache_result, cached_analysis, lookup_cached, run_pipeline, save_analyses, serialize_analysis, upload_store
+from app.db.database import AsyncSessionLocal
+from app.services.detector import ImageDetector
+from app.services.ingest import IngestedUpload, UploadRejected, ingest_parts, sniff_image_type
+from app.services.model_manager import get_detector
+from app.schemas.analysis import AnalysisResponse
+from app.core.config import settings
+from app.core.responses import dumps, validated
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import os
+import tarfile
+import time
+import zipfile
+
+router = APIRouter()
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif", ".tif", ".tiff"}
+
+# (filename, bytes) on success, (filename, error) when a member is rejected
+BatchItem = Tuple[str, Optional[bytes], Optional[str]]
+
+BATCH_REQUEST_SCHEMA = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "files": {
+                            "type": "array",
+                            "items": {"type": "string", "format": "binary"},
+                            "description": "Images, or a single ZIP/TAR archive of images"
+                        }
+                    },
+                    "required": ["files"]
+                }
+            }
+        }
+    }
+}
+
+def _is_image_name(name: str) -> bool:
+    base = os.path.basename(name)
+    if not base or base.startswith(".") or name.startswith("__MACOSX/"):
+        return False
+    return os.path.splitext(base)[1].lower() in IMAGE_EXTENSIONS
+
+# Leading bytes needed to tell a TAR ("ustar" at offset 257) from an image
+SNIFF_BYTES = 512
+
+def _sniff_part(head: bytes) -> Optional[str]:
+    """Image type, or "zip"/"tar" for a (optionally compressed) archive, from leading bytes"""
+    if head.startswith(b"PK\x03\x04"):
+        return "zip"
+    if head.startswith((b"\x1f\x8b", b"BZh", b"\xfd7zXZ")) or head[257:262] == b"ustar":
+        return "tar"
+    return sniff_image_type(head)
+
+def _checked(name: str, data: bytes) -> BatchItem:
+    # Archive members are sniffed like plain uploads, not trusted by extension
+    if sniff_image_type(data[:SNIFF_BYTES]) is None:
+        return name, None, "File must be an image"
+    return name, data, None
+
+async def _iter_zip(path: str) -> AsyncIterator[BatchItem]:
+    archive = await asyncio.to_thread(zipfile.ZipFile, path)
+    try:
+        for info in archive.infolist():
+            if info.is_dir() or not _is_image_name(info.filename):
+                continue
+            # Declared size check happens before anything is inflated
+            if info.file_size > settings.MAX_FILE_SIZE:
+                yield info.filename, None, "File too large"
+                continue
+            yield _checked(info.filename, await asyncio.to_thread(archive.read, info))
+    finally:
+        archive.close()
+
+async def _iter_tar(path: str) -> AsyncIterator[BatchItem]:
+    # Stream mode reads members sequentially without seeking or extracting
+    archive = await asyncio.to_thread(tarfile.open, path, mode="r|*")
+    try:
+        while True:
+            member = await asyncio.to_thread(archive.next)
+            if member is None:
+                break
+            if not member.isfile() or not _is_image_name(member.name):
+                continue
+            if member.size > settings.MAX_FILE_SIZE:
+                yield member.name, None, "File too large"
+                continue
+            data = await asyncio.to_thread(lambda: archive.extractfile(member).read())
+            yield _checked(member.name, data)
+    finally:
+        archive.close()
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+async def _iter_items(uploads: List[IngestedUpload]) -> AsyncIterator[BatchItem]:
+    """Yield images from plain uploads or from a single archive, one at a time"""
+    if len(uploads) == 1 and uploads[0].error is None:
+        if uploads[0].image_type == "zip":
+            async for item in _iter_zip(uploads[0].file_path):
+                yield item
+            return
+        if uploads[0].image_type == "tar":
+            async for item in _iter_tar(uploads[0].file_path):
+                yield item
+            return
+
+    for upload in uploads:
+        if upload.error is None and upload.image_type in ("zip", "tar"):
+            # Archives are only unpacked when they are the whole batch
+            yield upload.filename, None, "File must be an image"
+        elif upload.error is not None:
+            yield upload.filename, None, upload.error
+        else:
+            yield upload.filename, await asyncio.to_thread(_read, upload.file_path), None
+
+def _line(payload: Dict) -> bytes:
+    return dumps(payload) + b"\n"
+
+async def _stream_results(
+    uploads: List[IngestedUpload],
+    model: str,
+    detector: ImageDetector
+) -> AsyncIterator[bytes]:
+    """Analyze items with bounded concurrency and emit one NDJSON line per image"""
+
+    start_time = time.time()
+    # Only the consumer commits through this session; lookups get their own,
+    # since an AsyncSession cannot be shared by concurrent tasks
+    db = AsyncSessionLocal()
+    lines: asyncio.Queue = asyncio.Queue()
+    slots = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+    # Rows and their responses waiting for the next batched commit
+    pending: List[Tuple] = []
+    counts = {"total": 0, "succeeded": 0, "failed": 0, "cached": 0}
+    # Analyses started and not yet finished, so a disconnect can cancel them
+    tasks = set()
+
+    async def analyze_item(index: int, filename: str, data: bytes):
+        try:
+            content_hash = hashlib.sha256(data).hexdigest()
+            async with AsyncSessionLocal() as lookup_db:
+                cached = await lookup_cached(lookup_db, content_hash, model)
+            if cached is not None:
+                # A row of its own, committed with the next batch
+                analysis = cached_analysis(cached, os.path.basename(filename), model, content_hash, time.time())
+                response = serialize_analysis(analysis)
+                pending.append((analysis, content_hash, response))
+                result = validated(response, AnalysisResponse)
+                await lines.put({"index": index, "filename": filename, "status": "ok", "cached": True, "result": result})
+                return
+
+            analysis = await run_pipeline(
+                data, os.path.basename(filename), model, content_hash, time.time(), detector
+            )
+            response = serialize_analysis(analysis)
+            pending.append((analysis, content_hash, response))
+            result = validated(response, AnalysisResponse)
+            await lines.put({"index": index, "filename": filename, "status": "ok", "cached": False, "result": result})
+        except Exception as e:
+            await lines.put({"index": index, "filename": filename, "status": "error", "error": f"Analysis failed: {str(e)}"})
+        finally:
+            slots.release()
+
+    async def produce():
+        index = 0
+        try:
+            async for filename, data, error in _iter_items(uploads):
+                if index >= settings.BATCH_MAX_ITEMS:
+                    await lines.put({"index": index, "filename": filename, "status": "error", "error": "Batch item limit reached"})
+                    break
+                if error is not None:
+                    await lines.put({"index": index, "filename": filename, "status": "error", "error": error})
+                else:
+                    # Bound in-flight analyses; at most one more member is buffered
+                    await slots.acquire()
+                    task = asyncio.create_task(analyze_item(index, filename, data))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                index += 1
+        except (zipfile.BadZipFile, tarfile.TarError) as e:
+            await lines.put({"index": index, "filename": None, "status": "error", "error": f"Invalid archive: {str(e)}"})
+        finally:
+            await asyncio.gather(*list(tasks), return_exceptions=True)
+            await lines.put(None)
+
+    async def commit_pending() -> Tuple[List[Tuple], Optional[Dict]]:
+        """Insert all pending rows in one transaction"""
+        if not pending:
+            return [], None
+        batch = list(pending)
+        pending.clear()
+        try:
+            await save_analyses(db, [analysis for analysis, _, _ in batch])
+        except Exception as e:
+            await db.rollback()
+            return [], {
+                "status": "error",
+                "error": f"Failed to save results: {str(e)}",
+                "ids": [analysis.id for analysis, _, _ in batch]
+            }
+        return batch, None
+
+    async def flush() -> Optional[Dict]:
+        saved, error = await commit_pending()
+        for _, content_hash, response in saved:
+            await cache_result(content_hash, model, response)
+        return error
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            line = await lines.get()
+            if line is None:
+                break
+
+            counts["total"] += 1
+            counts["succeeded" if line["status"] == "ok" else "failed"] += 1
+            counts["cached"] += 1 if line.get("cached") else 0
+            yield _line(line)
+
+            if len(pending) >= settings.BATCH_COMMIT_SIZE:
+                error = await flush()
+                if error:
+                    yield _line(error)
+
+        error = await flush()
+        if error:
+            yield _line(error)
+
+        yield _line({"done": True, **counts, "processing_time": time.time() - start_time})
+    finally:
+        # On a client disconnect, stop the analyses still running so none of
+        # them adds a row after the final commit
+        producer.cancel()
+        for task in list(tasks):
+            task.cancel()
+        await asyncio.gather(producer, *list(tasks), return_exceptions=True)
+        # Keep whatever finished before a client disconnect
+        await commit_pending()
+        await db.close()
+        for upload in uploads:
+            if os.path.exists(upload.file_path):
+                os.remove(upload.file_path)
+
+@router.post("/analyze/batch", openapi_extra=BATCH_REQUEST_SCHEMA)
+async def analyze_batch(
+    request: Request,
+    model: str = "ensemble",
+    detector: ImageDetector = Depends(get_detector)
+):
+    """Analyze many images (or one ZIP/TAR archive) and stream NDJSON results as they finish"""
+
+    # Each part is streamed to its own temp file, sniffed and size-capped as
+    # it arrives; they are removed once the results have been streamed
+    try:
+        uploads = await ingest_parts(
+            request, "files", upload_store.tmp_dir, settings.MAX_FILE_SIZE, settings.BATCH_MAX_ITEMS,
+            sniff=_sniff_part, sniff_bytes=SNIFF_BYTES,
+            max_sizes={"zip": settings.BATCH_MAX_ARCHIVE_SIZE, "tar": settings.BATCH_MAX_ARCHIVE_SIZE}
+        )
+    except UploadRejected as e:
+        raise HTTPException(e.status_code, e.detail)
+    if not uploads:
+        raise HTTPException(400, "No files uploaded")
+
+    return StreamingResponse(_stream_results(uploads, model, detector), media_type="application/x-ndjson")
@@ -1,34 +1,94 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.database import get_db
-from app.db.models import Analysis
+from app.db.models import Analysis, StoredFile
 from app.schemas.analysis import HistoryItem
-from typing import List
+from app.core.responses import json_response
+from datetime import datetime
+from typing import List, Optional, Tuple
+import base64
+import binascii
 
 router = APIRouter()
 
+# Only the listed columns; the layer and metadata JSON stays in the database
+HISTORY_COLUMNS = (
+    Analysis.id,
+    Analysis.filename,
+    Analysis.verdict,
+    Analysis.confidence,
+    Analysis.overall_score,
+    Analysis.created_at,
+    Analysis.thumbnail_url,
+    # Evicted uploads: no preview to link to
+    StoredFile.evicted_at.is_not(None).label("image_evicted")
+)
+
+def encode_cursor(created_at: datetime, analysis_id: str) -> str:
+    """Opaque cursor for the position after this row"""
+    raw = f"{created_at.isoformat()}|{analysis_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, analysis_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), analysis_id
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor")
+
 @router.get("/history", response_model=List[HistoryItem])
 async def get_history(
-    limit: int = 20,
-    db: Session = Depends(get_db)
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    verdict: Optional[str] = None,
+    min_score: Optional[float] = None,
+    max_score: Optional[float] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get analysis history"""
+    """Get analysis history, newest first
+    
+    Keyset-paginated on (created_at, id): pass the X-Next-Cursor header of
+    one page as ?cursor= to get the next, so deep pages cost the same as the
+    first. Filters: verdict, overall score range and created_at range.
+    """
+    
+    query = select(*HISTORY_COLUMNS).outerjoin(StoredFile, StoredFile.content_hash == Analysis.content_hash)
+    if cursor is not None:
+        try:
+            position = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        query = query.where(tuple_(Analysis.created_at, Analysis.id) < position)
+    if verdict is not None:
+        query = query.where(Analysis.verdict == verdict)
+    if min_score is not None:
+        query = query.where(Analysis.overall_score >= min_score)
+    if max_score is not None:
+        query = query.where(Analysis.overall_score <= max_score)
+    if since is not None:
+        query = query.where(Analysis.created_at >= since)
+    if until is not None:
+        query = query.where(Analysis.created_at < until)
+    
+    # One extra row tells whether there is a next page
+    rows = (await db.execute(
+        query
+        .order_by(Analysis.created_at.desc(), Analysis.id.desc())
+        .limit(limit + 1)
+    )).all()
     
-    analyses = (
-        db.query(Analysis)
-        .order_by(Analysis.created_at.desc())
-        .limit(limit)
-        .all()
-    )
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(rows[-1].created_at, rows[-1].id)
     
-    return [
-        {
-            "id": a.id,
-            "filename": a.filename,
-            "verdict": a.verdict,
-            "confidence": a.confidence,
-            "created_at": a.created_at,
-            "thumbnail_url": a.thumbnail_url
-        }
-        for a in analyses
-    ]
+    items = [dict(row._mapping) for row in rows]
+    for item in items:
+        item["image_evicted"] = bool(item["image_evicted"])
+        if item["image_evicted"]:
+            item["thumbnail_url"] = None
+    return json_response(items, List[HistoryItem], headers=headers)
@@ -0,0 +1,140 @@
+from fastapi import APIRouter, Request, Response, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.analyze import ANALYZE_REQUEST_SCHEMA, cache_result, cached_analysis, lookup_cached, run_pipeline, save_analyses, serialize_analysis, upload_store
+from app.db.database import get_db
+from app.db.models import Analysis, Job
+from app.schemas.analysis import JobResponse
+from app.services.ingest import UploadRejected, ingest_upload
+from app.services.jobs import JobQueue
+from app.services.layers import InvalidLayers, layers_key, resolve_layers
+from app.services.model_manager import get_detector
+from app.services.progress import progress_hub
+from app.core.config import settings
+from datetime import datetime, timezone
+import aiofiles
+import time
+import os
+
+router = APIRouter()
+
+# Uploads wait here until their job finishes
+JOB_UPLOAD_DIR = os.path.join(settings.UPLOAD_DIR, "jobs")
+
+async def analyze_job(db: AsyncSession, job: Job) -> str:
+    """Job handler: the /api/analyze pipeline for a persisted upload"""
+    
+    layers = tuple(job.layers.split(","))
+    cached = await lookup_cached(db, job.content_hash, job.model_name, layers)
+    if cached is not None:
+        analysis = cached_analysis(cached, job.filename, job.model_name, job.content_hash, time.time())
+        try:
+            await save_analyses(db, [analysis])
+        except Exception:
+            await db.rollback()
+            raise
+        return analysis.id
+    
+    async with aiofiles.open(job.file_path, "rb") as f:
+        data = await f.read()
+    
+    # Live layer results for WebSocket subscribers in this process
+    async def publish(name: str, result: dict):
+        progress_hub.publish(job.id, {"layer": name, "result": result})
+    
+    # The pipeline stores its own copy, so the job upload survives a failed attempt
+    analysis = await run_pipeline(
+        data, job.filename, job.model_name, job.content_hash, time.time(), get_detector(),
+        layers=layers, on_layer=publish
+    )
+    try:
+        await save_analyses(db, [analysis])
+    except Exception:
+        await db.rollback()
+        raise
+    
+    await cache_result(job.content_hash, job.model_name, serialize_analysis(analysis), layers)
+    return analysis.id
+
+job_queue = JobQueue(
+    analyze_job,
+    broker=settings.JOB_QUEUE,
+    workers=settings.JOB_WORKERS,
+    visibility_timeout=settings.JOB_VISIBILITY_TIMEOUT,
+    max_attempts=settings.JOB_MAX_ATTEMPTS,
+    poll_interval=settings.JOB_POLL_INTERVAL
+)
+
+async def serialize_job(job: Job, db: AsyncSession) -> dict:
+    """Build the API response for a job, with its result once it has one"""
+    result = None
+    if job.status == "succeeded" and job.analysis_id:
+        analysis = await db.get(Analysis, job.analysis_id)
+        if analysis is not None:
+            result = serialize_analysis(analysis, await upload_store.is_evicted(db, analysis.content_hash))
+    return {
+        "id": job.id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+        "result": result
+    }
+
+@router.post("/jobs", response_model=JobResponse, status_code=202, openapi_extra=ANALYZE_REQUEST_SCHEMA)
+async def create_job(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    model: str = "ensemble",
+    layers: str = "full"
+):
+    """Queue an image for analysis and return immediately
+    
+    Takes the same upload and parameters as /api/analyze. Poll the URL in the
+    Location header for status and, once succeeded, the result.
+    """
+    
+    try:
+        selected = resolve_layers(layers)
+    except InvalidLayers as e:
+        raise HTTPException(400, str(e))
+    
+    try:
+        upload = await ingest_upload(request, "image", JOB_UPLOAD_DIR, settings.MAX_FILE_SIZE)
+    except UploadRejected as e:
+        raise HTTPException(e.status_code, e.detail)
+    
+    job = Job(
+        id=upload.file_id,
+        status="queued",
+        filename=upload.filename,
+        file_path=upload.file_path,
+        content_hash=upload.sha256,
+        model_name=model,
+        layers=layers_key(selected),
+        attempts=0,
+        created_at=datetime.now(timezone.utc)
+    )
+    try:
+        db.add(job)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        os.remove(upload.file_path)
+        raise HTTPException(500, f"Failed to queue analysis: {str(e)}")
+    
+    job_queue.enqueue(job.id)
+    response.headers["Location"] = f"/api/jobs/{job.id}"
+    return await serialize_job(job, db)
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, db: AsyncSession = Depends(get_db)):
+    """Get job status, and the analysis result once it has succeeded"""
+    
+    job = await db.get(Job, job_id)
+    
+    if not job:
+        raise HTTPException(404, "Job not found")
+    
+    return await serialize_job(job, db)
@@ -1,15 +1,24 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from app.services.detector import ImageDetector
+from app.services.model_manager import get_detector
+from app.core.config import settings
 
 router = APIRouter()
 
 @router.get("/models")
-async def get_models():
-    """Get available AI models"""
+async def get_models(detector: ImageDetector = Depends(get_detector)):
+    """Get configured AI models (cascade order) plus the ensemble"""
     
-    return [
-        "efficientnet-b7",
-        "xception",
-        "resnet50",
-        "huggingface/umm-maybe/AI-image-detector",
-        "ensemble"
-    ]
+    return [*detector.model_specs, "ensemble"]
+
+@router.get("/models/batching")
+async def get_batching_stats(detector: ImageDetector = Depends(get_detector)):
+    """Get inference batching configuration and queue metrics"""
+    
+    return {
+        "max_batch_size": settings.INFERENCE_BATCH_SIZE,
+        "max_wait_ms": settings.INFERENCE_BATCH_WAIT_MS,
+        "max_queue_size": settings.INFERENCE_QUEUE_SIZE,
+        "models": detector.batching_stats(),
+        "inference_pool": detector.pool_stats()
+    }
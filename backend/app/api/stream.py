@@ -0,0 +1,229 @@
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
+from app.api.analyze import cache_result, cached_analysis, lookup_cached, run_pipeline, save_analyses, serialize_analysis
+from app.api.jobs import serialize_job
+from app.db.database import AsyncSessionLocal
+from app.db.models import Job
+from app.schemas.analysis import AnalysisResponse, LayerResult
+from app.services.detector import ImageDetector
+from app.services.ingest import sniff_image_type
+from app.services.layers import InvalidLayers, resolve_layers
+from app.services.model_manager import get_detector
+from app.services.progress import progress_hub
+from app.services.resolution import ImageTooLarge
+from app.core.config import settings
+from typing import Awaitable, Callable, Dict, Tuple
+import asyncio
+import base64
+import binascii
+import functools
+import hashlib
+import json
+import os
+import time
+
+router = APIRouter()
+
+Send = Callable[[Dict], Awaitable[None]]
+
+def _layer_message(stream_id: str, name: str, result: Dict) -> Dict:
+    return {
+        "type": "layer",
+        "id": stream_id,
+        "layer": name,
+        "result": LayerResult.model_validate(result).model_dump(mode="json")
+    }
+
+def _result_message(stream_id: str, response: Dict, cached: bool) -> Dict:
+    return {
+        "type": "result",
+        "id": stream_id,
+        "cached": cached,
+        "result": AnalysisResponse.model_validate(response).model_dump(mode="json")
+    }
+
+async def stream_analysis(
+    stream_id: str,
+    data: bytes,
+    filename: str,
+    model: str,
+    layers: Tuple[str, ...],
+    detector: ImageDetector,
+    send: Send
+):
+    """Analyze one upload, sending each layer as it completes and then the verdict"""
+
+    try:
+        async with AsyncSessionLocal() as db:
+            content_hash = hashlib.sha256(data).hexdigest()
+            cached = await lookup_cached(db, content_hash, model, layers)
+            if cached is not None:
+                analysis = cached_analysis(cached, os.path.basename(filename), model, content_hash, time.time())
+                try:
+                    await save_analyses(db, [analysis])
+                except Exception:
+                    await db.rollback()
+                    raise
+                for name, result in cached["layers"].items():
+                    await send(_layer_message(stream_id, name, result))
+                await send(_result_message(stream_id, serialize_analysis(analysis), cached=True))
+                return
+
+            async def on_layer(name: str, result: Dict):
+                await send(_layer_message(stream_id, name, result))
+
+            analysis = await run_pipeline(
+                data, os.path.basename(filename), model, content_hash, time.time(), detector,
+                layers=layers, on_layer=on_layer
+            )
+            try:
+                await save_analyses(db, [analysis])
+            except Exception:
+                await db.rollback()
+                raise
+
+            response = serialize_analysis(analysis)
+            await cache_result(content_hash, model, response, layers)
+            await send(_result_message(stream_id, response, cached=False))
+    except ImageTooLarge as e:
+        await send({"type": "error", "id": stream_id, "status": 413, "error": str(e)})
+    except Exception as e:
+        await send({"type": "error", "id": stream_id, "status": 500, "error": f"Analysis failed: {str(e)}"})
+
+async def stream_job(stream_id: str, job_id: str, send: Send):
+    """Follow a queued job: status changes, live layers (when run in this process), then the result"""
+
+    events = progress_hub.subscribe(job_id)
+    sent_layers = set()
+    status = None
+    try:
+        while True:
+            async with AsyncSessionLocal() as db:
+                job = await db.get(Job, job_id)
+                if job is None:
+                    await send({"type": "error", "id": stream_id, "status": 404, "error": "Job not found"})
+                    return
+                if job.status != status:
+                    status = job.status
+                    await send({"type": "status", "id": stream_id, "status": status, "attempts": job.attempts})
+                if status in ("succeeded", "failed"):
+                    payload = await serialize_job(job, db)
+                    break
+
+            # Forward live layers until the next status check is due
+            try:
+                event = await asyncio.wait_for(events.get(), settings.JOB_POLL_INTERVAL)
+                sent_layers.add(event["layer"])
+                await send(_layer_message(stream_id, event["layer"], event["result"]))
+            except asyncio.TimeoutError:
+                pass
+
+        if status == "failed" or payload["result"] is None:
+            await send({"type": "error", "id": stream_id, "status": 500, "error": payload["error"] or "Result missing"})
+            return
+        # Layers this process did not see (job ran elsewhere, or a retry)
+        for name, result in payload["result"]["layers"].items():
+            if name not in sent_layers:
+                await send(_layer_message(stream_id, name, result))
+        await send(_result_message(stream_id, payload["result"], cached=False))
+    finally:
+        progress_hub.unsubscribe(job_id, events)
+
+@router.websocket("/ws/analyze")
+async def analysis_stream(websocket: WebSocket, detector: ImageDetector = Depends(get_detector)):
+    """Stream layer results as they complete, for many analyses over one connection
+
+    Client messages (JSON), each with a client-chosen "id" echoed on every reply:
+      {"type": "analyze", "id", "image": <base64>, "filename", "model", "layers"}
+      {"type": "job", "id", "job_id"}   follow a job from POST /api/jobs
+      {"type": "cancel", "id"}
+    Server messages: "layer" (one LayerResult), "result" (the AnalysisResponse),
+    "status" (job state changes) and "error".
+    """
+
+    await websocket.accept()
+
+    outgoing: asyncio.Queue = asyncio.Queue()
+    tasks: Dict[str, asyncio.Task] = {}
+    slots = asyncio.Semaphore(settings.STREAM_MAX_ANALYSES)
+
+    async def send(message: Dict):
+        await outgoing.put(message)
+
+    async def writer():
+        # Single writer so concurrent analyses never interleave sends
+        while True:
+            await websocket.send_json(await outgoing.get())
+
+    async def run(stream_id: str, work: Callable[[], Awaitable[None]]):
+        # The slot is taken here, not in the read loop, so cancels are still
+        # read while every slot is busy
+        try:
+            async with slots:
+                await work()
+        finally:
+            tasks.pop(stream_id, None)
+
+    def parse_analyze(message: Dict):
+        try:
+            data = base64.b64decode(message.get("image") or "", validate=True)
+        except (binascii.Error, TypeError):
+            return None, "image must be base64"
+        if len(data) > settings.MAX_FILE_SIZE:
+            return None, "File too large"
+        if sniff_image_type(data[:16]) is None:
+            return None, "File must be an image"
+        try:
+            layers = resolve_layers(message.get("layers") or "full")
+        except InvalidLayers as e:
+            return None, str(e)
+        return functools.partial(
+            stream_analysis,
+            message["id"], data, message.get("filename") or "image",
+            message.get("model") or "ensemble", layers, detector, send
+        ), None
+
+    writer_task = asyncio.create_task(writer())
+    try:
+        while True:
+            # A malformed frame is rejected on its own, not fatal to the connection
+            try:
+                message = json.loads(await websocket.receive_text())
+            except (ValueError, KeyError):  # KeyError: binary frame
+                message = None
+            if not isinstance(message, dict):
+                await send({"type": "error", "id": "", "status": 400, "error": "Message must be a JSON object"})
+                continue
+            stream_id = str(message.get("id") or "")
+            kind = message.get("type")
+
+            if kind == "cancel":
+                if stream_id in tasks:
+                    tasks[stream_id].cancel()
+                continue
+            if not stream_id or stream_id in tasks:
+                await send({"type": "error", "id": stream_id, "status": 400, "error": "Missing or duplicate id"})
+                continue
+            if len(tasks) >= settings.STREAM_MAX_ANALYSES + settings.STREAM_MAX_QUEUED:
+                await send({"type": "error", "id": stream_id, "status": 429, "error": "Too many analyses in flight"})
+                continue
+            message["id"] = stream_id
+
+            if kind == "analyze":
+                work, error = parse_analyze(message)
+            elif kind == "job" and message.get("job_id"):
+                work, error = functools.partial(stream_job, stream_id, str(message["job_id"]), send), None
+            else:
+                work, error = None, f"Unknown message type '{kind}'"
+            if error is not None:
+                await send({"type": "error", "id": stream_id, "status": 400, "error": error})
+                continue
+
+            # At most STREAM_MAX_ANALYSES run at once; the rest wait in run()
+            tasks[stream_id] = asyncio.create_task(run(stream_id, work))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in list(tasks.values()):
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        writer_task.cancel()
@@ -0,0 +1,60 @@
+"""
+Celery worker for JOB_QUEUE=celery
+
+Messages carry only job ids. They are acknowledged after the job finishes,
+so a worker crash redelivers the message once Redis' visibility timeout
+passes. The job row's lease keeps a redelivered job from running twice.
+
+Usage (from backend/):
+    celery -A app.celery_worker worker --concurrency 1
+"""
+import asyncio
+
+from celery import Celery
+from celery.signals import worker_process_init
+
+from app.api import analyze
+from app.api.jobs import job_queue
+from app.core.config import settings
+from app.services.model_manager import model_manager
+
+celery_app = Celery("truthlens", broker=settings.REDIS_URL)
+celery_app.conf.update(
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    broker_transport_options={"visibility_timeout": settings.JOB_VISIBILITY_TIMEOUT}
+)
+
+# One loop per worker process: the batchers and executor are bound to it.
+# Created in the child, never in the parent that forks the prefork pool.
+loop = None
+
+
+def _event_loop() -> asyncio.AbstractEventLoop:
+    global loop
+    if loop is None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+    return loop
+
+
+@worker_process_init.connect
+def load_models(**kwargs):
+    _event_loop()
+    analyze.executor.start()
+    loop.run_until_complete(model_manager.load_models())
+
+
+@celery_app.task(bind=True, max_retries=settings.JOB_MAX_ATTEMPTS)
+def analyze_job(self, job_id: str):
+    status = _event_loop().run_until_complete(job_queue.run_job(job_id))
+    if status == "queued":
+        # Failed attempt with attempts left
+        raise self.retry(countdown=min(2 ** self.request.retries, 60))
+    if status == "running":
+        # Leased by another worker; check back once that lease could have
+        # expired. Not a failed attempt, so re-send it instead of retry(),
+        # which would count against max_retries
+        self.apply_async(args=(job_id,), countdown=settings.JOB_VISIBILITY_TIMEOUT)
+    return status
@@ -0,0 +1,114 @@
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, REGISTRY
+
+# Buckets from sub-millisecond DB queries up to multi-second model inference
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_SECONDS = Histogram(
+    "truthlens_stage_seconds",
+    "Time spent in each analysis pipeline stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+LAYER_SECONDS = Histogram(
+    "truthlens_layer_seconds",
+    "Time spent in each forensic layer (measured inside the executor worker)",
+    ["layer"],
+    buckets=LATENCY_BUCKETS
+)
+DB_QUERY_SECONDS = Histogram(
+    "truthlens_db_query_seconds",
+    "Database statement execution time",
+    ["operation"],
+    buckets=LATENCY_BUCKETS
+)
+VERDICTS = Counter(
+    "truthlens_verdicts_total",
+    "Analyses completed, by verdict",
+    ["verdict"]
+)
+DETECTOR_FALLBACKS = Counter(
+    "truthlens_detector_fallbacks_total",
+    "Detections answered by the heuristic fallback instead of a model",
+    ["reason"]
+)
+MODEL_RUNS = Counter(
+    "truthlens_model_runs_total",
+    "Per-image model evaluations in the ensemble cascade",
+    ["model"]
+)
+THUMBNAIL_FAILURES = Counter(
+    "truthlens_thumbnail_failures_total",
+    "Analyses stored without thumbnails because writing them failed"
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "truthlens_requests_in_flight",
+    "HTTP requests currently being handled"
+)
+
+
+class StageTimer:
+    """Per-request stage timings, recorded to STAGE_SECONDS as they finish"""
+
+    def __init__(self, timings: Optional[Dict[str, float]] = None):
+        self.timings = timings if timings is not None else {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+        STAGE_SECONDS.labels(stage=name).observe(seconds)
+
+
+class StatsCollector:
+    """Expose a component's stats() dict as Prometheus metrics at scrape time
+
+    Keys listed in `counters` become counters, every other numeric value
+    becomes a gauge. `labels` names the label values of one stats dict when
+    the source returns a list of them (e.g. one per model).
+    """
+
+    def __init__(
+        self,
+        prefix: str,
+        source: Callable,
+        counters: tuple = (),
+        labels: tuple = ()
+    ):
+        self.prefix = prefix
+        self.source = source
+        self.counters = set(counters)
+        self.labels = labels
+
+    def collect(self):
+        stats = self.source()
+        rows = stats if isinstance(stats, list) else [stats]
+        families = {}
+
+        for row in rows:
+            label_values = [str(row.get(label, "")) for label in self.labels]
+            for key, value in row.items():
+                if key in self.labels or isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                if key not in families:
+                    name = f"{self.prefix}_{key}"
+                    family = CounterMetricFamily if key in self.counters else GaugeMetricFamily
+                    families[key] = family(name, f"{self.prefix} {key}", labels=list(self.labels))
+                families[key].add_metric(label_values, value)
+
+        return list(families.values())
+
+
+def register_stats(prefix: str, source: Callable, counters: tuple = (), labels: tuple = ()):
+    """Register a stats() source with the default registry"""
+    REGISTRY.register(StatsCollector(prefix, source, counters, labels))
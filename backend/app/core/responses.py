@@ -0,0 +1,104 @@
+import math
+from functools import lru_cache
+from typing import Any, Optional
+
+import numpy as np
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+# Relative, so the standalone mock server (backend.app.mock_main) can import this
+from .config import settings
+
+# datetimes as ...Z like pydantic; int dict keys (e.g. per-size maps) allowed
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def _default(value: Any) -> Any:
+    """Types orjson leaves to us: numpy scalars and arrays, sets
+
+    Non-finite numpy floats become 0.0, as the analyzers' _to_python did
+    (Python floats never get here; see dumps).
+    """
+    if isinstance(value, np.floating):
+        value = float(value)
+        return value if math.isfinite(value) else 0.0
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind == "f":
+            value = np.nan_to_num(value, nan=0.0, posinf=0.0, neginf=0.0)
+        return value.tolist()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def _has_non_finite(content: Any) -> bool:
+    """Whether any Python float in content is NaN or infinite"""
+    stack = [content]
+    while stack:
+        value = stack.pop()
+        kind = type(value)
+        if kind is dict:
+            stack.extend(value.values())
+        elif kind is list or kind is tuple:
+            stack.extend(value)
+        elif isinstance(value, float) and not math.isfinite(value):
+            return True
+    return False
+
+
+def _finite(value: Any) -> Any:
+    """Copy of content with non-finite Python floats replaced by 0.0"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else 0.0
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    return value
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize API content with orjson, numpy-aware, NaN/Inf as 0.0"""
+    body = orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+    # orjson writes NaN/Infinity as null, so only a body with a null can hold
+    # one; the content is checked, and rewritten, only then
+    if b"null" in body and _has_non_finite(content):
+        body = orjson.dumps(_finite(content), default=_default, option=ORJSON_OPTIONS)
+    return body
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered by orjson instead of the stdlib encoder"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+@lru_cache(maxsize=None)
+def _adapter(model) -> TypeAdapter:
+    return TypeAdapter(model)
+
+
+def validated(content: Any, model: Any) -> Any:
+    """Content checked against model, unless VALIDATE_RESPONSES is off
+
+    Turning it off sends trusted internal data straight to the serializer.
+    """
+    if not settings.VALIDATE_RESPONSES:
+        return content
+    adapter = _adapter(model)
+    return adapter.dump_python(adapter.validate_python(content))
+
+
+def json_response(content: Any, model: Optional[Any] = None, **kwargs) -> FastJSONResponse:
+    """Return route content without FastAPI's jsonable_encoder pass
+
+    Returning a Response skips FastAPI's response_model handling (the model
+    still documents the route), so validation against model happens here.
+    """
+    return FastJSONResponse(validated(content, model) if model is not None else content, **kwargs)
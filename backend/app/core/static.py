@@ -0,0 +1,42 @@
+import os
+import re
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """StaticFiles for files whose name never points at different content
+
+    Uploads are stored under unique ids and thumbnails under their content
+    hash, so responses can be cached for max_age with `immutable`, and the
+    name itself serves as the ETag (stable across hosts, unlike the default
+    mtime/size tag). With `pattern`, only relative paths that fully match
+    it are served, so files still being written or deleted never get
+    cached forever; everything else is a 404.
+    """
+
+    def __init__(self, *args, max_age: int = 31536000, pattern: Optional[re.Pattern] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_age = max_age
+        self.pattern = pattern
+
+    async def get_response(self, path: str, scope) -> Response:
+        if self.pattern is not None and not self.pattern.fullmatch(path.replace(os.sep, "/")):
+            raise HTTPException(status_code=404)
+        return await super().get_response(path, scope)
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        etag = f'"{os.path.splitext(os.path.basename(full_path))[0]}"'
+        response = FileResponse(
+            full_path,
+            status_code=status_code,
+            stat_result=stat_result,
+            headers={"Cache-Control": f"public, max-age={self.max_age}, immutable", "ETag": etag}
+        )
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
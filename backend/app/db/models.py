@@ -1,31 +1,86 @@
-from sqlalchemy import Column, String, Float, Integer, DateTime, JSON, Text
+from sqlalchemy import Column, String, Float, Integer, BigInteger, DateTime, JSON, Text, Index
 from sqlalchemy.sql import func
 from app.db.database import Base
 import uuid
 
 class Analysis(Base):
     __tablename__ = "analyses"
+    __table_args__ = (
+        # Keyset pagination for /api/history, unfiltered and by verdict
+        Index("ix_analyses_created_at_id", "created_at", "id"),
+        Index("ix_analyses_verdict_created_at_id", "verdict", "created_at", "id"),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     filename = Column(String, nullable=False)
     file_path = Column(String, nullable=False)
     thumbnail_url = Column(String, nullable=True)
+    # Thumbnails actually written: size (longest edge, px) -> URL
+    thumbnails = Column(JSON, nullable=True)
+    
+    # Cache identity: SHA-256 of the upload bytes plus what produced the result
+    content_hash = Column(String(64), nullable=True, index=True)
+    engine_version = Column(String, nullable=True)
+    model_name = Column(String, nullable=True)
+    # Comma-separated layers that were computed (NULL on rows from before layers=)
+    layers = Column(String, nullable=True)
     
     # Results
     verdict = Column(String, nullable=False)  # real, suspicious, edited, fake
     confidence = Column(Float, nullable=False)
     overall_score = Column(Float, nullable=False)
     
-    # Layers (stored as JSON)
-    digital_footprint = Column(JSON, nullable=False)
-    pixel_physics = Column(JSON, nullable=False)
-    lighting_geometry = Column(JSON, nullable=False)
-    semantic_analysis = Column(JSON, nullable=False)
+    # Layers (stored as JSON; NULL when not requested)
+    digital_footprint = Column(JSON, nullable=True)
+    pixel_physics = Column(JSON, nullable=True)
+    lighting_geometry = Column(JSON, nullable=True)
+    semantic_analysis = Column(JSON, nullable=True)
     
-    # Metadata
-    metadata = Column(JSON, nullable=False)
+    # Metadata ("metadata" is reserved on declarative classes)
+    metadata_ = Column("metadata", JSON, nullable=False)
     processing_time = Column(Float, nullable=False)
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class Job(Base):
+    __tablename__ = "jobs"
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    status = Column(String, nullable=False, default="queued", index=True)  # queued, running, succeeded, failed
+    
+    # What to analyze: the persisted upload and the /api/analyze parameters
+    filename = Column(String, nullable=False)
+    file_path = Column(String, nullable=False)
+    content_hash = Column(String(64), nullable=False)
+    model_name = Column(String, nullable=False)
+    layers = Column(String, nullable=False)
+    
+    # Delivery: attempts so far and the lease held by the worker running it
+    attempts = Column(Integer, nullable=False, default=0)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    error = Column(Text, nullable=True)
+    analysis_id = Column(String, nullable=True)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class StoredFile(Base):
+    __tablename__ = "stored_files"
+    
+    # One row per distinct upload, stored at a path derived from its hash
+    content_hash = Column(String(64), primary_key=True)
+    path = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    
+    # Analysis rows pointing at this file; unreferenced files are swept first
+    ref_count = Column(Integer, nullable=False, default=0)
+    
+    # Retention: last upload or reference, and when the file was evicted
+    last_used_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    evicted_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,120 @@
+"""
+Offline export of detector inference artifacts
+
+Builds, for every model in DETECTOR_MODELS, the fp32 reference weights
+(<name>.pth) and the TorchScript, static INT8 TorchScript, ONNX and
+static INT8 ONNX artifacts derived from them, then checks each backend's P(AI) drift against eager
+fp32 on the calibration set.
+
+Usage (from backend/):
+    python -m app.export_models [--backends torchscript int8 onnx onnx_int8]
+        [--calibration DIR] [--output DIR] [--fresh] [--check-only]
+"""
+import argparse
+import glob
+import os
+import sys
+from typing import List
+
+import numpy as np
+import torch
+from PIL import Image
+
+from app.core.config import settings
+from app.services.detector import ImageDetector
+from app.services.inference import (
+    artifact_path, create_eager, export_onnx, export_torchscript,
+    load_backend, parity, quantize_onnx_static, quantize_torch_static
+)
+
+# Max P(AI) drift allowed against eager fp32, per backend
+TOLERANCES = {
+    "torchscript": 1e-4,
+    "onnx": 1e-3,
+    "int8": 0.1,
+    "onnx_int8": 0.1,
+}
+
+def load_inputs(image_dir: str, count: int, batch_size: int) -> List[torch.Tensor]:
+    """Preprocessed batches from real images, or deterministic synthetic ones"""
+    transform = ImageDetector(model_specs={}).transform
+    images = []
+    
+    if image_dir:
+        paths = sorted(
+            p for p in glob.glob(os.path.join(image_dir, "**", "*"), recursive=True)
+            if os.path.splitext(p)[1].lower() in (".jpg", ".jpeg", ".png", ".webp")
+        )
+        images = [Image.open(p).convert("RGB") for p in paths[:count]]
+    
+    if not images:
+        rng = np.random.default_rng(0)
+        for i in range(count):
+            y, x = np.mgrid[0:256, 0:256]
+            base = np.stack([x, y, (x * i + y) % 256], axis=2) * (0.5 + i / (2 * count))
+            arr = np.clip(base + rng.normal(0, 10 + i, base.shape), 0, 255).astype(np.uint8)
+            images.append(Image.fromarray(arr))
+    
+    tensors = torch.stack([transform(img) for img in images])
+    return list(torch.split(tensors, batch_size))
+
+def export(name: str, architecture: str, backends: List[str], output: str, fresh: bool, inputs):
+    reference_path = artifact_path(output, name, "eager")
+    if fresh or not os.path.exists(reference_path):
+        model = create_eager(architecture, settings.MODEL_PRETRAINED)
+        torch.save(model.state_dict(), reference_path)
+        print(f"✓ {reference_path}")
+    model = create_eager(architecture, False, reference_path)
+    
+    if "torchscript" in backends:
+        export_torchscript(model, artifact_path(output, name, "torchscript"))
+        print(f"✓ {artifact_path(output, name, 'torchscript')}")
+    
+    if "int8" in backends:
+        quantize_torch_static(model, artifact_path(output, name, "int8"), inputs)
+        print(f"✓ {artifact_path(output, name, 'int8')}")
+    
+    if "onnx" in backends or "onnx_int8" in backends:
+        export_onnx(model, artifact_path(output, name, "onnx"))
+        print(f"✓ {artifact_path(output, name, 'onnx')}")
+    
+    if "onnx_int8" in backends:
+        quantize_onnx_static(artifact_path(output, name, "onnx"), artifact_path(output, name, "onnx_int8"), inputs)
+        print(f"✓ {artifact_path(output, name, 'onnx_int8')}")
+
+def check(name: str, architecture: str, backends: List[str], output: str, inputs) -> bool:
+    reference = load_backend("eager", name, architecture, output, pretrained=False)
+    passed = True
+    for backend in backends:
+        drift = parity(reference, load_backend(backend, name, architecture, output, pretrained=False), inputs)
+        ok = drift["max_abs"] <= TOLERANCES[backend]
+        passed = passed and ok
+        print(
+            f"{'✓' if ok else '⚠'} {name} {backend}: max drift {drift['max_abs']:.2e}, "
+            f"mean {drift['mean_abs']:.2e} (tolerance {TOLERANCES[backend]:.0e})"
+        )
+    return passed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=list(TOLERANCES), choices=list(TOLERANCES))
+    parser.add_argument("--calibration", help="directory of representative images (default: synthetic)")
+    parser.add_argument("--samples", type=int, default=32)
+    parser.add_argument("--output", default=settings.MODEL_ARTIFACT_DIR)
+    parser.add_argument("--fresh", action="store_true", help="rebuild the fp32 reference weights")
+    parser.add_argument("--check-only", action="store_true", help="only run the parity check")
+    args = parser.parse_args()
+    
+    os.makedirs(args.output, exist_ok=True)
+    inputs = load_inputs(args.calibration, args.samples, batch_size=8)
+    passed = True
+    
+    for name, architecture in settings.DETECTOR_MODELS.items():
+        if not args.check_only:
+            export(name, architecture, args.backends, args.output, args.fresh, inputs)
+        passed = check(name, architecture, args.backends, args.output, inputs) and passed
+    
+    sys.exit(0 if passed else 1)
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,66 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, Response
 from contextlib import asynccontextmanager
 import os
 from dotenv import load_dotenv
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
-from app.api import analyze, history, models
+from app.api import analyze, batch, history, jobs, models, stream
 from app.core.config import settings
+from app.core.metrics import REQUESTS_IN_FLIGHT, register_stats
+from app.core.static import ImmutableStaticFiles
 from app.db.database import engine, Base
-from app.services.model_manager import ModelManager
+from app.services.model_manager import model_manager
+from app.services.storage import STORED_PATH
 
 load_dotenv()
 
 # Initialize database
 Base.metadata.create_all(bind=engine)
 
-# Initialize model manager
-model_manager = ModelManager()
+# Component counters are read at scrape time
+register_stats("truthlens_executor", analyze.executor.stats, counters=("completed", "failed"))
+register_stats(
+    "truthlens_result_cache",
+    analyze.result_cache.stats,
+    counters=("memory_hits", "redis_hits", "db_hits", "misses", "redis_errors")
+)
+register_stats(
+    "truthlens_batching",
+    model_manager.detector.batching_stats,
+    counters=("submitted", "batches"),
+    labels=("model",)
+)
+register_stats(
+    "truthlens_storage",
+    analyze.upload_store.stats,
+    counters=("writes", "deduplicated", "sweeps", "evicted_files", "reclaimed_bytes")
+)
+register_stats(
+    "truthlens_jobs",
+    jobs.job_queue.stats,
+    counters=("succeeded", "failed", "retried")
+)
+register_stats(
+    "truthlens_inference_pool",
+    model_manager.detector.pool_stats,
+    counters=("submitted", "completed", "failed", "restarts")
+)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Load AI models
-    await model_manager.load_models()
+    # Startup: start analysis workers; models load in the background (see /ready)
+    analyze.executor.start()
+    model_manager.start_loading()
+    jobs.job_queue.start()
+    analyze.upload_store.start()
     yield
     # Shutdown: Cleanup
+    await jobs.job_queue.close()
+    await analyze.upload_store.close()
+    await analyze.executor.shutdown()
+    await analyze.result_cache.close()
     await model_manager.cleanup()
 
 app = FastAPI(
@@ -41,15 +77,31 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+@app.middleware("http")
+async def track_in_flight(request, call_next):
+    with REQUESTS_IN_FLIGHT.track_inprogress():
+        return await call_next(request)
+
 # Include routers
 app.include_router(analyze.router, prefix="/api", tags=["Analysis"])
+app.include_router(batch.router, prefix="/api", tags=["Analysis"])
+app.include_router(jobs.router, prefix="/api", tags=["Jobs"])
+app.include_router(stream.router, prefix="/api", tags=["Analysis"])
 app.include_router(history.router, prefix="/api", tags=["History"])
 app.include_router(models.router, prefix="/api", tags=["Models"])
 
-# Serve uploaded assets for in-app previews
-app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
+# Serve stored uploads and thumbnails for in-app previews; names never change
+# content, so they cache forever. Only the content-addressed shard tree is
+# exposed: not job uploads, temp files or files being written or evicted.
+os.makedirs(analyze.upload_store.root, exist_ok=True)
+app.mount(
+    "/uploads/objects",
+    ImmutableStaticFiles(directory=analyze.upload_store.root, max_age=settings.STATIC_MAX_AGE, pattern=STORED_PATH),
+    name="uploads"
+)
 
 @app.get("/")
 async def root():
@@ -63,3 +115,14 @@ async def root():
 @app.get("/health")
 async def health():
     return {"status": "healthy"}
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until model loading has finished"""
+    readiness = model_manager.readiness()
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
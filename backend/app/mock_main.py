@@ -2,8 +2,9 @@
 TruthLens - Advanced AI Image Detection System
 Production-grade forensic analysis with highly calibrated detection
 """
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 import os
 import uuid
 import time
@@ -16,7 +17,53 @@ import zlib
 from PIL import Image, ImageFilter, ImageStat
 import numpy as np
 
-app = FastAPI(title="TruthLens API", version="2.0.0")
+from .core.responses import FastJSONResponse
+from .services.analysis_store import make_analysis_store
+from .services.executor import AnalysisExecutor
+from .services.ela import ELAEngine
+from .services.frequency import FrequencyEngine
+from .services.ingest import UploadRejected, ingest_upload
+from .services.resolution import ImageTooLarge, decode_within, megapixels_to_pixels, open_image, reduction_factor
+
+UPLOAD_DIR = "uploads"
+MAX_FILE_SIZE = int(os.getenv("TRUTHLENS_MAX_FILE_SIZE", str(10 * 1024 * 1024)))
+MAX_IMAGE_PIXELS = int(os.getenv("TRUTHLENS_MAX_IMAGE_PIXELS", "100000000"))
+# Pixel budget for the statistical checks (0 = full resolution)
+MAX_MEGAPIXELS = float(os.getenv("TRUTHLENS_MAX_MEGAPIXELS", "4"))
+
+# CPU-bound analysis runs in a worker pool ("process" or "thread")
+EXECUTOR_KIND = os.getenv("TRUTHLENS_EXECUTOR", "process")
+EXECUTOR_WORKERS = int(os.getenv("TRUTHLENS_WORKERS", "0"))
+executor = AnalysisExecutor(EXECUTOR_KIND, EXECUTOR_WORKERS)
+ela_engine = ELAEngine()
+# Windows and radial masks are cached per crop size, per worker process
+frequency_engine = FrequencyEngine()
+
+# Finished analyses: "memory" (LRU, lost on restart) or "sqlite" (kept in
+# TRUTHLENS_STORE_PATH); oldest entries are evicted past MAX_ENTRIES and
+# entries expire after TTL seconds (0 = never)
+STORE_KIND = os.getenv("TRUTHLENS_STORE", "memory")
+STORE_MAX_ENTRIES = int(os.getenv("TRUTHLENS_STORE_MAX_ENTRIES", "1000"))
+STORE_TTL = float(os.getenv("TRUTHLENS_STORE_TTL", "0"))
+STORE_PATH = os.getenv("TRUTHLENS_STORE_PATH", "analyses.db")
+HISTORY_LIMIT = 20
+# Built in the lifespan: spawned executor workers re-import this module and
+# must not open the store or create directories
+analyses_store = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global analyses_store
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    analyses_store = make_analysis_store(STORE_KIND, STORE_MAX_ENTRIES, STORE_TTL, STORE_PATH)
+    executor.start()
+    yield
+    await executor.shutdown()
+    analyses_store.close()
+
+
+app = FastAPI(title="TruthLens API", version="2.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,10 +73,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-analyses_store = {}
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
 
 class AdvancedForensicAnalyzer:
     """
@@ -69,18 +112,28 @@ class AdvancedForensicAnalyzer:
             return val
         return val
     
-    def analyze(self, img: Image.Image, file_path: str, filename: str) -> Dict:
-        """Run complete analysis pipeline"""
+    def analyze(self, img: Image.Image, file_path: str, filename: str, reduced: Image.Image = None) -> Dict:
+        """Run complete analysis pipeline
+        
+        `reduced` is an optional downscaled RGB decode used by the statistical
+        checks; ELA, blocking and metadata always use the full image.
+        """
         img_rgb = img.convert('RGB')
         img_array = np.array(img_rgb, dtype=np.float32)
         gray = np.mean(img_array, axis=2)
         
+        if reduced is None:
+            small_array, small_gray = img_array, gray
+        else:
+            small_array = np.array(reduced, dtype=np.float32)
+            small_gray = np.mean(small_array, axis=2)
+        
         # Run all analysis layers
         results = {
             'digital_footprint': self._to_python(self._analyze_metadata(img, filename)),
-            'pixel_physics': self._to_python(self._analyze_pixels(img_rgb, img_array, gray, file_path)),
-            'lighting_geometry': self._to_python(self._analyze_structure(img_array, gray)),
-            'semantic_analysis': self._to_python(self._analyze_patterns(img_array, gray))
+            'pixel_physics': self._to_python(self._analyze_pixels(img_rgb, img_array, gray, file_path, small_array, small_gray)),
+            'lighting_geometry': self._to_python(self._analyze_structure(small_array, small_gray)),
+            'semantic_analysis': self._to_python(self._analyze_patterns(small_array, small_gray))
         }
         
         return results
@@ -171,16 +224,28 @@ class AdvancedForensicAnalyzer:
             'details': details
         }
     
-    def _analyze_pixels(self, img: Image.Image, arr: np.ndarray, gray: np.ndarray, file_path: str) -> Dict:
+    def _analyze_pixels(
+        self,
+        img: Image.Image,
+        arr: np.ndarray,
+        gray: np.ndarray,
+        file_path: str,
+        small_arr: np.ndarray = None,
+        small_gray: np.ndarray = None
+    ) -> Dict:
         """Layer 2: Pixel-level forensic analysis"""
         score = 0
         findings = []
         details = {}
         
+        # Statistical checks may run on a reduced raster
+        small_arr = arr if small_arr is None else small_arr
+        small_gray = gray if small_gray is None else small_gray
+        
         h, w = gray.shape
         
         # === Error Level Analysis (ELA) ===
-        ela_score = self._compute_ela(img, file_path)
+        ela_score = self._compute_ela(arr)
         details['ela_variance'] = round(ela_score, 2)
         
         # AI images typically have very uniform ELA (low variance)
@@ -197,7 +262,7 @@ class AdvancedForensicAnalyzer:
             findings.append(f"Natural ELA variance ({ela_score:.1f})")
         
         # === Noise Analysis (AI has unnaturally smooth noise) ===
-        noise_score = self._analyze_noise_patterns(arr)
+        noise_score = self._analyze_noise_patterns(small_gray)
         details['noise_uniformity'] = round(noise_score, 3)
         
         # Lower score = more uniform/artificial
@@ -214,7 +279,7 @@ class AdvancedForensicAnalyzer:
             findings.append("Natural noise distribution")
         
         # === Color Statistics ===
-        color_stats = self._analyze_color_distribution(arr)
+        color_stats = self._analyze_color_distribution(small_arr)
         details['color_entropy'] = round(color_stats['entropy'], 2)
         details['saturation_std'] = round(color_stats['sat_std'], 2)
         
@@ -236,7 +301,7 @@ class AdvancedForensicAnalyzer:
             score += 15
         
         # === Statistical Distribution ===
-        skewness = self._compute_skewness(gray.flatten())
+        skewness = self._compute_skewness(small_gray.flatten())
         details['pixel_skewness'] = round(skewness, 3)
         
         if abs(skewness) < 0.1:
@@ -357,7 +422,7 @@ class AdvancedForensicAnalyzer:
         
         # === Texture Repetition Analysis ===
         if h >= 64 and w >= 64:
-            patch_scores = self._analyze_texture_patches(arr)
+            patch_scores = self._analyze_texture_patches(gray)
             details['texture_similarity'] = round(patch_scores['similarity'], 3)
             details['texture_variance'] = round(patch_scores['variance'], 2)
             
@@ -460,48 +525,41 @@ class AdvancedForensicAnalyzer:
     
     # =============== HELPER METHODS ===============
     
-    def _compute_ela(self, img: Image.Image, file_path: str) -> float:
+    def _compute_ela(self, arr: np.ndarray) -> float:
         """Error Level Analysis - compare to re-compressed version"""
         try:
-            temp_path = file_path + "_ela_temp.jpg"
-            img_rgb = img.convert('RGB')
-            
-            # Save at quality 85 (optimal for ELA)
-            img_rgb.save(temp_path, 'JPEG', quality=85)
-            compressed = Image.open(temp_path).convert('RGB')
-            
-            orig = np.array(img_rgb, dtype=np.float32)
-            comp = np.array(compressed, dtype=np.float32)
-            
-            diff = np.abs(orig - comp)
-            ela_variance = np.std(diff)
-            
-            os.remove(temp_path)
+            # Save at quality 85 (optimal for ELA), in memory from the decoded array
+            diff = ela_engine.difference(arr, 85)
+            ela_variance = np.std(diff.astype(np.float32))
             return float(ela_variance)
         except Exception:
             return 15.0  # Neutral default
     
-    def _analyze_noise_patterns(self, arr: np.ndarray) -> float:
+    def _blocks(self, gray: np.ndarray, block: int, step: int) -> np.ndarray:
+        """(rows, cols, block * block) array of the blocks starting every `step` pixels"""
+        h, w = gray.shape
+        if h <= block or w <= block:
+            return np.empty((0, 0, block * block), dtype=gray.dtype)
+        windows = np.lib.stride_tricks.sliding_window_view(gray, (block, block))
+        # Block origins follow range(0, h - block, step) x range(0, w - block, step)
+        windows = windows[:h - block:step, :w - block:step]
+        # Contiguous rows reduce in the same order as per-block np.mean/np.var calls
+        return np.ascontiguousarray(windows).reshape(*windows.shape[:2], block * block)
+    
+    def _analyze_noise_patterns(self, gray: np.ndarray) -> float:
         """Analyze noise uniformity - AI has unnaturally uniform noise"""
-        # Apply high-pass filter to isolate noise
-        gray = np.mean(arr, axis=2)
-        
         # Compute local variance across small patches
         patch_size = 8
-        h, w = gray.shape
-        variances = []
+        patches = self._blocks(gray, patch_size, patch_size * 2)
         
-        for i in range(0, h - patch_size, patch_size * 2):
-            for j in range(0, w - patch_size, patch_size * 2):
-                patch = gray[i:i+patch_size, j:j+patch_size]
-                # Only consider mid-tone areas (avoid edges/highlights)
-                if 40 < np.mean(patch) < 215:
-                    variances.append(np.var(patch))
+        # Only consider mid-tone areas (avoid edges/highlights)
+        means = patches.mean(axis=-1)
+        mid_tone = (means > 40) & (means < 215)
+        variances = patches.var(axis=-1)[mid_tone]
         
         if len(variances) < 10:
             return 0.5  # Not enough data
         
-        variances = np.array(variances)
         # Coefficient of variation of variances
         cv = np.std(variances) / (np.mean(variances) + 1)
         return min(cv, 1.0)
@@ -572,30 +630,17 @@ class AdvancedForensicAnalyzer:
     def _compute_local_contrast(self, gray: np.ndarray) -> float:
         """Compute average local contrast"""
         block_size = 16
-        h, w = gray.shape
-        contrasts = []
-        
-        for i in range(0, h - block_size, block_size):
-            for j in range(0, w - block_size, block_size):
-                block = gray[i:i+block_size, j:j+block_size]
-                contrasts.append(np.std(block))
+        contrasts = self._blocks(gray, block_size, block_size).std(axis=-1).ravel()
         
-        return np.mean(contrasts) if contrasts else 30
+        return np.mean(contrasts) if contrasts.size else 30
     
-    def _analyze_texture_patches(self, arr: np.ndarray) -> Dict:
+    def _analyze_texture_patches(self, gray: np.ndarray) -> Dict:
         """Analyze texture similarity across patches"""
-        h, w = arr.shape[:2]
         patch_size = 32
-        gray = np.mean(arr, axis=2)
         
-        patch_means = []
-        patch_stds = []
-        
-        for i in range(0, h - patch_size, patch_size):
-            for j in range(0, w - patch_size, patch_size):
-                patch = gray[i:i+patch_size, j:j+patch_size]
-                patch_means.append(np.mean(patch))
-                patch_stds.append(np.std(patch))
+        patches = self._blocks(gray, patch_size, patch_size)
+        patch_means = patches.mean(axis=-1).ravel()
+        patch_stds = patches.std(axis=-1).ravel()
         
         if len(patch_stds) < 4:
             return {'similarity': 0.5, 'variance': 100}
@@ -613,45 +658,12 @@ class AdvancedForensicAnalyzer:
         }
     
     def _analyze_frequency_domain(self, gray: np.ndarray) -> Dict:
-        """Analyze frequency content using FFT"""
-        h, w = gray.shape
-        
-        # Use center crop for consistency
-        size = min(h, w, 256)
-        cy, cx = h // 2, w // 2
-        crop = gray[cy-size//2:cy+size//2, cx-size//2:cx+size//2]
-        
-        # Apply windowing to reduce edge artifacts
-        window = np.outer(np.hanning(size), np.hanning(size))
-        crop = crop * window
-        
-        # FFT
-        fft = np.fft.fft2(crop)
-        fft_shift = np.fft.fftshift(fft)
-        magnitude = np.abs(fft_shift)
-        magnitude = np.log(magnitude + 1)
-        
-        # Analyze frequency rings
-        center = size // 2
-        total_energy = np.sum(magnitude)
-        
-        # High frequency = outer ring
-        y, x = np.ogrid[:size, :size]
-        dist = np.sqrt((x - center) ** 2 + (y - center) ** 2)
-        
-        high_freq_mask = dist > (size * 0.35)
-        high_freq_energy = np.sum(magnitude[high_freq_mask]) / (total_energy + 1)
-        
-        # Spectral flatness
-        magnitude_flat = magnitude.flatten()
-        magnitude_flat = magnitude_flat[magnitude_flat > 0]
-        geo_mean = np.exp(np.mean(np.log(magnitude_flat + 1e-10)))
-        arith_mean = np.mean(magnitude_flat)
-        flatness = geo_mean / (arith_mean + 1e-10)
+        """Analyze frequency content of the center crop using FFT"""
+        spectrum = frequency_engine.analyze(gray)
         
         return {
-            'high_freq': float(high_freq_energy),
-            'flatness': float(min(flatness, 1.0))
+            'high_freq': spectrum['high_freq'][0],
+            'flatness': spectrum['flatness'][0]
         }
     
     def _analyze_histogram(self, gray: np.ndarray) -> Dict:
@@ -688,6 +700,17 @@ class AdvancedForensicAnalyzer:
 analyzer = AdvancedForensicAnalyzer()
 
 
+def run_analysis(file_path: str, filename: str, max_megapixels: float = 0) -> Dict:
+    """Executor entry point: decode and analyze an image in a worker"""
+    img = open_image(file_path, MAX_IMAGE_PIXELS)
+    max_pixels = megapixels_to_pixels(max_megapixels)
+    reduced = None
+    if reduction_factor(img.size, max_pixels) > 1:
+        # Separate handle: draft() must run before the full decode
+        reduced = decode_within(open_image(file_path), max_pixels)
+    return analyzer.analyze(img, file_path, filename, reduced)
+
+
 @app.get("/")
 async def root():
     return {"message": "TruthLens API - Advanced AI Detection", "version": "2.0.0"}
@@ -699,26 +722,25 @@ async def health():
 
 
 @app.post("/api/analyze")
-async def analyze_image(image: UploadFile = File(...)):
+async def analyze_image(request: Request):
     """Analyze image using advanced 4-layer forensic detection"""
     start_time = time.time()
     
-    if not image.content_type or not image.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="File must be an image")
-    
     analysis_id = str(uuid.uuid4())[:8]
-    file_ext = os.path.splitext(image.filename or 'image.jpg')[1] or '.jpg'
-    file_path = os.path.join(UPLOAD_DIR, f"{analysis_id}{file_ext}")
     
+    # Stream straight to disk; oversized or non-image uploads are cut off early
     try:
-        contents = await image.read()
-        with open(file_path, "wb") as f:
-            f.write(contents)
-        
-        img = Image.open(file_path)
+        upload = await ingest_upload(request, "image", UPLOAD_DIR, MAX_FILE_SIZE, analysis_id)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    file_path = upload.file_path
+    
+    try:
+        # Header-only open for file info and the pixel limit; pixels are decoded in the worker
+        img = open_image(file_path, MAX_IMAGE_PIXELS)
         
-        # Run comprehensive analysis
-        results = analyzer.analyze(img, file_path, image.filename or 'unknown.jpg')
+        # Run comprehensive analysis off the event loop
+        results = await executor.run(run_analysis, file_path, upload.filename or 'unknown.jpg', MAX_MEGAPIXELS)
         
         # Calculate weighted score
         layer1 = results['digital_footprint']
@@ -778,7 +800,7 @@ async def analyze_image(image: UploadFile = File(...)):
                 "file_info": {
                     "format": img.format or "Unknown",
                     "dimensions": list(img.size),
-                    "size": os.path.getsize(file_path),
+                    "size": upload.size,
                     "color_mode": img.mode
                 },
                 "analysis_timestamp": datetime.now().isoformat(),
@@ -786,9 +808,12 @@ async def analyze_image(image: UploadFile = File(...)):
             }
         }
         
-        analyses_store[analysis_id] = result
-        return result
+        analyses_store.put(analysis_id, result)
+        # Already plain data: skip jsonable_encoder and the stdlib encoder
+        return FastJSONResponse(result)
         
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         import traceback
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}\n{traceback.format_exc()}")
@@ -803,17 +828,24 @@ async def analyze_image(image: UploadFile = File(...)):
 
 @app.get("/api/analysis/{analysis_id}")
 async def get_analysis(analysis_id: str):
-    if analysis_id in analyses_store:
-        return analyses_store[analysis_id]
+    result = analyses_store.get(analysis_id)
+    if result is not None:
+        return FastJSONResponse(result)
     raise HTTPException(status_code=404, detail="Analysis not found")
 
 
 @app.get("/api/history")
 async def get_history():
-    return {
-        "analyses": list(analyses_store.values())[-20:],
+    return FastJSONResponse({
+        "analyses": analyses_store.recent(HISTORY_LIMIT),
         "total": len(analyses_store)
-    }
+    })
+
+
+@app.get("/api/store/stats")
+async def store_stats():
+    """Analysis store size, hit rate and evictions"""
+    return analyses_store.stats()
 
 
 if __name__ == "__main__":
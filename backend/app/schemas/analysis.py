@@ -25,21 +25,40 @@ class AnalysisResponse(BaseModel):
     confidence: float
     overall_score: float
     layers: Dict[str, LayerResult]
+    layers_computed: List[str] = []
     metadata: AnalysisMetadata
     processing_time: float
     created_at: datetime
+    # None once the upload was evicted from storage (image_evicted)
     image_url: str | None
+    image_evicted: bool = False
+    # Thumbnail size (longest edge, px) -> URL
+    thumbnails: Dict[str, str] = {}
+    # Per-stage seconds, only when requested with ?timings=true
+    timings: Dict[str, float] | None = None
 
     class Config:
         from_attributes = True
 
+class JobResponse(BaseModel):
+    id: str
+    status: str  # queued, running, succeeded, failed
+    attempts: int
+    error: str | None = None
+    created_at: datetime
+    updated_at: datetime | None = None
+    # Set once the job has succeeded
+    result: AnalysisResponse | None = None
+
 class HistoryItem(BaseModel):
     id: str
     filename: str
     verdict: str
     confidence: float
+    overall_score: float
     created_at: datetime
     thumbnail_url: str | None
+    image_evicted: bool = False
 
     class Config:
         from_attributes = True
@@ -0,0 +1,209 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import orjson
+
+from ..core.responses import dumps
+
+ANALYSIS_STORES = ("memory", "sqlite")
+
+
+class MemoryAnalysisStore:
+    """Bounded in-process analysis store with LRU eviction and TTL
+
+    Entries live in two ordered dicts over the same values: one in access
+    order for LRU eviction, one in insertion order, so the newest N (for
+    history) and the oldest, first to expire, are both reached in O(1)
+    per entry. ttl=0 keeps entries until they are evicted for space.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 0, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._by_access: "OrderedDict[str, Dict]" = OrderedDict()
+        self._by_insertion: "OrderedDict[str, float]" = OrderedDict()  # id -> stored at
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.expired = 0
+
+    def put(self, analysis_id: str, result: Dict):
+        self._purge_expired()
+        self._remove(analysis_id)
+        self._by_access[analysis_id] = result
+        self._by_insertion[analysis_id] = self._clock()
+        while len(self._by_access) > self.max_entries:
+            self._remove(next(iter(self._by_access)))
+            self.evicted += 1
+
+    def get(self, analysis_id: str) -> Optional[Dict]:
+        self._purge_expired()
+        result = self._by_access.get(analysis_id)
+        if result is None:
+            self.misses += 1
+            return None
+        self._by_access.move_to_end(analysis_id)
+        self.hits += 1
+        return result
+
+    def recent(self, limit: int) -> List[Dict]:
+        """The last `limit` analyses stored, oldest first"""
+        self._purge_expired()
+        newest = []
+        for analysis_id in reversed(self._by_insertion):
+            if len(newest) >= limit:
+                break
+            newest.append(self._by_access[analysis_id])
+        return newest[::-1]
+
+    def __len__(self) -> int:
+        self._purge_expired()
+        return len(self._by_access)
+
+    def _remove(self, analysis_id: str):
+        self._by_access.pop(analysis_id, None)
+        self._by_insertion.pop(analysis_id, None)
+
+    def _purge_expired(self):
+        if not self.ttl:
+            return
+        cutoff = self._clock() - self.ttl
+        # Insertion order is expiry order
+        while self._by_insertion:
+            analysis_id, stored_at = next(iter(self._by_insertion.items()))
+            if stored_at > cutoff:
+                break
+            self._remove(analysis_id)
+            self.expired += 1
+
+    def stats(self) -> Dict:
+        """Store counters for monitoring"""
+        return {
+            "backend": "memory",
+            "entries": len(self._by_access),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evicted": self.evicted,
+            "expired": self.expired
+        }
+
+    def close(self):
+        pass
+
+
+class SQLiteAnalysisStore:
+    """Analysis store in a local SQLite file, so results survive restarts
+
+    Same limits as the memory store: least recently read entries are
+    evicted past max_entries, and entries older than ttl seconds expire.
+    """
+
+    def __init__(self, path: str, max_entries: int = 1000, ttl: float = 0, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS analyses ("
+            "id TEXT PRIMARY KEY, stored_at REAL NOT NULL, accessed_at REAL NOT NULL, result BLOB NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_analyses_stored_at ON analyses (stored_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_analyses_accessed_at ON analyses (accessed_at)")
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.expired = 0
+
+    def put(self, analysis_id: str, result: Dict):
+        now = self._clock()
+        with self._lock, self._conn:
+            self._purge_expired(now)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analyses (id, stored_at, accessed_at, result) VALUES (?, ?, ?, ?)",
+                (analysis_id, now, now, dumps(result))
+            )
+            over = self._count() - self.max_entries
+            if over > 0:
+                self._conn.execute(
+                    "DELETE FROM analyses WHERE id IN (SELECT id FROM analyses ORDER BY accessed_at LIMIT ?)",
+                    (over,)
+                )
+                self.evicted += over
+
+    def get(self, analysis_id: str) -> Optional[Dict]:
+        now = self._clock()
+        with self._lock, self._conn:
+            self._purge_expired(now)
+            row = self._conn.execute("SELECT result FROM analyses WHERE id = ?", (analysis_id,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE analyses SET accessed_at = ? WHERE id = ?", (now, analysis_id))
+        self.hits += 1
+        return orjson.loads(row[0])
+
+    def recent(self, limit: int) -> List[Dict]:
+        """The last `limit` analyses stored, oldest first"""
+        with self._lock, self._conn:
+            self._purge_expired(self._clock())
+            rows = self._conn.execute(
+                "SELECT result FROM analyses ORDER BY stored_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [orjson.loads(result) for result, in reversed(rows)]
+
+    def __len__(self) -> int:
+        with self._lock, self._conn:
+            self._purge_expired(self._clock())
+            return self._count()
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+
+    def _purge_expired(self, now: float):
+        if self.ttl:
+            self.expired += self._conn.execute("DELETE FROM analyses WHERE stored_at <= ?", (now - self.ttl,)).rowcount
+
+    def stats(self) -> Dict:
+        """Store counters for monitoring"""
+        with self._lock:
+            entries = self._count()
+        return {
+            "backend": "sqlite",
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evicted": self.evicted,
+            "expired": self.expired
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def make_analysis_store(backend: str, max_entries: int = 1000, ttl: float = 0, path: str = "analyses.db"):
+    """Build the store named by backend ("memory" or "sqlite")"""
+    if backend == "memory":
+        return MemoryAnalysisStore(max_entries, ttl)
+    if backend == "sqlite":
+        return SQLiteAnalysisStore(path, max_entries, ttl)
+    raise ValueError(f"Unknown analysis store '{backend}', expected one of {ANALYSIS_STORES}")
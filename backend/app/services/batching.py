@@ -0,0 +1,136 @@
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import torch
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-image inferences into batched forward passes"""
+
+    def __init__(
+        self,
+        forward: Callable[[torch.Tensor], List[float]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        max_queue_size: int = 64,
+        name: str = "model"
+    ):
+        self.forward = forward
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_queue_size = max_queue_size
+        self.name = name
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # Counters
+        self.submitted = 0
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self.total_wait = 0.0
+
+    async def submit(self, tensor: torch.Tensor) -> float:
+        """Queue a preprocessed (C, H, W) tensor and wait for its probability"""
+        self._ensure_worker()
+
+        future = self._loop.create_future()
+        await self._queue.put((tensor, future, time.perf_counter()))
+        self.submitted += 1
+        return await future
+
+    def _ensure_worker(self):
+        """Start the collector task on the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Queues and tasks are bound to a loop; rebuild them if it changed
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._worker = None
+
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run())
+
+    async def _collect(self) -> List[Tuple[torch.Tensor, asyncio.Future, float]]:
+        """Wait for one item, then gather more until the batch or time budget is spent"""
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        """Collector loop: batch, run one forward pass, fan results back out"""
+        while True:
+            batch = await self._collect()
+
+            # Drop requests whose callers have gone away
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                continue
+
+            now = time.perf_counter()
+            self.batches += 1
+            self.items += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            self.total_wait += sum(now - queued_at for _, _, queued_at in batch)
+
+            try:
+                inputs = torch.stack([tensor for tensor, _, _ in batch])
+                # Run the forward pass off the event loop
+                probs = await asyncio.to_thread(self.forward, inputs)
+            except asyncio.CancelledError:
+                for _, future, _ in batch:
+                    future.cancel()
+                raise
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future, _), prob in zip(batch, probs):
+                if not future.done():
+                    future.set_result(prob)
+
+    def stats(self) -> Dict:
+        """Batching counters for monitoring"""
+        return {
+            "model": self.name,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "max_queue_size": self.max_queue_size,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "submitted": self.submitted,
+            "batches": self.batches,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_seen": self.max_batch_seen,
+            "avg_wait_ms": self.total_wait / self.items * 1000 if self.items else 0.0
+        }
+
+    async def close(self):
+        """Stop the collector and fail any requests still waiting"""
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+
+        if self._queue is not None:
+            while not self._queue.empty():
+                _, future, _ = self._queue.get_nowait()
+                if not future.done():
+                    future.cancel()
@@ -1,16 +1,42 @@
 import torch
 import torchvision.transforms as transforms
-from PIL import Image
-import timm
-from typing import Dict
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
 import numpy as np
+from app.core.config import settings
+from app.core.metrics import DETECTOR_FALLBACKS, MODEL_RUNS
+from app.services.batching import MicroBatcher
+from app.services.image_context import ImageContext
+from app.services.inference import INPUT_SHAPE, load_backend, read_latency_profile
+from app.services.inference_pool import InferencePool, PooledModel
 
 class ImageDetector:
     """Main AI image detector using ensemble of models"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        model_specs: Optional[Dict[str, str]] = None,
+        pretrained: Optional[bool] = None,
+        backend: Optional[str] = None,
+        workers: Optional[int] = None,
+        thresholds: Optional[Dict[str, float]] = None
+    ):
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        # name -> timm architecture
+        self.model_specs = dict(settings.DETECTOR_MODELS if model_specs is None else model_specs)
+        self.pretrained = settings.MODEL_PRETRAINED if pretrained is None else pretrained
+        self.backend = backend or settings.INFERENCE_BACKEND
+        # > 0: models live in dedicated inference processes, not this one
+        self.workers = settings.INFERENCE_WORKERS if workers is None else workers
+        self.pool: Optional[InferencePool] = None
+        # name -> early-exit margin around 0.5 for the ensemble cascade
+        self.thresholds = dict(settings.CASCADE_THRESHOLDS if thresholds is None else thresholds)
+        # architecture -> backend -> benchmarked ms per image, for cascade order
+        self.latency_profile = read_latency_profile(settings.MODEL_ARTIFACT_DIR)
         self.models = {}
+        self.model_status: Dict[str, Dict] = {name: {"state": "pending"} for name in self.model_specs}
+        self.batchers: Dict[str, MicroBatcher] = {}
         self.transform = transforms.Compose([
             transforms.Resize((224, 224)),
             transforms.ToTensor(),
@@ -19,50 +45,140 @@ class ImageDetector:
     
     async def load_models(self):
         """Load AI models"""
+        if self.workers > 0:
+            await self.load_pool()
+        else:
+            # Models share this process: its torch thread budget is set once
+            # here, not per model (each pool worker pins its own)
+            if settings.INFERENCE_THREADS:
+                torch.set_num_threads(settings.INFERENCE_THREADS)
+            for name, architecture in self.model_specs.items():
+                await self.load_model(name, architecture)
+        
+        if self.models:
+            where = f"{self.workers} inference workers" if self.pool is not None else self.device
+            print(f"✓ Loaded models on {where}: {', '.join(self.models)}")
+        else:
+            print("Using fallback heuristic mode")
+    
+    async def load_model(self, name: str, architecture: str):
+        """Load and warm up one model off the event loop, recording its status"""
+        status = self.model_status[name] = {
+            "state": "loading",
+            "architecture": architecture,
+            "backend": self.backend,
+            "device": str(self.device)
+        }
+        start = time.perf_counter()
+        
         try:
-            # EfficientNet-B7
-            self.models["efficientnet"] = timm.create_model(
-                'efficientnet_b7',
-                pretrained=True,
-                num_classes=2
-            ).to(self.device).eval()
-            
-            # Additional models would be loaded here
-            print(f"✓ Loaded models on {self.device}")
+            model = await asyncio.to_thread(self._create_model, name, architecture)
+            status["load_seconds"] = time.perf_counter() - start
+            status["memory_bytes"] = model.memory_bytes()
             
+            if settings.MODEL_WARMUP:
+                warmup_start = time.perf_counter()
+                await asyncio.to_thread(self._warm_up, model)
+                status["warmup_seconds"] = time.perf_counter() - warmup_start
+                # Steady-state cost, once lazy init is paid
+                latency_start = time.perf_counter()
+                await asyncio.to_thread(self._warm_up, model)
+                status["latency_ms"] = (time.perf_counter() - latency_start) * 1000
         except Exception as e:
-            print(f"⚠ Model loading failed: {e}")
-            print("Using fallback heuristic mode")
+            status.update(state="failed", error=str(e), load_seconds=time.perf_counter() - start)
+            print(f"⚠ Model loading failed ({name}): {e}")
+            return
+        
+        self.models[name] = model
+        status["state"] = "ready"
+    
+    async def load_pool(self):
+        """Start the inference worker processes; each loads every model itself"""
+        for name, architecture in self.model_specs.items():
+            self.model_status[name] = {
+                "state": "loading",
+                "architecture": architecture,
+                "backend": self.backend,
+                "device": "cpu",
+                "workers": self.workers
+            }
+        
+        self.pool = InferencePool(
+            self.model_specs,
+            self.backend,
+            settings.MODEL_ARTIFACT_DIR,
+            pretrained=self.pretrained,
+            workers=self.workers,
+            threads=settings.INFERENCE_WORKER_THREADS,
+            max_queue_size=settings.INFERENCE_WORKER_QUEUE_SIZE,
+            warmup=settings.MODEL_WARMUP,
+            timeout=settings.INFERENCE_TIMEOUT
+        )
+        statuses = await asyncio.to_thread(self.pool.start)
+        
+        for name, reported in statuses.items():
+            self.model_status[name].update(reported)
+            if reported["state"] == "ready":
+                self.models[name] = PooledModel(self.pool, name, reported.get("memory_bytes", 0))
+            else:
+                print(f"⚠ Model loading failed ({name}): {reported.get('error')}")
+    
+    def pool_stats(self) -> Dict:
+        """Inference worker pool metrics (empty when models run in-process)"""
+        return self.pool.stats() if self.pool is not None else {}
+    
+    def _create_model(self, name: str, architecture: str):
+        """Inference callable for the configured backend (eager, TorchScript, ONNX, INT8)"""
+        return load_backend(
+            self.backend,
+            name,
+            architecture,
+            settings.MODEL_ARTIFACT_DIR,
+            pretrained=self.pretrained,
+            device=self.device,
+            threads=settings.INFERENCE_THREADS
+        )
     
-    async def detect(self, image_path: str, model_name: str = "ensemble") -> Dict:
+    def _warm_up(self, model):
+        """One dummy forward pass so the first request doesn't pay for lazy init"""
+        model(torch.zeros(1, *INPUT_SHAPE))
+    
+    def is_loading(self) -> bool:
+        return any(s["state"] in ("pending", "loading") for s in self.model_status.values())
+    
+    async def detect(self, context: ImageContext, model_name: str = "ensemble") -> Dict:
         """Run AI detection on image"""
         
         try:
-            img = Image.open(image_path).convert('RGB')
-            img_tensor = self.transform(img).unsqueeze(0).to(self.device)
-            
             if not self.models:
                 # Fallback to heuristic mode
-                return await self._fallback_detection(image_path)
+                reason = "loading" if self.is_loading() else "no_models"
+                return await self._fallback_detection(context, reason)
+            
+            # Preprocess from a reduced decode, off the event loop; the model
+            # only sees 224x224 so full resolution buys nothing here
+            img_tensor = await asyncio.to_thread(
+                context.tensor,
+                self.transform,
+                settings.LAYER_MAX_MEGAPIXELS.get("semantic_analysis")
+            )
             
-            # Run inference
-            with torch.no_grad():
-                if model_name == "ensemble":
-                    scores = []
-                    for model in self.models.values():
-                        output = model(img_tensor)
-                        prob = torch.softmax(output, dim=1)[0][1].item()
-                        scores.append(prob)
-                    
-                    ai_score = np.mean(scores) * 100
-                    confidence = 1 - np.std(scores)
-                else:
-                    model = self.models.get(model_name, list(self.models.values())[0])
-                    output = model(img_tensor)
-                    prob = torch.softmax(output, dim=1)[0][1].item()
-                    ai_score = prob * 100
-                    confidence = 0.85
+            # Run inference through the per-model batching queues
+            if model_name == "ensemble":
+                scores, runs = await self._run_cascade(img_tensor)
+                ai_score = np.mean(scores) * 100
+                confidence = 1 - np.std(scores)
+            else:
+                name = model_name if model_name in self.models else next(iter(self.models))
+                start = time.perf_counter()
+                prob = await self._get_batcher(name).submit(img_tensor)
+                runs = [{"model": name, "score": prob * 100, "seconds": time.perf_counter() - start}]
+                MODEL_RUNS.labels(model=name).inc()
+                ai_score = prob * 100
+                confidence = 0.85
             
+            models_run = [run["model"] for run in runs]
+            early_exit = model_name == "ensemble" and len(runs) < len(self.models)
             return {
                 "name": "AI Semantic Analysis",
                 "score": ai_score,
@@ -70,20 +186,92 @@ class ImageDetector:
                 "findings": [
                     f"AI probability: {ai_score:.1f}%",
                     f"Model: {model_name}",
+                    f"Models run: {', '.join(models_run)}" + (" (early exit)" if early_exit else ""),
                     f"Device: {self.device}"
                 ],
                 "details": {
                     "model": model_name,
-                    "device": str(self.device)
+                    "backend": self.backend,
+                    "device": str(self.device),
+                    "models_run": models_run,
+                    "early_exit": early_exit,
+                    "model_scores": {run["model"]: run["score"] for run in runs},
+                    "model_seconds": {run["model"]: run["seconds"] for run in runs},
+                    "inference_seconds": sum(run["seconds"] for run in runs)
                 }
             }
             
         except Exception as e:
             print(f"AI detection error: {e}")
-            return await self._fallback_detection(image_path)
+            return await self._fallback_detection(context, "error")
+    
+    def cascade_order(self) -> List[str]:
+        """Loaded models, cheapest first by measured latency"""
+        loaded = [name for name in self.model_specs if name in self.models]
+        # Benchmarked latencies only when every model has one; they are not
+        # comparable with timings taken on this machine at load
+        benchmarked = {
+            name: self.latency_profile.get(self.model_specs[name], {}).get(self.backend)
+            for name in loaded
+        }
+        if None not in benchmarked.values():
+            latencies = benchmarked
+        else:
+            latencies = {name: self.model_status[name].get("latency_ms") for name in loaded}
+        # Unmeasured models (warm-up off) go last, in configured order
+        return sorted(loaded, key=lambda name: (latencies[name] is None, latencies[name] or 0))
+    
+    async def _run_cascade(self, img_tensor: torch.Tensor) -> Tuple[List[float], List[Dict]]:
+        """Evaluate models cheapest first, stopping once the running mean is decisive"""
+        scores = []
+        runs = []
+        for name in self.cascade_order():
+            start = time.perf_counter()
+            prob = await self._get_batcher(name).submit(img_tensor)
+            runs.append({"model": name, "score": prob * 100, "seconds": time.perf_counter() - start})
+            scores.append(prob)
+            MODEL_RUNS.labels(model=name).inc()
+            
+            threshold = self.thresholds.get(name)
+            if threshold is not None and abs(np.mean(scores) - 0.5) >= threshold:
+                break
+        return scores, runs
+    
+    def _get_batcher(self, name: str) -> MicroBatcher:
+        """Get (or create) the batching queue in front of a loaded model"""
+        if name not in self.batchers:
+            model = self.models[name]
+            
+            def forward(batch: torch.Tensor) -> List[float]:
+                output = model(batch)
+                # One device sync per batch instead of one per image
+                return torch.softmax(output, dim=1)[:, 1].cpu().tolist()
+            
+            self.batchers[name] = MicroBatcher(
+                forward,
+                max_batch_size=settings.INFERENCE_BATCH_SIZE,
+                max_wait_ms=settings.INFERENCE_BATCH_WAIT_MS,
+                max_queue_size=settings.INFERENCE_QUEUE_SIZE,
+                name=name
+            )
+        return self.batchers[name]
+    
+    def batching_stats(self) -> List[Dict]:
+        """Per-model batching metrics"""
+        return [batcher.stats() for batcher in self.batchers.values()]
+    
+    async def close(self):
+        """Stop batching queues and inference workers"""
+        for batcher in self.batchers.values():
+            await batcher.close()
+        self.batchers.clear()
+        if self.pool is not None:
+            await asyncio.to_thread(self.pool.close)
+            self.pool = None
     
-    async def _fallback_detection(self, image_path: str) -> Dict:
+    async def _fallback_detection(self, context: ImageContext, reason: str = "no_models") -> Dict:
         """Fallback detection using heuristics"""
+        DETECTOR_FALLBACKS.labels(reason=reason).inc()
         return {
             "name": "AI Semantic Analysis",
             "score": 50.0,
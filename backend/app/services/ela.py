@@ -0,0 +1,26 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+
+class ELAEngine:
+    """In-memory Error Level Analysis
+
+    Recompresses an already-decoded RGB raster into a memory buffer
+    instead of round-tripping through temp files.
+    """
+
+    def recompress(self, img: Image.Image, quality: int) -> np.ndarray:
+        """Encode img as JPEG at the given quality in memory and decode it back"""
+        buffer = io.BytesIO()
+        img.save(buffer, 'JPEG', quality=quality)
+        buffer.seek(0)
+        return np.asarray(Image.open(buffer).convert('RGB'))
+
+    def difference(self, rgb: np.ndarray, quality: int) -> np.ndarray:
+        """Absolute error (uint8, HxWx3) between rgb and its recompression at quality"""
+        original = np.ascontiguousarray(rgb, dtype=np.uint8)
+        compressed = self.recompress(Image.fromarray(original, 'RGB'), quality)
+        # |a - b| without widening to int16
+        return np.maximum(original, compressed) - np.minimum(original, compressed)
@@ -0,0 +1,85 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional
+
+EXECUTOR_KINDS = ("process", "thread")
+
+
+class AnalysisExecutor:
+    """Pluggable pool for CPU-bound analysis work so it never runs on the event loop
+
+    Work submitted to a process pool must be a picklable, module-level
+    callable with picklable arguments.
+    """
+
+    def __init__(self, kind: str = "process", max_workers: int = 0):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown executor kind '{kind}', expected one of {EXECUTOR_KINDS}")
+
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._pool: Optional[Executor] = None
+
+        # Counters
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+
+    def _create_pool(self) -> Executor:
+        if self.kind == "thread":
+            return ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="analysis"
+            )
+        # Spawned workers do not inherit the parent's torch/OpenMP thread state
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def start(self):
+        """Create the worker pool (idempotent)"""
+        if self._pool is None:
+            self._pool = self._create_pool()
+
+    async def run(self, fn: Callable, *args):
+        """Run fn(*args) in the pool and await its result"""
+        self.start()
+        loop = asyncio.get_running_loop()
+
+        self.pending += 1
+        try:
+            result = await loop.run_in_executor(self._pool, fn, *args)
+        except BrokenProcessPool:
+            # A worker died (OOM, segfault); replace the pool for later requests
+            self.failed += 1
+            self._pool = None
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+
+        self.completed += 1
+        return result
+
+    def stats(self) -> Dict:
+        """Executor counters for monitoring"""
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "pending": self.pending,
+            "completed": self.completed,
+            "failed": self.failed
+        }
+
+    async def shutdown(self, wait: bool = True):
+        """Stop accepting work, drop queued jobs and wait for running ones"""
+        if self._pool is None:
+            return
+        pool, self._pool = self._pool, None
+        await asyncio.to_thread(pool.shutdown, wait=wait, cancel_futures=True)
@@ -1,24 +1,69 @@
 import cv2
 import numpy as np
-from PIL import Image
-import exifread
 import os
-from typing import Dict, Any
+import time
+from typing import Dict, Iterable, Optional, Tuple
 from scipy import ndimage
+from app.core.metrics import LAYER_SECONDS
+from app.services.executor import AnalysisExecutor
+from app.services.ela import ELAEngine
+from app.services.image_context import ImageContext
+
+ela_engine = ELAEngine()
 
 class ForensicAnalyzer:
     """4-Layer forensic analysis for image authenticity"""
     
-    async def analyze_all_layers(self, file_path: str, img: Image.Image) -> Dict:
-        """Run all 4 forensic layers"""
+    LAYERS = ("digital_footprint", "pixel_physics", "lighting_geometry")
+    
+    def __init__(self, max_megapixels: Optional[Dict[str, float]] = None):
+        # Per-layer pixel budget for the statistical checks (missing/0 = full resolution)
+        self.max_megapixels = dict(max_megapixels or {})
+    
+    async def analyze_all_layers(
+        self,
+        context: ImageContext,
+        executor: Optional[AnalysisExecutor] = None,
+        timings: Optional[Dict[str, float]] = None,
+        layers: Optional[Iterable[str]] = None
+    ) -> Dict:
+        """Run the forensic layers (all of them, or those in `layers`)
+        
+        Per-layer durations and the decode time spent in the worker are added
+        to `timings` when given.
+        """
+        
+        selected = self.LAYERS if layers is None else tuple(layer for layer in self.LAYERS if layer in layers)
+        if not selected:
+            # Nothing to run: don't pay for a worker round trip
+            if timings is not None:
+                timings["decode"] = 0.0
+            return {}
         
-        return {
-            "digital_footprint": await self.analyze_digital_footprint(file_path, img),
-            "pixel_physics": await self.analyze_pixel_physics(file_path, img),
-            "lighting_geometry": await self.analyze_lighting_geometry(file_path, img)
-        }
+        if executor is None:
+            results, layer_timings = run_layers_timed(context, selected, self.max_megapixels)
+        else:
+            # One job per request so every layer shares a single decode
+            results, layer_timings = await executor.run(
+                run_layers_timed, context, selected, self.max_megapixels
+            )
+        
+        for layer in selected:
+            LAYER_SECONDS.labels(layer=layer).observe(layer_timings[layer])
+        if timings is not None:
+            timings.update(layer_timings)
+        return results
     
-    async def analyze_digital_footprint(self, file_path: str, img: Image.Image) -> Dict:
+    def decode(self, context: ImageContext, layers: Iterable[str]):
+        """Decode every raster the selected layers read, so a pickled context carries them"""
+        if "pixel_physics" in layers:
+            context.rgb
+            context.rgb_within(self.max_megapixels.get("pixel_physics"))
+            context.gray_within(self.max_megapixels.get("pixel_physics"))
+        if "lighting_geometry" in layers:
+            context.gray_within(self.max_megapixels.get("lighting_geometry"))
+
+    def analyze_digital_footprint(self, context: ImageContext) -> Dict:
         """Layer 1: Digital Footprint Analysis"""
         
         findings = []
@@ -26,7 +71,7 @@ class ForensicAnalyzer:
         details = {}
         
         # Check EXIF
-        exif = self.extract_exif(file_path)
+        exif = context.exif
         if not exif or len(exif) < 5:
             findings.append("⚠ Missing or minimal EXIF metadata")
             score += 30
@@ -35,7 +80,7 @@ class ForensicAnalyzer:
             score += 0
         
         # Resolution analysis
-        width, height = img.size
+        width, height = context.dimensions
         details["resolution"] = f"{width}x{height}"
         
         # Check for AI-typical resolutions
@@ -47,7 +92,7 @@ class ForensicAnalyzer:
             findings.append(f"✓ Non-standard resolution: {width}x{height}")
         
         # Filename analysis
-        filename = os.path.basename(file_path).lower()
+        filename = os.path.basename(context.file_path or context.filename).lower()
         ai_keywords = ['midjourney', 'dalle', 'stable', 'diffusion', 'ai', 'generated']
         if any(kw in filename for kw in ai_keywords):
             findings.append("⚠ AI-related keywords in filename")
@@ -63,18 +108,15 @@ class ForensicAnalyzer:
             "details": details
         }
     
-    async def analyze_pixel_physics(self, file_path: str, img: Image.Image) -> Dict:
+    def analyze_pixel_physics(self, context: ImageContext) -> Dict:
         """Layer 2: Pixel Physics (ELA, Noise, Compression)"""
         
         findings = []
         score = 0
         details = {}
         
-        # Convert to numpy
-        img_array = np.array(img.convert('RGB'))
-        
-        # Error Level Analysis (ELA)
-        ela_score = self._perform_ela(file_path)
+        # ELA needs every recompression artifact, so it always sees full resolution
+        ela_score = self._perform_ela(context.rgb)
         details["ela_variance"] = float(ela_score)
         
         if ela_score > 50:
@@ -83,8 +125,13 @@ class ForensicAnalyzer:
         else:
             findings.append(f"✓ Normal ELA variance: {ela_score:.1f}")
         
+        # Noise and color statistics hold up on the reduced raster
+        budget = self.max_megapixels.get("pixel_physics")
+        img_array = context.rgb_within(budget)
+        details["analysis_resolution"] = f"{img_array.shape[1]}x{img_array.shape[0]}"
+        
         # Noise pattern analysis
-        noise_score = self._analyze_noise(img_array)
+        noise_score = self._analyze_noise(context.gray_within(budget))
         details["noise_uniformity"] = float(noise_score)
         
         if noise_score < 0.3:
@@ -111,15 +158,15 @@ class ForensicAnalyzer:
             "details": details
         }
     
-    async def analyze_lighting_geometry(self, file_path: str, img: Image.Image) -> Dict:
+    def analyze_lighting_geometry(self, context: ImageContext) -> Dict:
         """Layer 3: Lighting & Geometry Analysis"""
         
         findings = []
         score = 0
         details = {}
         
-        img_array = np.array(img.convert('RGB'))
-        gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
+        gray = context.gray_within(self.max_megapixels.get("lighting_geometry"))
+        details["analysis_resolution"] = f"{gray.shape[1]}x{gray.shape[0]}"
         
         # Edge coherence
         edges = cv2.Canny(gray, 50, 150)
@@ -159,33 +206,18 @@ class ForensicAnalyzer:
             "details": details
         }
     
-    def _perform_ela(self, file_path: str) -> float:
+    def _perform_ela(self, img_array: np.ndarray) -> float:
         """Perform Error Level Analysis"""
         try:
-            img = Image.open(file_path)
-            
-            # Save at 95% quality
-            temp_path = file_path + "_temp.jpg"
-            img.save(temp_path, 'JPEG', quality=95)
-            
-            # Calculate difference
-            original = np.array(img.convert('RGB'), dtype=np.int16)
-            compressed = np.array(Image.open(temp_path).convert('RGB'), dtype=np.int16)
-            
-            diff = np.abs(original - compressed)
-            variance = np.var(diff)
-            
-            os.remove(temp_path)
-            
-            return float(variance)
+            # Recompress at 95% quality in memory, reusing the decoded array
+            diff = ela_engine.difference(img_array, 95)
+            return float(np.var(diff))
             
         except:
             return 25.0
     
-    def _analyze_noise(self, img_array: np.ndarray) -> float:
+    def _analyze_noise(self, gray: np.ndarray) -> float:
         """Analyze noise patterns"""
-        gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-        
         # Calculate local variance
         mean_filter = ndimage.uniform_filter(gray.astype(float), size=5)
         sqr_mean_filter = ndimage.uniform_filter(gray.astype(float)**2, size=5)
@@ -215,16 +247,36 @@ class ForensicAnalyzer:
         avg_entropy = (entropy(hist_r) + entropy(hist_g) + entropy(hist_b)) / 3
         
         return min(avg_entropy / 8.0, 1.0)
+
+
+def run_layers(
+    context: ImageContext,
+    layers: Iterable[str] = ForensicAnalyzer.LAYERS,
+    max_megapixels: Optional[Dict[str, float]] = None
+) -> Dict:
+    """Executor entry point: run forensic layers over one shared image context"""
+    return run_layers_timed(context, layers, max_megapixels)[0]
+
+
+def run_layers_timed(
+    context: ImageContext,
+    layers: Iterable[str] = ForensicAnalyzer.LAYERS,
+    max_megapixels: Optional[Dict[str, float]] = None
+) -> Tuple[Dict, Dict[str, float]]:
+    """Executor entry point: run_layers plus per-layer and decode seconds
     
-    def extract_exif(self, file_path: str) -> Dict[str, Any]:
-        """Extract EXIF metadata"""
-        try:
-            with open(file_path, 'rb') as f:
-                tags = exifread.process_file(f, details=False)
-                return {
-                    tag: str(value)
-                    for tag, value in tags.items()
-                    if not tag.startswith('Thumbnail')
-                }
-        except:
-            return {}
+    Lazy decoding triggered by a layer is booked under "decode", not the layer.
+    """
+    analyzer = ForensicAnalyzer(max_megapixels)
+    results = {}
+    timings = {"decode": 0.0}
+    
+    for layer in layers:
+        derived = context.derive_seconds()
+        start = time.perf_counter()
+        results[layer] = getattr(analyzer, f"analyze_{layer}")(context)
+        decode = context.derive_seconds() - derived
+        timings[layer] = time.perf_counter() - start - decode
+        timings["decode"] += decode
+    
+    return results, timings
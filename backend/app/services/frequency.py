@@ -0,0 +1,141 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+from scipy import fft as sp_fft
+
+
+class FrequencyEngine:
+    """Batched, float32 spectral analysis of grayscale crops
+
+    Hann windows, radial distance grids and high-frequency masks depend
+    only on the crop size, so they are built once per size and reused.
+    Crops are transformed together with a single real-input FFT
+    (scipy.fft keeps float32 input in single precision). The half
+    spectrum it returns is never shifted: distances are laid out in the
+    same unshifted order, and columns mirrored in the full spectrum are
+    weighted twice, so sums and means match the full fftshift'ed spectrum.
+    """
+
+    def __init__(self, crop_size: int = 256, high_freq_radius: float = 0.35, workers: int = 1):
+        self.crop_size = crop_size
+        # Outer ring beyond this fraction of the crop size counts as high frequency
+        self.high_freq_radius = high_freq_radius
+        self.workers = workers
+        self._windows: Dict[int, np.ndarray] = {}
+        self._grids: Dict[int, Dict[str, np.ndarray]] = {}
+
+    # =============== CACHED GEOMETRY ===============
+
+    def window(self, size: int) -> np.ndarray:
+        """2-D Hann window for a size x size crop"""
+        window = self._windows.get(size)
+        if window is None:
+            hann = np.hanning(size).astype(np.float32)
+            window = self._windows[size] = np.outer(hann, hann)
+        return window
+
+    def grid(self, size: int) -> Dict[str, np.ndarray]:
+        """Radial geometry of the rfft2 half spectrum of a size x size crop"""
+        grid = self._grids.get(size)
+        if grid is not None:
+            return grid
+
+        ky = np.fft.fftfreq(size, 1 / size).astype(np.float32)[:, None]
+        kx = np.fft.rfftfreq(size, 1 / size).astype(np.float32)[None, :]
+        dist = np.sqrt(kx ** 2 + ky ** 2)
+
+        # Columns 1..ceil(size/2)-1 stand for themselves and their mirror
+        weights = np.full(kx.shape[1], 2.0, dtype=np.float32)
+        weights[0] = 1.0
+        if size % 2 == 0:
+            weights[-1] = 1.0
+        weights = np.broadcast_to(weights, dist.shape)
+
+        radius = np.rint(dist).astype(np.intp)
+        bins = size // 2 + 1
+        in_profile = radius < bins
+        grid = self._grids[size] = {
+            "dist": dist,
+            "weights": weights,
+            "total_weight": float(weights.sum()),
+            "high_freq_weights": np.where(dist > size * self.high_freq_radius, weights, 0).astype(np.float32),
+            "radius": np.where(in_profile, radius, bins),
+            "radius_weights": np.bincount(radius[in_profile], weights=weights[in_profile], minlength=bins)
+        }
+        return grid
+
+    # =============== CROPS ===============
+
+    def crop_origins(self, h: int, w: int, size: int, grid: int = 1) -> List[Tuple[int, int]]:
+        """Top-left corners of a grid x grid layout of crops; grid=1 is the center crop"""
+        if grid <= 1:
+            return [((h - size) // 2, (w - size) // 2)]
+        ys = np.linspace(0, h - size, grid).round().astype(int)
+        xs = np.linspace(0, w - size, grid).round().astype(int)
+        return [(int(y), int(x)) for y in ys for x in xs]
+
+    def crops(self, gray: np.ndarray, grid: int = 1) -> Tuple[np.ndarray, List[Tuple[int, int]]]:
+        """Stack of square crops (n, size, size) and their origins"""
+        h, w = gray.shape
+        size = min(h, w, self.crop_size)
+        origins = self.crop_origins(h, w, size, grid)
+        stack = np.empty((len(origins), size, size), dtype=np.float32)
+        for i, (y, x) in enumerate(origins):
+            stack[i] = gray[y:y + size, x:x + size]
+        return stack, origins
+
+    # =============== SPECTRA ===============
+
+    def log_magnitude(self, crops: np.ndarray) -> np.ndarray:
+        """log(|FFT| + 1) of each windowed crop, as an unshifted half spectrum"""
+        size = crops.shape[-1]
+        spectrum = sp_fft.rfft2(crops * self.window(size), axes=(-2, -1), workers=self.workers)
+        return np.log1p(np.abs(spectrum))
+
+    def summarize(self, magnitude: np.ndarray) -> Dict[str, np.ndarray]:
+        """High-frequency energy share and spectral flatness per crop"""
+        size = magnitude.shape[-2]
+        grid = self.grid(size)
+        flat = magnitude.reshape(len(magnitude), -1)
+        weights = grid["weights"].ravel()
+
+        total_energy = flat @ weights
+        high_freq = (flat @ grid["high_freq_weights"].ravel()) / (total_energy + 1)
+
+        # Flatness over the non-zero bins, as geometric / arithmetic mean
+        positive = np.where(flat > 0, weights, 0)
+        count = np.maximum(positive.sum(axis=1), 1)
+        log_mean = (np.log(np.where(flat > 0, flat, 1) + 1e-10) * positive).sum(axis=1) / count
+        flatness = np.exp(log_mean) / (total_energy / count + 1e-10)
+        return {"high_freq": high_freq, "flatness": np.minimum(flatness, 1.0)}
+
+    def radial_profile(self, crops: np.ndarray) -> np.ndarray:
+        """Azimuthally averaged power spectrum per crop, one bin per integer radius
+
+        Returns (n, size // 2 + 1); bin r averages |FFT|^2 over frequencies
+        whose distance from DC rounds to r. Corners past the Nyquist circle
+        are left out.
+        """
+        size = crops.shape[-1]
+        grid = self.grid(size)
+        spectrum = sp_fft.rfft2(crops * self.window(size), axes=(-2, -1), workers=self.workers)
+        power = (spectrum.real ** 2 + spectrum.imag ** 2) * grid["weights"]
+
+        # One bincount for the whole batch: crop i uses bins [i * stride, (i + 1) * stride)
+        n, bins = len(crops), size // 2 + 1
+        stride = bins + 1
+        index = grid["radius"].ravel()[None, :] + stride * np.arange(n)[:, None]
+        sums = np.bincount(index.ravel(), weights=power.reshape(n, -1).ravel(), minlength=n * stride)
+        sums = sums.reshape(n, stride)[:, :bins]
+        return (sums / np.maximum(grid["radius_weights"], 1)).astype(np.float32)
+
+    def analyze(self, gray: np.ndarray, grid: int = 1) -> Dict:
+        """Spectral summary of grid x grid crops of a grayscale image"""
+        crops, origins = self.crops(gray, grid)
+        summary = self.summarize(self.log_magnitude(crops))
+        return {
+            "crop_size": crops.shape[-1],
+            "origins": origins,
+            "high_freq": summary["high_freq"].tolist(),
+            "flatness": summary["flatness"].tolist()
+        }
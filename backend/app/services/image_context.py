@@ -0,0 +1,204 @@
+import io
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import cv2
+import exifread
+import numpy as np
+from PIL import Image
+
+from app.services.resolution import decode_within, megapixels_to_pixels, open_image, reduction_factor
+
+# Cached values besides decoded arrays that are worth shipping to worker processes
+_PICKLED_CACHE = ("exif", "dimensions")
+
+
+class ImageContext:
+    """Immutable per-request view of an upload
+
+    Holds the raw bytes and lazily derives the parsed EXIF, decoded uint8
+    RGB array, grayscale plane and model input tensor, each at most once,
+    so every forensic layer and the detector share a single decode.
+    Reduced rasters for statistical checks are decoded separately per
+    pixel budget. Images over max_pixels raise ImageTooLarge on first access.
+    """
+
+    def __init__(
+        self,
+        data: bytes,
+        filename: str = "",
+        file_path: Optional[str] = None,
+        max_pixels: Optional[int] = None
+    ):
+        object.__setattr__(self, "_data", bytes(data))
+        object.__setattr__(self, "_filename", filename)
+        object.__setattr__(self, "_file_path", file_path)
+        object.__setattr__(self, "_max_pixels", max_pixels)
+        object.__setattr__(self, "_cache", {})
+        object.__setattr__(self, "_lock", threading.RLock())
+        # Seconds spent deriving cached values (decode, EXIF, tensors) in this process
+        object.__setattr__(self, "_derive_seconds", [0.0])
+        # Pixel decodes (full or reduced) run by this copy of the context
+        object.__setattr__(self, "_decodes", [0])
+
+    @classmethod
+    def from_file(
+        cls,
+        file_path: str,
+        filename: Optional[str] = None,
+        max_pixels: Optional[int] = None
+    ) -> "ImageContext":
+        """Build a context from a file on disk"""
+        with open(file_path, "rb") as f:
+            data = f.read()
+        return cls(data, filename or os.path.basename(file_path), file_path, max_pixels)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ImageContext is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("ImageContext is immutable")
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Decoded arrays (full and reduced) travel with the context; PIL handles and tensors do not
+        return {
+            "data": self._data,
+            "filename": self._filename,
+            "file_path": self._file_path,
+            "max_pixels": self._max_pixels,
+            "cache": {
+                k: v for k, v in self._cache.items()
+                if k in _PICKLED_CACHE or isinstance(v, np.ndarray)
+            }
+        }
+
+    def __setstate__(self, state: Dict[str, Any]):
+        object.__setattr__(self, "_data", state["data"])
+        object.__setattr__(self, "_filename", state["filename"])
+        object.__setattr__(self, "_file_path", state["file_path"])
+        object.__setattr__(self, "_max_pixels", state["max_pixels"])
+        object.__setattr__(self, "_cache", dict(state["cache"]))
+        object.__setattr__(self, "_lock", threading.RLock())
+        object.__setattr__(self, "_derive_seconds", [0.0])
+        object.__setattr__(self, "_decodes", [0])
+        for value in self._cache.values():
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+
+    def _cached(self, key, compute: Callable[[], Any]) -> Any:
+        """Compute a derived value once, even under concurrent access"""
+        if key in self._cache:
+            return self._cache[key]
+        with self._lock:
+            if key not in self._cache:
+                before, start = self._derive_seconds[0], time.perf_counter()
+                value = compute()
+                # Nested derivations (gray -> rgb) are already inside this span
+                self._derive_seconds[0] = before + time.perf_counter() - start
+                if isinstance(value, np.ndarray):
+                    value.flags.writeable = False
+                self._cache[key] = value
+            return self._cache[key]
+
+    def derive_seconds(self) -> float:
+        """Total time this copy of the context has spent decoding and deriving values"""
+        return self._derive_seconds[0]
+
+    def decodes(self) -> int:
+        """Pixel decodes this copy of the context has run"""
+        return self._decodes[0]
+
+    def _decode(self, decode: Callable[[], Image.Image]) -> np.ndarray:
+        self._decodes[0] += 1
+        return np.asarray(decode())
+
+    # =============== RAW INPUT ===============
+
+    @property
+    def data(self) -> bytes:
+        return self._data
+
+    @property
+    def filename(self) -> str:
+        return self._filename
+
+    @property
+    def file_path(self) -> Optional[str]:
+        return self._file_path
+
+    @property
+    def size(self) -> int:
+        return len(self._data)
+
+    # =============== DERIVED VIEWS ===============
+
+    @property
+    def image(self) -> Image.Image:
+        """Lazily opened PIL image (header only until pixels are requested)"""
+        return self._cached("image", lambda: open_image(io.BytesIO(self._data), self._max_pixels))
+
+    @property
+    def format(self) -> Optional[str]:
+        return self.image.format
+
+    @property
+    def dimensions(self) -> Tuple[int, int]:
+        return self._cached("dimensions", lambda: self.image.size)
+
+    @property
+    def exif(self) -> Dict[str, Any]:
+        """EXIF tags parsed once with exifread"""
+        return self._cached("exif", self._parse_exif)
+
+    @property
+    def rgb(self) -> np.ndarray:
+        """Read-only decoded uint8 RGB array (H, W, 3)"""
+        return self._cached("rgb", lambda: self._decode(lambda: self.image.convert('RGB')))
+
+    @property
+    def gray(self) -> np.ndarray:
+        """Read-only uint8 grayscale plane (H, W)"""
+        return self._cached("gray", lambda: cv2.cvtColor(self.rgb, cv2.COLOR_RGB2GRAY))
+
+    def rgb_within(self, max_megapixels: Optional[float]) -> np.ndarray:
+        """Read-only uint8 RGB array downscaled to at most max_megapixels
+
+        Returns the full-resolution array when the image already fits.
+        """
+        max_pixels = megapixels_to_pixels(max_megapixels)
+        if reduction_factor(self.dimensions, max_pixels) == 1:
+            return self.rgb
+        return self._cached(
+            ("rgb_within", max_pixels),
+            lambda: self._decode(lambda: decode_within(open_image(io.BytesIO(self._data)), max_pixels))
+        )
+
+    def gray_within(self, max_megapixels: Optional[float]) -> np.ndarray:
+        """Read-only uint8 grayscale plane downscaled to at most max_megapixels"""
+        max_pixels = megapixels_to_pixels(max_megapixels)
+        if reduction_factor(self.dimensions, max_pixels) == 1:
+            return self.gray
+        return self._cached(
+            ("gray_within", max_pixels),
+            lambda: cv2.cvtColor(self.rgb_within(max_megapixels), cv2.COLOR_RGB2GRAY)
+        )
+
+    def tensor(self, transform: Callable, max_megapixels: Optional[float] = None):
+        """Model input tensor produced by transform from the shared (or reduced) RGB decode"""
+        return self._cached(
+            ("tensor", transform, megapixels_to_pixels(max_megapixels)),
+            lambda: transform(Image.fromarray(self.rgb_within(max_megapixels)))
+        )
+
+    def _parse_exif(self) -> Dict[str, Any]:
+        try:
+            tags = exifread.process_file(io.BytesIO(self._data), details=False)
+            return {
+                tag: str(value)
+                for tag, value in tags.items()
+                if not tag.startswith('Thumbnail')
+            }
+        except:
+            return {}
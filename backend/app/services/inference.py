@@ -0,0 +1,225 @@
+import copy
+import json
+import os
+from typing import Dict, Iterable, Optional
+
+import timm
+import torch
+
+# Backend name -> artifact file suffix produced by `python -m app.export_models`
+BACKENDS = {
+    "eager": ".pth",
+    "torchscript": ".pt",
+    "onnx": ".onnx",
+    "int8": ".int8.pt",
+    "onnx_int8": ".int8.onnx",
+}
+
+INPUT_SHAPE = (3, 224, 224)
+
+# Seeds the freshly initialised 2-class head when no exported weights exist,
+# so every process (API or inference worker) builds the same model
+HEAD_SEED = 0
+
+
+# Per-image latency (ms) by architecture and backend, written to the artifact
+# directory by `python -m benchmarks.bench_inference --profile`
+LATENCY_PROFILE = "latency.json"
+
+
+def artifact_path(artifact_dir: str, name: str, backend: str) -> str:
+    return os.path.join(artifact_dir, f"{name}{BACKENDS[backend]}")
+
+
+def read_latency_profile(artifact_dir: str) -> Dict[str, Dict[str, float]]:
+    """Benchmarked {architecture: {backend: ms}}; empty when never benchmarked"""
+    path = os.path.join(artifact_dir, LATENCY_PROFILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_latency_profile(artifact_dir: str, architecture: str, latencies: Dict[str, float]):
+    """Merge one architecture's per-backend latencies into the profile"""
+    profile = read_latency_profile(artifact_dir)
+    profile.setdefault(architecture, {}).update(latencies)
+    os.makedirs(artifact_dir, exist_ok=True)
+    with open(os.path.join(artifact_dir, LATENCY_PROFILE), "w") as f:
+        json.dump(profile, f, indent=2, sort_keys=True)
+
+
+def create_eager(architecture: str, pretrained: bool, weights: Optional[str] = None) -> torch.nn.Module:
+    """fp32 timm model; exported weights (when present) pin the 2-class head"""
+    with torch.random.fork_rng(devices=[]):
+        torch.manual_seed(HEAD_SEED)
+        model = timm.create_model(architecture, pretrained=pretrained and weights is None, num_classes=2)
+    if weights is not None:
+        model.load_state_dict(torch.load(weights, map_location="cpu"))
+    return model.eval()
+
+
+def _tensor_bytes(value) -> int:
+    if isinstance(value, torch.Tensor):
+        return value.numel() * value.element_size()
+    return 0
+
+
+class TorchBackend:
+    """Eager, TorchScript or static INT8 TorchScript module"""
+
+    def __init__(self, kind: str, module: torch.nn.Module, device: torch.device, path: Optional[str] = None):
+        self.kind = kind
+        self.device = device
+        self.path = path
+        self.module = module.to(device) if kind != "int8" else module
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        with torch.no_grad():
+            return self.module(batch.to(self.device))
+
+    def memory_bytes(self) -> int:
+        size = sum(_tensor_bytes(v) for v in self.module.state_dict().values())
+        # Frozen TorchScript (fp32 or INT8) folds its weights into constants
+        return size or (os.path.getsize(self.path) if self.path else 0)
+
+
+class OnnxBackend:
+    """ONNX Runtime CPU session (fp32 or static INT8)"""
+
+    def __init__(self, kind: str, path: str, threads: int = 0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.kind = kind
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        logits = self.session.run(None, {self.input_name: batch.cpu().numpy()})[0]
+        return torch.from_numpy(logits)
+
+    def memory_bytes(self) -> int:
+        return os.path.getsize(self.path)
+
+
+def load_backend(
+    kind: str,
+    name: str,
+    architecture: str,
+    artifact_dir: str,
+    pretrained: bool = True,
+    device: Optional[torch.device] = None,
+    threads: int = 0
+):
+    """Build the inference callable for one model: batch (N, 3, 224, 224) -> logits (N, 2)
+
+    threads sizes ONNX Runtime sessions only; torch's intra-op pool is
+    process-wide and set by whoever owns the process (see ImageDetector).
+    """
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{kind}', expected one of {sorted(BACKENDS)}")
+    device = device or torch.device("cpu")
+    path = artifact_path(artifact_dir, name, kind)
+
+    if kind == "eager":
+        weights = path if os.path.exists(path) else None
+        return TorchBackend(kind, create_eager(architecture, pretrained, weights), device)
+
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"{path} not found; run `python -m app.export_models` to build {kind} artifacts"
+        )
+
+    if kind == "torchscript":
+        return TorchBackend(kind, torch.jit.load(path, map_location=device).eval(), device, path)
+
+    if kind == "int8":
+        # Quantized kernels are CPU-only
+        return TorchBackend(kind, torch.jit.load(path, map_location="cpu").eval(), torch.device("cpu"), path)
+
+    return OnnxBackend(kind, path, threads)
+
+
+# =============== EXPORT ===============
+
+def export_torchscript(model: torch.nn.Module, path: str):
+    example = torch.zeros(1, *INPUT_SHAPE)
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example)
+    torch.jit.freeze(traced.eval()).save(path)
+
+
+def export_onnx(model: torch.nn.Module, path: str, opset: int = 17):
+    torch.onnx.export(
+        model,
+        torch.zeros(1, *INPUT_SHAPE),
+        path,
+        input_names=["input"],
+        output_names=["logits"],
+        dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=opset
+    )
+
+
+def quantize_torch_static(model: torch.nn.Module, path: str, calibration: Iterable[torch.Tensor]):
+    """Static INT8 of the conv blocks (FX graph mode, per-channel weights), saved as frozen TorchScript
+
+    Conv + BN (+ ReLU) are fused and run as quantized kernels; ops without
+    an INT8 kernel, such as SiLU and squeeze-excite gates, stay fp32
+    between quantize/dequantize pairs. That pays off on ReLU networks but
+    not on EfficientNets, where onnx_int8 quantizes the whole graph.
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    example = torch.zeros(1, *INPUT_SHAPE)
+    prepared = prepare_fx(copy.deepcopy(model).eval(), get_default_qconfig_mapping("x86"), (example,))
+    with torch.no_grad():
+        for batch in calibration:
+            prepared(batch)
+        traced = torch.jit.trace(convert_fx(prepared), example)
+    torch.jit.freeze(traced.eval()).save(path)
+
+
+def quantize_onnx_static(fp32_path: str, path: str, calibration: Iterable[torch.Tensor]):
+    """Static INT8 (QDQ) quantization calibrated on representative preprocessed batches"""
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self.batches = iter(calibration)
+
+        def get_next(self) -> Optional[Dict]:
+            batch = next(self.batches, None)
+            return None if batch is None else {"input": batch.numpy()}
+
+    quantize_static(
+        fp32_path,
+        path,
+        Reader(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True
+    )
+
+
+# =============== PARITY ===============
+
+def probabilities(backend, batch: torch.Tensor) -> torch.Tensor:
+    """P(AI) per image, as ImageDetector computes it"""
+    return torch.softmax(backend(batch).float(), dim=1)[:, 1].cpu()
+
+
+def parity(reference, candidate, batches: Iterable[torch.Tensor]) -> Dict[str, float]:
+    """Probability drift of a candidate backend against the eager fp32 reference"""
+    drift = torch.cat([
+        (probabilities(candidate, batch) - probabilities(reference, batch)).abs()
+        for batch in batches
+    ])
+    return {"max_abs": float(drift.max()), "mean_abs": float(drift.mean())}
@@ -0,0 +1,319 @@
+import itertools
+import math
+import multiprocessing as mp
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+
+# Seconds between worker liveness checks, busy or idle
+LIVENESS_INTERVAL = 0.5
+
+
+def _worker_main(index: int, config: Dict, requests: mp.Queue, responses: mp.Queue):
+    """Inference worker: load every model once, then serve batches from shared memory"""
+    # Pin this process's thread budget before any kernel runs
+    torch.set_num_threads(config["threads"])
+    torch.set_num_interop_threads(1)
+
+    from app.services.inference import INPUT_SHAPE, load_backend
+
+    models = {}
+    statuses = {}
+    for name, architecture in config["model_specs"].items():
+        start = time.perf_counter()
+        try:
+            model = load_backend(
+                config["backend"], name, architecture, config["artifact_dir"],
+                pretrained=config["pretrained"], threads=config["threads"]
+            )
+            status = {"load_seconds": time.perf_counter() - start, "memory_bytes": model.memory_bytes()}
+            if config["warmup"]:
+                warmup_start = time.perf_counter()
+                model(torch.zeros(1, *INPUT_SHAPE))
+                status["warmup_seconds"] = time.perf_counter() - warmup_start
+                latency_start = time.perf_counter()
+                model(torch.zeros(1, *INPUT_SHAPE))
+                status["latency_ms"] = (time.perf_counter() - latency_start) * 1000
+            models[name] = model
+            statuses[name] = {"state": "ready", **status}
+        except Exception as e:
+            statuses[name] = {"state": "failed", "error": str(e), "load_seconds": time.perf_counter() - start}
+    responses.put(("loaded", index, statuses))
+
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        request_id, name, shm_name, shape = request
+        try:
+            # Spawned workers share the API process's resource tracker, which
+            # already knows the segment; the API process unlinks it
+            shm = shared_memory.SharedMemory(name=shm_name)
+            try:
+                batch = torch.from_numpy(np.ndarray(shape, dtype=np.float32, buffer=shm.buf).copy())
+            finally:
+                shm.close()
+            logits = models[name](batch)
+            responses.put(("result", request_id, logits.float().numpy()))
+        except Exception as e:
+            responses.put(("error", request_id, f"{type(e).__name__}: {e}"))
+
+
+class InferencePool:
+    """Dedicated inference processes with a fixed torch thread budget each
+
+    Preprocessed batches travel to the workers through shared memory; only a
+    small descriptor goes over the worker's bounded request queue, which
+    applies backpressure when every worker is busy. Each request goes to the
+    least loaded worker and is recorded against it, so when a worker dies
+    only its own requests fail; it is replaced with a fresh queue.
+    """
+
+    def __init__(
+        self,
+        model_specs: Dict[str, str],
+        backend: str,
+        artifact_dir: str,
+        pretrained: bool = True,
+        workers: int = 1,
+        threads: int = 1,
+        max_queue_size: int = 8,
+        warmup: bool = True,
+        timeout: float = 60.0
+    ):
+        self.config = {
+            "model_specs": dict(model_specs),
+            "backend": backend,
+            "artifact_dir": artifact_dir,
+            "pretrained": pretrained,
+            "threads": max(1, threads),
+            "warmup": warmup
+        }
+        self.workers = max(1, workers)
+        self.max_queue_size = max_queue_size
+        self.timeout = timeout
+
+        self._ctx = mp.get_context("spawn")
+        self._queues: List[mp.Queue] = []
+        self._responses = None
+        self._processes: List[mp.Process] = []
+        self._pending: Dict[int, Future] = {}
+        self._segments: Dict[int, shared_memory.SharedMemory] = {}
+        # request id -> worker index it was sent to, and requests per worker
+        self._assigned: Dict[int, int] = {}
+        self._load: List[int] = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._turns = itertools.count()
+        self._reader: Optional[threading.Thread] = None
+        self._running = False
+        self._loaded: "queue.Queue" = queue.Queue()
+        self._reported = set()
+
+        # Counters
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.restarts = 0
+
+    def _spawn(self, index: int) -> mp.Process:
+        # A fresh queue per process: one killed mid-get can leave its queue locked
+        self._queues[index] = self._ctx.Queue(maxsize=max(1, math.ceil(self.max_queue_size / self.workers)))
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(index, self.config, self._queues[index], self._responses),
+            name=f"inference-{index}",
+            daemon=True
+        )
+        process.start()
+        return process
+
+    def start(self) -> Dict[str, Dict]:
+        """Start the workers and block until each has loaded its models
+
+        Returns the per-model status reported by the first worker.
+        """
+        self._responses = self._ctx.Queue()
+        self._running = True
+        self._queues = [None] * self.workers
+        self._load = [0] * self.workers
+        self._processes = [self._spawn(i) for i in range(self.workers)]
+        self._reader = threading.Thread(target=self._read_responses, name="inference-results", daemon=True)
+        self._reader.start()
+
+        statuses = [self._loaded.get() for _ in range(self.workers)]
+        return statuses[0]
+
+    def infer(self, name: str, batch: torch.Tensor) -> torch.Tensor:
+        """Run one batch on a worker and wait for its logits (blocking)"""
+        if not self._running:
+            raise RuntimeError("Inference pool is not running")
+
+        array = batch.detach().cpu().numpy().astype(np.float32, copy=False)
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=np.float32, buffer=shm.buf)[:] = array
+
+        request_id = next(self._ids)
+        future: Future = Future()
+        with self._lock:
+            index = self._pick_worker()
+            requests = self._queues[index]
+            self._pending[request_id] = future
+            self._segments[request_id] = shm
+            self._assigned[request_id] = index
+            self._load[index] += 1
+            # infer runs on many threads at once; counters only change under the lock
+            self.submitted += 1
+
+        try:
+            self._send(requests, (request_id, name, shm.name, array.shape), future)
+            logits = future.result(timeout=self.timeout)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            self._release(request_id)
+
+        with self._lock:
+            self.completed += 1
+        return torch.from_numpy(logits)
+
+    def _pick_worker(self) -> int:
+        """Least loaded live worker, taking turns between equally loaded ones"""
+        start = next(self._turns)
+        order = [(start + i) % self.workers for i in range(self.workers)]
+        return min(order, key=lambda index: (not self._processes[index].is_alive(), self._load[index]))
+
+    def _send(self, requests: mp.Queue, request, future: Future):
+        """Put on a bounded worker queue, giving up if the worker dies meanwhile"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                requests.put(request, timeout=min(LIVENESS_INTERVAL, self.timeout))
+                return
+            except queue.Full:
+                if future.done():
+                    # Failed by _check_workers: the queue belonged to a dead worker
+                    future.result()
+                if time.monotonic() >= deadline:
+                    raise
+
+    def _release(self, request_id: int):
+        with self._lock:
+            self._pending.pop(request_id, None)
+            index = self._assigned.pop(request_id, None)
+            if index is not None:
+                self._load[index] -= 1
+            shm = self._segments.pop(request_id, None)
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+    def _read_responses(self):
+        """Resolve futures from worker results and replace workers that died"""
+        next_check = time.monotonic() + LIVENESS_INTERVAL
+        while self._running:
+            # On a timer, not only when idle: under load the queue is never empty
+            if time.monotonic() >= next_check:
+                self._check_workers()
+                next_check = time.monotonic() + LIVENESS_INTERVAL
+            try:
+                message = self._responses.get(timeout=LIVENESS_INTERVAL)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+
+            kind, key, payload = message
+            if kind == "loaded":
+                # Only the first report per slot; replacements load silently
+                if key not in self._reported:
+                    self._reported.add(key)
+                    self._loaded.put(payload)
+                continue
+            with self._lock:
+                future = self._pending.get(key)
+            if future is None or future.done():
+                continue
+            if kind == "result":
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(payload))
+
+    def _check_workers(self):
+        for index, process in enumerate(self._processes):
+            if process.is_alive() or not self._running:
+                continue
+            print(f"⚠ Inference worker {index} exited ({process.exitcode}), restarting")
+            with self._lock:
+                self.restarts += 1
+                # What it was running or had queued is lost; other workers' requests are not
+                futures = [
+                    self._pending[request_id]
+                    for request_id, worker in self._assigned.items()
+                    if worker == index and request_id in self._pending
+                ]
+                self._processes[index] = self._spawn(index)
+            for future in futures:
+                if not future.done():
+                    future.set_exception(RuntimeError(f"Inference worker {index} died"))
+
+    def stats(self) -> Dict:
+        """Pool counters for monitoring"""
+        return {
+            "workers": self.workers,
+            "threads_per_worker": self.config["threads"],
+            "max_queue_size": self.max_queue_size,
+            "alive": sum(p.is_alive() for p in self._processes),
+            "in_flight": len(self._pending),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "restarts": self.restarts
+        }
+
+    def close(self, timeout: float = 5.0):
+        """Stop the workers and release any shared memory still held"""
+        if not self._running:
+            return
+        self._running = False
+        for requests in self._queues:
+            try:
+                requests.put_nowait(None)
+            except queue.Full:
+                pass
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+
+        with self._lock:
+            pending = list(self._pending.items())
+        for request_id, future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Inference pool closed"))
+            self._release(request_id)
+
+
+class PooledModel:
+    """Stand-in for a backend living in the pool: same call signature, logits out"""
+
+    def __init__(self, pool: InferencePool, name: str, memory_bytes: int = 0):
+        self.pool = pool
+        self.name = name
+        self._memory_bytes = memory_bytes
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        return self.pool.infer(self.name, batch)
+
+    def memory_bytes(self) -> int:
+        # Per worker; every worker holds its own copy
+        return self._memory_bytes
@@ -0,0 +1,308 @@
+import hashlib
+import os
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import aiofiles
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.requests import Request
+
+# Leading bytes of the image formats Pillow can decode for us
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"BM", "bmp"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+)
+SNIFF_BYTES = 16
+
+# Room for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadRejected(Exception):
+    """Upload refused while it was being received"""
+
+    status_code = 400
+
+    def __init__(self, detail: str):
+        super().__init__(detail)
+        self.detail = detail
+
+
+class UploadTooLarge(UploadRejected):
+    status_code = 413
+
+
+@dataclass
+class IngestedUpload:
+    file_id: str
+    file_path: str
+    filename: str
+    content_type: str
+    image_type: str
+    size: int
+    sha256: str
+    # Set instead of raising when one part of a multi-file upload is refused
+    error: Optional[str] = None
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """Identify an image format from its first bytes"""
+    for signature, image_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return image_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+async def iter_multipart(request: Request) -> AsyncIterator[Tuple[str, Any]]:
+    """Parse multipart/form-data incrementally as the body arrives
+
+    Yields ("headers", {name: value}) at the start of each part, ("data", bytes)
+    for each body chunk of that part and ("end", None) when it is complete.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadRejected("Expected a multipart/form-data upload")
+
+    events = deque()
+    part_headers: Dict[str, str] = {}
+    header_field = bytearray()
+    header_value = bytearray()
+
+    def on_part_begin():
+        part_headers.clear()
+
+    def on_header_field(data, start, end):
+        header_field.extend(data[start:end])
+
+    def on_header_value(data, start, end):
+        header_value.extend(data[start:end])
+
+    def on_header_end():
+        part_headers[header_field.decode("latin-1").lower()] = header_value.decode("latin-1")
+        header_field.clear()
+        header_value.clear()
+
+    def on_headers_finished():
+        events.append(("headers", dict(part_headers)))
+
+    def on_part_data(data, start, end):
+        events.append(("data", bytes(data[start:end])))
+
+    def on_part_end():
+        events.append(("end", None))
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    async for chunk in request.stream():
+        parser.write(chunk)
+        while events:
+            yield events.popleft()
+
+    parser.finalize()
+    while events:
+        yield events.popleft()
+
+
+async def ingest_upload(
+    request: Request,
+    field: str,
+    upload_dir: str,
+    max_size: int,
+    file_id: Optional[str] = None
+) -> IngestedUpload:
+    """Stream one uploaded file to disk while validating, size-capping and hashing it
+
+    The request is rejected as soon as the first bytes fail the image sniff
+    or the running size passes max_size, without waiting for the rest of
+    the body. Nothing is left on disk when ingestion fails, and only the
+    current chunk is ever held in memory.
+    """
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_size + MULTIPART_OVERHEAD:
+        raise UploadTooLarge(f"File exceeds {max_size} bytes")
+
+    os.makedirs(upload_dir, exist_ok=True)
+    file_id = file_id or str(uuid.uuid4())
+
+    result: Optional[IngestedUpload] = None
+    receiving = False
+    out = None
+    head = bytearray()
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        async for kind, payload in iter_multipart(request):
+            if kind == "headers":
+                _, options = parse_options_header(payload.get("content-disposition", ""))
+                receiving = (
+                    result is None
+                    and options.get(b"name") == field.encode()
+                    and b"filename" in options
+                )
+                if not receiving:
+                    continue
+
+                filename = options[b"filename"].decode("utf-8", "replace") or "image"
+                content_type = payload.get("content-type", "")
+                if not content_type.startswith("image/"):
+                    raise UploadRejected("File must be an image")
+
+                file_path = os.path.join(upload_dir, f"{file_id}{os.path.splitext(filename)[1]}")
+                result = IngestedUpload(file_id, file_path, filename, content_type, "", 0, "")
+                out = await aiofiles.open(file_path, "wb")
+
+            elif kind == "data" and receiving:
+                size += len(payload)
+                if size > max_size:
+                    raise UploadTooLarge(f"File exceeds {max_size} bytes")
+
+                if not result.image_type:
+                    head.extend(payload[:SNIFF_BYTES])
+                    if len(head) >= SNIFF_BYTES:
+                        result.image_type = sniff_image_type(bytes(head)) or ""
+                        if not result.image_type:
+                            raise UploadRejected("File must be an image")
+
+                digest.update(payload)
+                await out.write(payload)
+
+            elif kind == "end" and receiving:
+                receiving = False
+                # Tiny files never filled the sniff window
+                if not result.image_type:
+                    result.image_type = sniff_image_type(bytes(head)) or ""
+                    if not result.image_type:
+                        raise UploadRejected("File must be an image")
+                await out.close()
+                out = None
+
+        if result is None:
+            raise UploadRejected(f"Missing file field '{field}'")
+        if out is not None:
+            raise UploadRejected("Upload ended before the file was complete")
+
+    except BaseException:
+        if out is not None:
+            await out.close()
+        if result is not None and os.path.exists(result.file_path):
+            os.remove(result.file_path)
+        raise
+
+    result.size = size
+    result.sha256 = digest.hexdigest()
+    return result
+
+
+async def ingest_parts(
+    request: Request,
+    field: str,
+    upload_dir: str,
+    max_size: int,
+    max_parts: int,
+    sniff: Callable[[bytes], Optional[str]] = sniff_image_type,
+    sniff_bytes: int = SNIFF_BYTES,
+    max_sizes: Optional[Dict[str, int]] = None
+) -> List[IngestedUpload]:
+    """Stream every file in `field` to its own file, as ingest_upload does for one
+
+    A part that fails the sniff or passes its size cap (max_sizes by sniffed
+    type, else max_size) is cut off, removed and returned with `error` set,
+    while the rest of the request carries on. Parts past max_parts are not
+    written. On any other failure nothing is left on disk.
+    """
+    os.makedirs(upload_dir, exist_ok=True)
+    max_sizes = max_sizes or {}
+
+    parts: List[IngestedUpload] = []
+    current: Optional[IngestedUpload] = None
+    out = None
+    head = bytearray()
+    digest = None
+
+    async def refuse(error: str):
+        nonlocal out
+        if out is not None:
+            await out.close()
+            out = None
+        if os.path.exists(current.file_path):
+            os.remove(current.file_path)
+        current.error = error
+
+    try:
+        async for kind, payload in iter_multipart(request):
+            if kind == "headers":
+                _, options = parse_options_header(payload.get("content-disposition", ""))
+                current = None
+                if options.get(b"name") != field.encode() or b"filename" not in options:
+                    continue
+
+                filename = options[b"filename"].decode("utf-8", "replace") or "image"
+                file_id = str(uuid.uuid4())
+                file_path = os.path.join(upload_dir, f"{file_id}{os.path.splitext(filename)[1]}")
+                current = IngestedUpload(file_id, file_path, filename, payload.get("content-type", ""), "", 0, "")
+                parts.append(current)
+                if len(parts) > max_parts:
+                    current.error = "Batch item limit reached"
+                    continue
+                head.clear()
+                digest = hashlib.sha256()
+                out = await aiofiles.open(file_path, "wb")
+
+            elif kind == "data" and current is not None and current.error is None:
+                current.size += len(payload)
+                if current.size > max_sizes.get(current.image_type, max_size):
+                    await refuse("File too large")
+                    continue
+
+                if not current.image_type:
+                    head.extend(payload[:sniff_bytes - len(head)])
+                    if len(head) >= sniff_bytes:
+                        current.image_type = sniff(bytes(head)) or ""
+                        if not current.image_type:
+                            await refuse("File must be an image")
+                            continue
+
+                digest.update(payload)
+                await out.write(payload)
+
+            elif kind == "end" and current is not None and current.error is None:
+                # Small files never filled the sniff window
+                if not current.image_type:
+                    current.image_type = sniff(bytes(head)) or ""
+                    if not current.image_type:
+                        await refuse("File must be an image")
+                        continue
+                await out.close()
+                out = None
+                current.sha256 = digest.hexdigest()
+
+        if out is not None:
+            raise UploadRejected("Upload ended before the file was complete")
+
+    except BaseException:
+        if out is not None:
+            await out.close()
+        for part in parts:
+            if os.path.exists(part.file_path):
+                os.remove(part.file_path)
+        raise
+
+    return parts
@@ -0,0 +1,247 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import AsyncSessionLocal
+from app.db.models import Job
+from app.services.resolution import ImageTooLarge
+
+JOB_BROKERS = ("local", "celery")
+
+# Failures that will not go away on a retry
+PERMANENT_ERRORS = (ImageTooLarge,)
+
+# handler(db, job) -> id of the stored Analysis
+JobHandler = Callable[[AsyncSession, Job], Awaitable[str]]
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+class JobQueue:
+    """Persistent analysis job queue with leases (visibility timeout) and retries
+
+    The jobs table is the source of truth. Claiming a job is a conditional
+    UPDATE that takes a lease, so a job runs on one worker at a time however
+    it was delivered. Workers extend the lease while they run; a job whose
+    lease expires (its worker died) becomes runnable again, until
+    max_attempts is used up.
+
+    With the local broker, in-process workers (and any `python -m app.worker`
+    processes) poll the table. With Celery the broker only carries job ids.
+    """
+
+    def __init__(
+        self,
+        handler: JobHandler,
+        broker: str = "local",
+        workers: int = 1,
+        visibility_timeout: float = 300.0,
+        max_attempts: int = 3,
+        poll_interval: float = 1.0
+    ):
+        if broker not in JOB_BROKERS:
+            raise ValueError(f"Unknown job broker '{broker}', expected one of {JOB_BROKERS}")
+
+        self.handler = handler
+        self.broker = broker
+        self.workers = workers
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+        # Counters
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+
+    def start(self):
+        """Start the local polling workers (idempotent; none for Celery)"""
+        if self.broker != "local" or self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    def enqueue(self, job_id: str):
+        """Hand a committed job to the broker"""
+        if self.broker == "celery":
+            from app.celery_worker import analyze_job
+            analyze_job.delay(job_id)
+        elif self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _work(self):
+        while True:
+            try:
+                ran = await self.run_next()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠ Job worker error: {e}")
+                ran = False
+            if not ran:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def _runnable(self, now: datetime):
+        return or_(
+            Job.status == "queued",
+            and_(Job.status == "running", Job.lease_expires_at < now)
+        )
+
+    async def claim(self, db: AsyncSession, job_id: Optional[str] = None) -> Optional[Job]:
+        """Lease a specific job, or the oldest runnable one"""
+        now = _now()
+        if job_id is not None:
+            candidates = [job_id]
+        else:
+            candidates = list(await db.scalars(
+                select(Job.id)
+                .where(self._runnable(now))
+                .order_by(Job.created_at)
+                .limit(8)
+            ))
+
+        for candidate in candidates:
+            # Only one worker's UPDATE can match while the job is runnable
+            claimed = (await db.execute(
+                update(Job)
+                .where(Job.id == candidate, self._runnable(now))
+                .values(
+                    status="running",
+                    attempts=Job.attempts + 1,
+                    lease_expires_at=now + timedelta(seconds=self.visibility_timeout),
+                    updated_at=now
+                )
+            )).rowcount
+            await db.commit()
+            if claimed:
+                return await db.get(Job, candidate, populate_existing=True)
+        return None
+
+    async def run_next(self) -> bool:
+        """Claim and run one runnable job; False when there was none"""
+        async with AsyncSessionLocal() as db:
+            job = await self.claim(db)
+            if job is None:
+                return False
+            await self._run(db, job)
+            return True
+
+    async def run_job(self, job_id: str) -> Optional[str]:
+        """Run one delivered job (Celery); returns its status afterwards"""
+        async with AsyncSessionLocal() as db:
+            job = await self.claim(db, job_id)
+            if job is None:
+                # Finished, or leased by a live worker
+                job = await db.get(Job, job_id)
+                return job.status if job is not None else None
+            return await self._run(db, job)
+
+    async def _run(self, db: AsyncSession, job: Job) -> str:
+        if job.attempts > self.max_attempts:
+            # Redelivered after its workers kept dying mid-run
+            return await self._finish(db, job, "failed", error=job.error or "Worker lost too many times")
+
+        work = asyncio.create_task(self.handler(db, job))
+        lease_lost = asyncio.Event()
+        heartbeat = asyncio.create_task(self._heartbeat(job.id, work, lease_lost))
+        try:
+            analysis_id = await work
+        except asyncio.CancelledError:
+            work.cancel()
+            await asyncio.gather(work, return_exceptions=True)
+            await db.rollback()
+            if lease_lost.is_set():
+                # Another worker may have claimed it since; leave its row alone
+                return "running"
+            # Shutdown: give the job back without spending an attempt
+            await db.refresh(job)
+            job.attempts -= 1
+            await self._finish(db, job, "queued")
+            raise
+        except Exception as e:
+            # Rollback expires the row; reload it rather than lazy-loading
+            await db.rollback()
+            await db.refresh(job)
+            error = f"{type(e).__name__}: {e}"
+            if isinstance(e, PERMANENT_ERRORS) or job.attempts >= self.max_attempts:
+                return await self._finish(db, job, "failed", error=error)
+            self.retried += 1
+            return await self._finish(db, job, "queued", error=error)
+        finally:
+            heartbeat.cancel()
+
+        return await self._finish(db, job, "succeeded", analysis_id=analysis_id)
+
+    async def _heartbeat(self, job_id: str, work: asyncio.Task, lease_lost: asyncio.Event):
+        """Keep extending the lease while the job is running
+
+        A failed extension is logged and retried on the next beat. When the
+        lease would run out before that beat, the run is cancelled instead,
+        so a job is never worked on by two workers at once.
+        """
+        interval = self.visibility_timeout / 3
+        expires = time.monotonic() + self.visibility_timeout
+        while True:
+            await asyncio.sleep(interval)
+            extended_at = time.monotonic()
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(
+                        update(Job)
+                        .where(Job.id == job_id, Job.status == "running")
+                        .values(lease_expires_at=_now() + timedelta(seconds=self.visibility_timeout))
+                    )
+                    await db.commit()
+                expires = extended_at + self.visibility_timeout
+            except Exception as e:
+                print(f"⚠ Job {job_id} lease extension failed: {e}")
+                if time.monotonic() + interval >= expires:
+                    print(f"⚠ Job {job_id} lease about to expire, abandoning the run")
+                    lease_lost.set()
+                    work.cancel()
+                    return
+
+    async def _finish(self, db: AsyncSession, job: Job, status: str, error: Optional[str] = None, analysis_id: Optional[str] = None) -> str:
+        job.status = status
+        job.lease_expires_at = None
+        job.error = error
+        job.analysis_id = analysis_id
+        job.updated_at = _now()
+        await db.commit()
+
+        if status == "succeeded":
+            self.succeeded += 1
+        elif status == "failed":
+            self.failed += 1
+        if status in ("succeeded", "failed") and os.path.exists(job.file_path):
+            os.remove(job.file_path)
+        elif status == "queued" and self._wakeup is not None:
+            self._wakeup.set()
+        return status
+
+    def stats(self) -> Dict:
+        """Queue counters for monitoring"""
+        return {
+            "broker": self.broker,
+            "workers": len(self._tasks),
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried
+        }
+
+    async def close(self):
+        """Stop the local workers; a job in progress goes back to the queue"""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._wakeup = None
@@ -0,0 +1,54 @@
+from typing import Dict, Tuple
+
+# Every layer /api/analyze can run, in response order
+ALL_LAYERS = ("digital_footprint", "pixel_physics", "lighting_geometry", "semantic_analysis")
+
+# Share of each layer in the combined score (renormalized over the layers that ran)
+LAYER_WEIGHTS = {
+    "digital_footprint": 0.2,
+    "pixel_physics": 0.3,
+    "lighting_geometry": 0.2,
+    "semantic_analysis": 0.3
+}
+
+LAYER_PRESETS = {
+    # Header and EXIF only: no pixel decode at all
+    "fast": ("digital_footprint",),
+    # Skips the edge/lighting pass, the most expensive forensic layer
+    "standard": ("digital_footprint", "pixel_physics", "semantic_analysis"),
+    "full": ALL_LAYERS
+}
+
+class InvalidLayers(ValueError):
+    """Unknown layer or preset name in a layers= request"""
+
+def resolve_layers(spec: str) -> Tuple[str, ...]:
+    """Expand a comma-separated list of layer and preset names into layers to run
+
+    Decoding, EXIF parsing and preprocessing are shared through the lazy
+    ImageContext, so each layer pulls in only what it needs.
+    """
+    selected = set()
+    for name in (part.strip() for part in spec.split(",")):
+        if not name:
+            continue
+        if name in LAYER_PRESETS:
+            selected.update(LAYER_PRESETS[name])
+        elif name in LAYER_WEIGHTS:
+            selected.add(name)
+        else:
+            options = ", ".join([*LAYER_PRESETS, *ALL_LAYERS])
+            raise InvalidLayers(f"Unknown layer '{name}', expected one of: {options}")
+
+    if not selected:
+        raise InvalidLayers("At least one layer is required")
+    return tuple(layer for layer in ALL_LAYERS if layer in selected)
+
+def combine_scores(results: Dict[str, Dict]) -> float:
+    """Weighted mean of the layer scores that were computed"""
+    total_weight = sum(LAYER_WEIGHTS[layer] for layer in results)
+    return sum(results[layer]["score"] * LAYER_WEIGHTS[layer] for layer in results) / total_weight
+
+def layers_key(layers: Tuple[str, ...]) -> str:
+    """Stable identity of a layer selection, for caching and storage"""
+    return ",".join(layers)
@@ -1,27 +1,78 @@
+import asyncio
+import time
+from typing import Dict, Optional
 import torch
 from app.services.detector import ImageDetector
 
 class ModelManager:
-    """Manage AI models lifecycle"""
-    
-    def __init__(self):
-        self.detector = ImageDetector()
-    
+    """Process-wide model registry: owns the shared detector and its lifecycle"""
+
+    def __init__(self, detector: Optional[ImageDetector] = None):
+        self.detector = detector or ImageDetector()
+        self._load_task: Optional[asyncio.Task] = None
+        self.load_seconds: Optional[float] = None
+
+    def start_loading(self) -> asyncio.Task:
+        """Load models in the background so the server accepts traffic immediately"""
+        if self._load_task is None:
+            self._load_task = asyncio.create_task(self.load_models())
+        return self._load_task
+
     async def load_models(self):
         """Load all models on startup"""
         print("🔄 Loading AI models...")
+        start = time.perf_counter()
         try:
             await self.detector.load_models()
             print("✓ Models loaded successfully")
         except Exception as e:
             print(f"⚠ Model loading failed: {e}")
             print("Continuing in fallback mode")
-    
+        finally:
+            self.load_seconds = time.perf_counter() - start
+
+    def readiness(self) -> Dict:
+        """Per-model load state; ready once loading has finished"""
+        if self._load_task is None:
+            state = "not_started"
+        elif not self._load_task.done():
+            state = "loading"
+        elif self.detector.models or not self.detector.model_specs:
+            state = "ready"
+        else:
+            # Every model failed: requests are served by the heuristic fallback
+            state = "fallback"
+
+        return {
+            "ready": state in ("ready", "fallback"),
+            "state": state,
+            "load_seconds": self.load_seconds,
+            "models": self.detector.model_status
+        }
+
     async def cleanup(self):
         """Cleanup models on shutdown"""
         print("🔄 Cleaning up models...")
+        if self._load_task is not None and not self._load_task.done():
+            self._load_task.cancel()
+            try:
+                await self._load_task
+            except asyncio.CancelledError:
+                pass
+        self._load_task = None
+        await self.detector.close()
         if hasattr(self.detector, 'models'):
             self.detector.models.clear()
+            self.detector.model_status = {name: {"state": "pending"} for name in self.detector.model_specs}
         if torch.cuda.is_available():
             torch.cuda.empty_cache()
         print("✓ Cleanup complete")
+
+# The one registry every route shares
+model_manager = ModelManager()
+
+def get_model_manager() -> ModelManager:
+    return model_manager
+
+def get_detector() -> ImageDetector:
+    return model_manager.detector
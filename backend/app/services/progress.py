@@ -0,0 +1,36 @@
+import asyncio
+from collections import defaultdict
+from typing import Dict, Set
+
+
+class ProgressHub:
+    """In-process fan-out of analysis progress events, keyed by job id
+
+    Jobs run by this process's workers publish each layer as it completes;
+    WebSocket subscribers receive them immediately. Jobs run by other
+    processes publish nowhere visible here, so subscribers only see their
+    final state.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+
+    def subscribe(self, key: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers[key].add(queue)
+        return queue
+
+    def unsubscribe(self, key: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(key)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[key]
+
+    def publish(self, key: str, event: Dict):
+        for queue in self._subscribers.get(key, ()):
+            queue.put_nowait(event)
+
+
+progress_hub = ProgressHub()
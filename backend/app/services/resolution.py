@@ -0,0 +1,66 @@
+import math
+from typing import Optional, Tuple
+
+from PIL import Image
+
+
+class ImageTooLarge(ValueError):
+    """Image dimensions exceed the decompression-bomb limit"""
+
+
+def megapixels_to_pixels(max_megapixels: Optional[float]) -> Optional[int]:
+    """Convert a megapixel budget to pixels (None or 0 means no budget)"""
+    if not max_megapixels:
+        return None
+    return int(max_megapixels * 1_000_000)
+
+
+def check_pixel_limit(size: Tuple[int, int], max_pixels: Optional[int]):
+    """Refuse images whose header declares more than max_pixels"""
+    width, height = size
+    if max_pixels and width * height > max_pixels:
+        raise ImageTooLarge(
+            f"Image is {width}x{height} ({width * height} pixels), limit is {max_pixels}"
+        )
+
+
+def open_image(source, max_pixels: Optional[int] = None) -> Image.Image:
+    """Open an image header (path or file object) and enforce the pixel limit
+
+    Nothing is decoded here, so oversized images are refused before any
+    pixel buffer is allocated.
+    """
+    try:
+        img = Image.open(source)
+    except Image.DecompressionBombError as e:
+        # Pillow's own hard limit (2x Image.MAX_IMAGE_PIXELS) still applies
+        raise ImageTooLarge(str(e))
+    check_pixel_limit(img.size, max_pixels)
+    return img
+
+
+def reduction_factor(size: Tuple[int, int], max_pixels: Optional[int]) -> int:
+    """Smallest integer downscale factor that brings size within max_pixels"""
+    width, height = size
+    if not max_pixels or width * height <= max_pixels:
+        return 1
+    return math.ceil(math.sqrt(width * height / max_pixels))
+
+
+def decode_within(img: Image.Image, max_pixels: Optional[int]) -> Image.Image:
+    """Decode an unloaded image to RGB with at most max_pixels
+
+    JPEGs are scaled in the DCT domain with draft() (1/2, 1/4 or 1/8 while
+    decoding), which skips most of the IDCT work; whatever is left, and
+    every other format, is box-reduced with reduce() by an integer factor.
+    """
+    factor = reduction_factor(img.size, max_pixels)
+    if factor > 1 and img.format == "JPEG":
+        width, height = img.size
+        img.draft("RGB", (math.ceil(width / factor), math.ceil(height / factor)))
+
+    rgb = img.convert("RGB")
+    factor = reduction_factor(rgb.size, max_pixels)
+    if factor > 1:
+        rgb = rgb.reduce(factor)
+    return rgb
@@ -0,0 +1,116 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class ResultCache:
+    """Two-tier cache of analysis responses keyed by upload content
+
+    The memory tier is a bounded in-process LRU with TTL. The optional
+    Redis tier is shared between workers and survives restarts; any Redis
+    error degrades to memory-only instead of failing the request.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 3600,
+        redis_url: Optional[str] = None,
+        namespace: str = "truthlens:analysis"
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.namespace = namespace
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+
+        self._redis = None
+        if redis_url:
+            try:
+                import redis.asyncio as aioredis
+                self._redis = aioredis.from_url(redis_url)
+            except ImportError:
+                print("⚠ redis package not installed, result cache is memory-only")
+
+        # Counters
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.redis_errors = 0
+
+    def make_key(self, content_hash: str, engine_version: str, model_name: str, layers: str = "") -> str:
+        return f"{self.namespace}:{engine_version}:{model_name}:{layers}:{content_hash}"
+
+    async def get(self, key: str) -> Optional[Dict]:
+        """Look a result up in memory, then Redis"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return value
+            del self._entries[key]
+
+        if self._redis is not None:
+            try:
+                raw = await self._redis.get(key)
+            except Exception as e:
+                self._redis_failed(e)
+                raw = None
+            if raw is not None:
+                value = json.loads(raw)
+                self._remember(key, value)
+                self.redis_hits += 1
+                return value
+
+        return None
+
+    async def set(self, key: str, value: Dict):
+        """Store a result in every tier"""
+        self._remember(key, value)
+
+        if self._redis is not None:
+            try:
+                await self._redis.set(key, json.dumps(value, default=str), ex=int(self.ttl))
+            except Exception as e:
+                self._redis_failed(e)
+
+    def record_db_hit(self):
+        self.db_hits += 1
+
+    def record_miss(self):
+        self.misses += 1
+
+    def _remember(self, key: str, value: Dict):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _redis_failed(self, error: Exception):
+        if self.redis_errors == 0:
+            print(f"⚠ Result cache Redis tier unavailable: {error}")
+        self.redis_errors += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring"""
+        lookups = self.memory_hits + self.redis_hits + self.db_hits + self.misses
+        hits = lookups - self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "redis_enabled": self._redis is not None,
+            "memory_hits": self.memory_hits,
+            "redis_hits": self.redis_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "redis_errors": self.redis_errors,
+            "hit_ratio": hits / lookups if lookups else 0.0
+        }
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.close()
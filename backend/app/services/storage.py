@@ -0,0 +1,341 @@
+import asyncio
+import glob
+import os
+import re
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import AsyncSessionLocal
+from app.db.models import StoredFile
+from app.services.ingest import SNIFF_BYTES, sniff_image_type
+
+# Extension per sniffed image type, so static serving picks the right content type
+IMAGE_EXTENSIONS = {"jpeg": ".jpg", "png": ".png", "gif": ".gif", "bmp": ".bmp", "tiff": ".tif", "webp": ".webp"}
+
+# Path, relative to the store root, of a stored upload or a file derived from
+# it; temp files, files mid-write and anything else under the root never match
+STORED_PATH = re.compile(r"[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(_[0-9]+)?(\.[a-z]+)?")
+
+# Rows considered per eviction query
+SWEEP_BATCH = 500
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class UploadStore:
+    """Content-addressed upload storage with reference counts and retention
+
+    Each distinct upload is stored once, at root/ab/cd/<sha256><ext>, however
+    often it is uploaded. Files derived from it (thumbnails) sit next to it
+    as <sha256>_<suffix> and share its lifetime. A stored_files row records
+    their total size, when the upload was last uploaded or referenced, and
+    how many Analysis rows point at it. Files are written under a temporary
+    name and renamed into place, so readers never see a partial file.
+
+    The sweeper evicts unreferenced files once they are orphan_grace seconds
+    old, any file unused for max_age seconds, and then the least recently
+    used files (unreferenced first) while the total is over max_bytes,
+    derived files included. A referenced file keeps its row and count when
+    evicted; the next identical upload puts it back.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_age: float = 0,
+        max_bytes: int = 0,
+        orphan_grace: float = 3600.0,
+        sweep_interval: float = 600.0
+    ):
+        self.root = root
+        self.tmp_dir = os.path.join(root, "tmp")
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.orphan_grace = orphan_grace
+        self.sweep_interval = sweep_interval
+        self._task: Optional[asyncio.Task] = None
+
+        # Counters
+        self.writes = 0
+        self.deduplicated = 0
+        self.sweeps = 0
+        self.evicted_files = 0
+        self.reclaimed_bytes = 0
+
+    def directory_for(self, content_hash: str) -> str:
+        """Directory holding an upload and the files derived from it"""
+        return os.path.join(self.root, content_hash[:2], content_hash[2:4])
+
+    def path_for(self, content_hash: str, image_type: str) -> str:
+        return os.path.join(self.directory_for(content_hash), f"{content_hash}{IMAGE_EXTENSIONS.get(image_type, '')}")
+
+    def derived_paths(self, content_hash: str) -> List[str]:
+        return glob.glob(os.path.join(glob.escape(self.directory_for(content_hash)), f"{content_hash}_*"))
+
+    def _derived_size(self, content_hash: str) -> int:
+        size = 0
+        for path in self.derived_paths(content_hash):
+            try:
+                size += os.path.getsize(path)
+            except FileNotFoundError:
+                continue
+        return size
+
+    # =============== WRITES ===============
+
+    async def put_file(self, tmp_path: str, content_hash: str, image_type: str) -> str:
+        """Move a fully written temporary file into the store; returns its path"""
+        path = self.path_for(content_hash, image_type)
+        try:
+            size = os.path.getsize(tmp_path) + self._derived_size(content_hash)
+            # Recorded before the rename, so an eviction racing with this
+            # upload sees the fresh row and puts the file back (see _evict)
+            await self._touch(content_hash, path, size)
+            existed = await asyncio.to_thread(self._place, tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self.writes += 1
+        self.deduplicated += 1 if existed else 0
+        return path
+
+    async def put_bytes(self, data: bytes, content_hash: str) -> str:
+        """Store an upload that is only in memory"""
+        image_type = sniff_image_type(data[:SNIFF_BYTES]) or ""
+        tmp_path = await asyncio.to_thread(self._write_temp, data)
+        return await self.put_file(tmp_path, content_hash, image_type)
+
+    def _write_temp(self, data: bytes) -> str:
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return tmp_path
+
+    def _place(self, tmp_path: str, path: str) -> bool:
+        # Renamed over any existing copy: the bytes are identical, and it
+        # restores a copy evicted while this upload was in flight
+        existed = os.path.exists(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        return existed
+
+    async def _touch(self, content_hash: str, path: str, size: int):
+        """Create or refresh the file's row (and undo any eviction)"""
+        now = _now()
+        async with AsyncSessionLocal() as db:
+            for _ in range(2):
+                updated = (await db.execute(
+                    update(StoredFile)
+                    .where(StoredFile.content_hash == content_hash)
+                    .values(path=path, size=size, last_used_at=now, evicted_at=None)
+                )).rowcount
+                if not updated:
+                    db.add(StoredFile(content_hash=content_hash, path=path, size=size, ref_count=0, last_used_at=now))
+                try:
+                    await db.commit()
+                    return
+                except IntegrityError:
+                    # Inserted concurrently by an identical upload; update it instead
+                    await db.rollback()
+
+    async def record_derived(self, content_hash: str):
+        """Count files just written next to an upload toward its size"""
+        async with AsyncSessionLocal() as db:
+            live = (StoredFile.content_hash == content_hash, StoredFile.evicted_at.is_(None))
+            path = await db.scalar(select(StoredFile.path).where(*live))
+            if path is None:
+                return
+            try:
+                size = await asyncio.to_thread(lambda: os.path.getsize(path) + self._derived_size(content_hash))
+            except FileNotFoundError:
+                return
+            await db.execute(update(StoredFile).where(*live).values(size=size))
+            await db.commit()
+
+    async def is_evicted(self, db: AsyncSession, content_hash: Optional[str]) -> bool:
+        """Whether an upload's files were evicted (and its URLs would 404)"""
+        if not content_hash:
+            return False
+        evicted_at = await db.scalar(select(StoredFile.evicted_at).where(StoredFile.content_hash == content_hash))
+        return evicted_at is not None
+
+    async def add_reference(self, db: AsyncSession, content_hash: str):
+        """Count one more Analysis row pointing at a stored file
+
+        Runs in the caller's transaction, alongside the Analysis insert.
+        """
+        await db.execute(
+            update(StoredFile)
+            .where(StoredFile.content_hash == content_hash)
+            .values(ref_count=StoredFile.ref_count + 1, last_used_at=_now())
+        )
+
+    # =============== RETENTION ===============
+
+    def start(self):
+        """Start the background sweeper (idempotent)"""
+        if self._task is None and self.sweep_interval > 0:
+            self._task = asyncio.create_task(self._sweep_forever())
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                reclaimed = await self.sweep()
+                if reclaimed:
+                    print(f"✓ Upload sweep reclaimed {reclaimed / 1e6:.1f} MB")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠ Upload sweep failed: {e}")
+
+    async def sweep(self) -> int:
+        """Evict files by the retention rules; returns the bytes reclaimed"""
+        now = _now()
+        reclaimed = await asyncio.to_thread(self._sweep_temp_files)
+
+        live = StoredFile.evicted_at.is_(None)
+        if self.orphan_grace is not None:
+            reclaimed += await self._evict_where(
+                live, StoredFile.ref_count == 0,
+                StoredFile.last_used_at < now - timedelta(seconds=self.orphan_grace)
+            )
+        if self.max_age:
+            reclaimed += await self._evict_where(live, StoredFile.last_used_at < now - timedelta(seconds=self.max_age))
+        if self.max_bytes:
+            reclaimed += await self._evict_over_budget()
+
+        self.sweeps += 1
+        return reclaimed
+
+    async def _evict_where(self, *conditions) -> int:
+        reclaimed = 0
+        while True:
+            async with AsyncSessionLocal() as db:
+                rows = (await db.execute(
+                    select(StoredFile.content_hash, StoredFile.path, StoredFile.size, StoredFile.ref_count, StoredFile.last_used_at)
+                    .where(*conditions)
+                    .order_by(StoredFile.last_used_at)
+                    .limit(SWEEP_BATCH)
+                )).all()
+            freed = 0
+            for row in rows:
+                freed += await self._evict(row)
+            reclaimed += freed
+            if len(rows) < SWEEP_BATCH or not freed:
+                return reclaimed
+
+    async def _evict_over_budget(self) -> int:
+        reclaimed = 0
+        while True:
+            async with AsyncSessionLocal() as db:
+                total = await db.scalar(
+                    select(func.coalesce(func.sum(StoredFile.size), 0)).where(StoredFile.evicted_at.is_(None))
+                )
+                if total <= self.max_bytes:
+                    return reclaimed
+                rows = (await db.execute(
+                    select(StoredFile.content_hash, StoredFile.path, StoredFile.size, StoredFile.ref_count, StoredFile.last_used_at)
+                    .where(StoredFile.evicted_at.is_(None))
+                    # Unreferenced first, then least recently used
+                    .order_by(StoredFile.ref_count > 0, StoredFile.last_used_at)
+                    .limit(SWEEP_BATCH)
+                )).all()
+
+            freed = 0
+            for row in rows:
+                if total <= self.max_bytes:
+                    break
+                evicted = await self._evict(row)
+                freed += evicted
+                total -= evicted
+            reclaimed += freed
+            if not freed:
+                return reclaimed
+
+    async def _evict(self, row) -> int:
+        """Evict one file unless it was used after the sweep looked at it"""
+        async with AsyncSessionLocal() as db:
+            unchanged = (
+                StoredFile.content_hash == row.content_hash,
+                StoredFile.last_used_at == row.last_used_at,
+                StoredFile.evicted_at.is_(None)
+            )
+            if row.ref_count == 0:
+                claim = delete(StoredFile).where(*unchanged, StoredFile.ref_count == 0)
+            else:
+                claim = update(StoredFile).where(*unchanged).values(evicted_at=_now())
+            claimed = (await db.execute(claim)).rowcount
+            await db.commit()
+        if not claimed:
+            return 0
+
+        # Set aside first: an identical upload may have refreshed the row and
+        # renamed its copy into place since the claim; if so, keep the file.
+        # tmp/ is never served, and a crash here leaves the file to the temp sweep
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        evicting = os.path.join(self.tmp_dir, f"{os.path.basename(row.path)}.evicting")
+        try:
+            os.replace(row.path, evicting)
+        except FileNotFoundError:
+            return 0
+        async with AsyncSessionLocal() as db:
+            current = await db.get(StoredFile, row.content_hash)
+        if current is not None and current.evicted_at is None:
+            os.replace(evicting, row.path)
+            return 0
+
+        os.remove(evicting)
+        for path in self.derived_paths(row.content_hash):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+        self.evicted_files += 1
+        self.reclaimed_bytes += row.size
+        return row.size
+
+    def _sweep_temp_files(self) -> int:
+        """Remove temporary files abandoned by crashed uploads"""
+        if not os.path.isdir(self.tmp_dir):
+            return 0
+        reclaimed = 0
+        cutoff = time.time() - (self.orphan_grace or 0)
+        for entry in os.scandir(self.tmp_dir):
+            try:
+                stat = entry.stat()
+                if entry.is_file() and stat.st_mtime < cutoff:
+                    os.remove(entry.path)
+                    reclaimed += stat.st_size
+            except FileNotFoundError:
+                continue
+        self.reclaimed_bytes += reclaimed
+        return reclaimed
+
+    def stats(self) -> Dict:
+        """Storage counters for monitoring"""
+        return {
+            "writes": self.writes,
+            "deduplicated": self.deduplicated,
+            "sweeps": self.sweeps,
+            "evicted_files": self.evicted_files,
+            "reclaimed_bytes": self.reclaimed_bytes
+        }
+
+    async def close(self):
+        """Stop the sweeper"""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
@@ -0,0 +1,58 @@
+import os
+import tempfile
+from typing import Dict, Sequence
+
+import numpy as np
+from PIL import Image
+
+# Pillow format names and file extensions for THUMBNAIL_FORMAT
+THUMBNAIL_FORMATS = {"webp": ("WEBP", ".webp"), "jpeg": ("JPEG", ".jpg")}
+
+
+def thumbnail_name(content_hash: str, size: int, fmt: str = "webp") -> str:
+    """File name of one thumbnail; identical uploads share it"""
+    return f"{content_hash}_{size}{THUMBNAIL_FORMATS[fmt][1]}"
+
+
+def write_thumbnails(
+    rgb: np.ndarray,
+    directory: str,
+    content_hash: str,
+    sizes: Sequence[int],
+    fmt: str = "webp",
+    quality: int = 80
+) -> Dict[int, str]:
+    """Write thumbnails (longest edge <= size) of an already decoded raster
+
+    Names depend only on the content hash and size, so a thumbnail that
+    already exists is left alone. New files are written to a temporary
+    name and renamed into place; readers never see a partial file.
+    Returns size -> file name.
+    """
+    if fmt not in THUMBNAIL_FORMATS:
+        raise ValueError(f"Unknown thumbnail format '{fmt}', expected one of {tuple(THUMBNAIL_FORMATS)}")
+    pil_format, _ = THUMBNAIL_FORMATS[fmt]
+    os.makedirs(directory, exist_ok=True)
+
+    names = {}
+    # thumbnail() swaps in a resized image; the shared read-only raster is untouched
+    source = Image.fromarray(rgb)
+    # Largest first, each one scaled down from the previous
+    for size in sorted(sizes, reverse=True):
+        name = thumbnail_name(content_hash, size, fmt)
+        names[size] = name
+        path = os.path.join(directory, name)
+        source.thumbnail((size, size), Image.Resampling.LANCZOS, reducing_gap=2.0)
+        if os.path.exists(path):
+            continue
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                source.save(f, pil_format, quality=quality)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return names
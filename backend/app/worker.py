@@ -0,0 +1,50 @@
+"""
+Standalone analysis job worker for the local (database) job queue
+
+Runs the /api/jobs pipeline in its own process so API servers can be sized
+for connections and workers for analysis. Any number can run against the
+same database; jobs whose worker dies are picked up again once their lease
+(JOB_VISIBILITY_TIMEOUT) expires.
+
+Usage (from backend/):
+    python -m app.worker [--workers N]
+"""
+import argparse
+import asyncio
+
+from app.api import analyze
+from app.api.jobs import job_queue
+from app.core.config import settings
+from app.services.model_manager import model_manager
+
+
+async def run(workers: int):
+    analyze.executor.start()
+    await model_manager.load_models()
+
+    job_queue.workers = workers
+    job_queue.start()
+    print(f"✓ Job worker polling with {workers} worker(s)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await job_queue.close()
+        await analyze.executor.shutdown()
+        await model_manager.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=max(1, settings.JOB_WORKERS))
+    args = parser.parse_args()
+
+    if job_queue.broker != "local":
+        parser.error(f"JOB_QUEUE={job_queue.broker}; run `celery -A app.celery_worker worker` instead")
+    try:
+        asyncio.run(run(args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Database access load test: sync Session vs AsyncSession inside async handlers
+
+Replays a concurrent mix of analyze-style writes (insert one Analysis row
+with realistic layer JSON, commit) and history reads (latest 20 rows)
+through two handler sets that mirror the routes before and after the
+async move: the old one uses the sync Session on the event loop (and
+refreshes after commit), the new one AsyncSession without the refresh.
+Alongside each run a probe measures event-loop lag, i.e. how long other
+coroutines (uploads, WebSocket sends, health checks) were kept waiting.
+
+SQLite has no network round-trip, so it understates the difference; point
+--database-url at Postgres for representative numbers.
+
+Usage (from backend/):
+    python -m benchmarks.bench_db [--database-url postgresql://...] [--requests 2000]
+        [--concurrency 32] [--write-every 5] [--seed-rows 5000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.database import Base, async_database_url, pool_options
+from app.db.models import Analysis
+
+LAYER = {
+    "name": "Pixel Physics",
+    "score": 42.0,
+    "confidence": 0.7,
+    "findings": ["✓ Normal ELA variance: 12.3", "✓ Natural noise pattern"] * 4,
+    "details": {"ela_variance": 12.3, "noise_uniformity": 0.61, "color_diversity": 0.83}
+}
+METADATA = {
+    "exif": {f"EXIF Tag{i}": "x" * 24 for i in range(40)},
+    "file_info": {"size": 2_400_000, "format": "JPEG", "dimensions": [4000, 3000]}
+}
+
+
+def make_row(created_at: datetime) -> Analysis:
+    return Analysis(
+        id=str(uuid.uuid4()),
+        filename="photo.jpg",
+        file_path="uploads/photo.jpg",
+        thumbnail_url="/uploads/photo.jpg",
+        verdict="suspicious",
+        confidence=0.4,
+        overall_score=42.0,
+        digital_footprint=LAYER,
+        pixel_physics=LAYER,
+        lighting_geometry=LAYER,
+        semantic_analysis=LAYER,
+        metadata_=METADATA,
+        processing_time=1.2,
+        created_at=created_at
+    )
+
+
+def history_query():
+    return select(Analysis).order_by(Analysis.created_at.desc()).limit(20)
+
+
+class SyncHandlers:
+    """Sync Session on the event loop, as the routes did before"""
+
+    def __init__(self, url: str):
+        self.engine = create_engine(url, **pool_options(url))
+        self.sessions = sessionmaker(bind=self.engine)
+
+    async def write(self):
+        db = self.sessions()
+        try:
+            row = make_row(datetime.now(timezone.utc))
+            db.add(row)
+            db.commit()
+            db.refresh(row)
+        finally:
+            db.close()
+
+    async def read(self):
+        db = self.sessions()
+        try:
+            return db.scalars(history_query()).all()
+        finally:
+            db.close()
+
+    async def close(self):
+        self.engine.dispose()
+
+
+class AsyncHandlers:
+    """AsyncSession, no post-commit refresh"""
+
+    def __init__(self, url: str):
+        self.engine = create_async_engine(async_database_url(url), **pool_options(url))
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+
+    async def write(self):
+        async with self.sessions() as db:
+            db.add(make_row(datetime.now(timezone.utc)))
+            await db.commit()
+
+    async def read(self):
+        async with self.sessions() as db:
+            return (await db.scalars(history_query())).all()
+
+    async def close(self):
+        await self.engine.dispose()
+
+
+async def loop_lag(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """Worst delay between when a timer was due and when it ran"""
+    worst = 0.0
+    while not stop.is_set():
+        due = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - due)
+    return worst
+
+
+async def run(handlers, requests: int, concurrency: int, write_every: int) -> dict:
+    counter = iter(range(requests))
+    latencies = {"read": [], "write": []}
+
+    async def client():
+        for i in counter:
+            kind = "write" if i % write_every == 0 else "read"
+            start = time.perf_counter()
+            await getattr(handlers, kind)()
+            latencies[kind].append(time.perf_counter() - start)
+
+    stop = asyncio.Event()
+    probe = asyncio.create_task(loop_lag(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    seconds = time.perf_counter() - start
+    stop.set()
+    lag = await probe
+
+    def percentiles(values):
+        ordered = sorted(values)
+        return {
+            "p50_ms": round(statistics.median(ordered) * 1000, 2),
+            "p95_ms": round(ordered[int(len(ordered) * 0.95) - 1] * 1000, 2)
+        }
+
+    return {
+        "requests": requests,
+        "seconds": round(seconds, 3),
+        "throughput_rps": round(requests / seconds, 1),
+        "read": percentiles(latencies["read"]),
+        "write": percentiles(latencies["write"]),
+        "max_loop_lag_ms": round(lag * 1000, 2)
+    }
+
+
+def seed(url: str, rows: int):
+    engine = create_engine(url)
+    if engine.dialect.name == "sqlite":
+        # Readers and the writer would otherwise lock each other out under concurrency
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    start = datetime.now(timezone.utc) - timedelta(days=30)
+    session.add_all(make_row(start + timedelta(seconds=i)) for i in range(rows))
+    session.commit()
+    session.close()
+    engine.dispose()
+
+
+async def main_async(args, url: str) -> dict:
+    results = {}
+    for name, factory in (("sync", SyncHandlers), ("async", AsyncHandlers)):
+        handlers = factory(url)
+        await run(handlers, min(100, args.requests), args.concurrency, args.write_every)  # warm-up
+        results[name] = await run(handlers, args.requests, args.concurrency, args.write_every)
+        await handlers.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="sync SQLAlchemy URL (default: temporary SQLite file)")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--write-every", type=int, default=5, help="one write per N requests")
+    parser.add_argument("--seed-rows", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = args.database_url or f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        seed(url, args.seed_rows)
+        results = asyncio.run(main_async(args, url))
+
+    print(json.dumps({
+        "database": url.split(":", 1)[0],
+        "concurrency": args.concurrency,
+        "write_every": args.write_every,
+        "seed_rows": args.seed_rows,
+        "results": results
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
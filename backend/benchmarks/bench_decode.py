@@ -0,0 +1,96 @@
+"""
+Per-request decode benchmark: shared ImageContext vs per-consumer decoding
+
+"per_consumer" reproduces the pre-ImageContext pipeline, where the route,
+each forensic layer, the EXIF extraction and the detector opened and
+decoded the upload independently. "shared" hands one ImageContext to all
+of them. Peak memory is the tracemalloc peak (numpy buffers; PIL's
+internal decode buffers are not traced).
+
+Usage (from backend/):
+    python -m benchmarks.bench_decode [--sizes 1024 2048 4096] [--repeat 3]
+"""
+import argparse
+import io
+import json
+import statistics
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+from app.services.detector import ImageDetector
+from app.services.forensics import ForensicAnalyzer
+from app.services.image_context import ImageContext
+
+
+def make_jpeg(size: int) -> bytes:
+    rng = np.random.default_rng(size)
+    y, x = np.mgrid[0:size, 0:size]
+    base = np.stack([x, y, (x + y) / 2], axis=2) * (200.0 / size)
+    arr = np.clip(base + rng.normal(0, 12, (size, size, 3)) + 20, 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(arr).save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def per_consumer(data: bytes, forensics: ForensicAnalyzer, transform):
+    fresh = lambda: ImageContext(data, "bench.jpg")
+    Image.open(io.BytesIO(data))  # route header read
+    forensics.analyze_digital_footprint(fresh())
+    forensics.analyze_pixel_physics(fresh())
+    forensics.analyze_lighting_geometry(fresh())
+    fresh().exif  # route metadata
+    fresh().tensor(transform)  # detector
+
+
+def shared(data: bytes, forensics: ForensicAnalyzer, transform):
+    context = ImageContext(data, "bench.jpg")
+    context.exif
+    forensics.analyze_digital_footprint(context)
+    forensics.analyze_pixel_physics(context)
+    forensics.analyze_lighting_geometry(context)
+    context.tensor(transform)
+
+
+def measure(fn, repeat: int):
+    times = []
+    peak = 0
+    for _ in range(repeat):
+        tracemalloc.start()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return statistics.median(times) * 1000, peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1024, 2048, 4096])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    forensics = ForensicAnalyzer()
+    transform = ImageDetector().transform
+    results = []
+
+    for size in args.sizes:
+        data = make_jpeg(size)
+        before_ms, before_mb = measure(lambda: per_consumer(data, forensics, transform), args.repeat)
+        after_ms, after_mb = measure(lambda: shared(data, forensics, transform), args.repeat)
+        results.append({
+            "size": size,
+            "per_consumer_ms": round(before_ms, 1),
+            "shared_ms": round(after_ms, 1),
+            "per_consumer_peak_mb": round(before_mb, 1),
+            "shared_peak_mb": round(after_mb, 1)
+        })
+
+    print(json.dumps({"repeat": args.repeat, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+CPU inference backend benchmark: latency and throughput at batch sizes 1/8/32
+
+Exports one timm architecture to a temporary directory (fp32 reference,
+TorchScript, static INT8 TorchScript, ONNX, static INT8 ONNX), then times each backend's forward
+pass and reports its P(AI) drift against eager fp32.
+
+Usage (from backend/):
+    python -m benchmarks.bench_inference [--arch efficientnet_b7] [--batch-sizes 1 8 32]
+        [--backends eager torchscript int8 onnx onnx_int8] [--repeat 5] [--threads 0]
+        [--profile [DIR]]
+
+--profile merges the per-image latency at the smallest batch size into
+DIR/latency.json (default MODEL_ARTIFACT_DIR), which the detector uses to
+order its cascade cheapest first. Benchmark every DETECTOR_MODELS
+architecture on the serving machine with the serving backend.
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import torch
+
+from app.core.config import settings
+from app.services.inference import (
+    BACKENDS, INPUT_SHAPE, artifact_path, create_eager, export_onnx,
+    export_torchscript, load_backend, parity, quantize_onnx_static, quantize_torch_static,
+    write_latency_profile
+)
+
+
+def inputs(batch_size: int, seed: int = 0) -> torch.Tensor:
+    generator = torch.Generator().manual_seed(seed)
+    return torch.randn(batch_size, *INPUT_SHAPE, generator=generator)
+
+
+def export_all(arch: str, pretrained: bool, backends, directory: str):
+    model = create_eager(arch, pretrained)
+    torch.save(model.state_dict(), artifact_path(directory, "bench", "eager"))
+    calibration = [inputs(8, seed) for seed in range(4)]
+    if "torchscript" in backends:
+        export_torchscript(model, artifact_path(directory, "bench", "torchscript"))
+    if "int8" in backends:
+        quantize_torch_static(model, artifact_path(directory, "bench", "int8"), calibration)
+    if "onnx" in backends or "onnx_int8" in backends:
+        export_onnx(model, artifact_path(directory, "bench", "onnx"))
+    if "onnx_int8" in backends:
+        quantize_onnx_static(
+            artifact_path(directory, "bench", "onnx"),
+            artifact_path(directory, "bench", "onnx_int8"),
+            calibration
+        )
+
+
+def time_forward(backend, batch: torch.Tensor, repeat: int) -> float:
+    backend(batch)  # warm-up
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        backend(batch)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--arch", default="efficientnet_b7")
+    parser.add_argument("--pretrained", action="store_true")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=0, help="torch/ORT intra-op threads (0 = default)")
+    parser.add_argument("--profile", nargs="?", const=settings.MODEL_ARTIFACT_DIR, default=None,
+                        help="write the cascade latency profile to this directory")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        export_all(args.arch, args.pretrained, args.backends, directory)
+        reference = load_backend("eager", "bench", args.arch, directory, pretrained=False)
+        check = [inputs(8, seed) for seed in range(10, 12)]
+
+        for kind in args.backends:
+            backend = load_backend(kind, "bench", args.arch, directory, pretrained=False, threads=args.threads)
+            drift = parity(reference, backend, check)
+            for batch_size in args.batch_sizes:
+                seconds = time_forward(backend, inputs(batch_size), args.repeat)
+                results.append({
+                    "backend": kind,
+                    "batch_size": batch_size,
+                    "latency_ms": round(seconds * 1000, 2),
+                    "per_image_ms": round(seconds * 1000 / batch_size, 2),
+                    "throughput_ips": round(batch_size / seconds, 1),
+                    "max_prob_drift": drift["max_abs"],
+                    "memory_mb": round(backend.memory_bytes() / (1024 * 1024), 1)
+                })
+
+    if args.profile:
+        smallest = min(args.batch_sizes)
+        write_latency_profile(args.profile, args.arch, {
+            result["backend"]: result["per_image_ms"]
+            for result in results if result["batch_size"] == smallest
+        })
+
+    print(json.dumps({
+        "arch": args.arch,
+        "threads": torch.get_num_threads(),
+        "cpu_count": os.cpu_count(),
+        "repeat": args.repeat,
+        "results": results
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
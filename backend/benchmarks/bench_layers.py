@@ -0,0 +1,222 @@
+"""
+Per-layer and per-helper benchmark for both forensic engines
+
+Runs ForensicAnalyzer (app/services/forensics.py) and
+AdvancedForensicAnalyzer (app/mock_main.py) over the deterministic corpus
+in benchmarks/corpus.py, timing the decode, every layer and every helper
+on its own. Timings are the median of --repeat runs; peak_mb is the
+tracemalloc peak of one extra traced run (numpy buffers; Pillow's
+internal decode buffers are not traced).
+
+Output is JSON with one record per (image, engine, stage, name), in a
+stable order, so files from two commits diff cleanly. --compare prints the
+records that got slower than a previous run.
+
+Usage (from backend/):
+    python -m benchmarks.bench_layers [--sizes 256 1024 2048 4096 7680]
+        [--contents gradient noise photo] [--formats jpeg50 jpeg75 jpeg95 png webp]
+        [--repeat 3] [--output results.json] [--compare baseline.json] [--threshold 1.2]
+"""
+import argparse
+import io
+import json
+import logging
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import cv2
+import numpy as np
+import PIL
+from PIL import Image
+
+from app.mock_main import AdvancedForensicAnalyzer
+from app.services.forensics import ForensicAnalyzer
+from app.services.image_context import ImageContext
+from benchmarks import corpus
+
+
+def measure(fn: Callable, repeat: int) -> Dict:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "ms": round(statistics.median(times) * 1000, 2),
+        "peak_mb": round(peak / (1024 * 1024), 2)
+    }
+
+
+def forensics_cases(data: bytes, analyzer: ForensicAnalyzer) -> Dict[str, Dict[str, Callable]]:
+    # Warm context so layers and helpers are timed without the shared decode
+    context = ImageContext(data, "bench")
+    rgb, gray = context.rgb, context.gray
+    context.exif
+
+    return {
+        "decode": {
+            "rgb+gray+exif": lambda: (lambda c: (c.rgb, c.gray, c.exif))(ImageContext(data, "bench"))
+        },
+        "layer": {
+            "digital_footprint": lambda: analyzer.analyze_digital_footprint(context),
+            "pixel_physics": lambda: analyzer.analyze_pixel_physics(context),
+            "lighting_geometry": lambda: analyzer.analyze_lighting_geometry(context)
+        },
+        "helper": {
+            "_perform_ela": lambda: analyzer._perform_ela(rgb),
+            "_analyze_noise": lambda: analyzer._analyze_noise(gray),
+            "_analyze_colors": lambda: analyzer._analyze_colors(rgb)
+        }
+    }
+
+
+def mock_cases(data: bytes, analyzer: AdvancedForensicAnalyzer) -> Dict[str, Dict[str, Callable]]:
+    def decode():
+        img = Image.open(io.BytesIO(data))
+        img_rgb = img.convert('RGB')
+        arr = np.array(img_rgb, dtype=np.float32)
+        return img, img_rgb, arr, np.mean(arr, axis=2)
+
+    img, img_rgb, arr, gray = decode()
+
+    return {
+        "decode": {
+            "rgb+gray": decode
+        },
+        "layer": {
+            "digital_footprint": lambda: analyzer._analyze_metadata(img, "bench"),
+            "pixel_physics": lambda: analyzer._analyze_pixels(img_rgb, arr, gray, "bench"),
+            "lighting_geometry": lambda: analyzer._analyze_structure(arr, gray),
+            "semantic_analysis": lambda: analyzer._analyze_patterns(arr, gray)
+        },
+        "helper": {
+            "_compute_ela": lambda: analyzer._compute_ela(arr),
+            "_analyze_noise_patterns": lambda: analyzer._analyze_noise_patterns(gray),
+            "_analyze_color_distribution": lambda: analyzer._analyze_color_distribution(arr),
+            "_detect_edges": lambda: analyzer._detect_edges(gray),
+            "_detect_blocking": lambda: analyzer._detect_blocking(gray),
+            "_compute_skewness": lambda: analyzer._compute_skewness(gray.flatten()),
+            "_compute_local_contrast": lambda: analyzer._compute_local_contrast(gray),
+            "_analyze_texture_patches": lambda: analyzer._analyze_texture_patches(gray),
+            "_analyze_frequency_domain": lambda: analyzer._analyze_frequency_domain(gray),
+            "_analyze_histogram": lambda: analyzer._analyze_histogram(gray),
+            "_estimate_compressibility": lambda: analyzer._estimate_compressibility(arr)
+        }
+    }
+
+
+def run(args) -> List[Dict]:
+    engines = {
+        "forensics": (forensics_cases, ForensicAnalyzer()),
+        "mock": (mock_cases, AdvancedForensicAnalyzer())
+    }
+    records = []
+
+    for image in corpus.generate(args.sizes, args.contents, args.formats):
+        for engine in args.engines:
+            build, analyzer = engines[engine]
+            for stage, cases in build(image["data"], analyzer).items():
+                for name, fn in cases.items():
+                    records.append({
+                        "image": image["name"],
+                        "content": image["content"],
+                        "format": image["format"],
+                        "width": image["width"],
+                        "height": image["height"],
+                        "bytes": len(image["data"]),
+                        "engine": engine,
+                        "stage": stage,
+                        "name": name,
+                        **measure(fn, args.repeat)
+                    })
+        print(f"✓ {image['name']}", file=sys.stderr)
+
+    return records
+
+
+def record_key(record: Dict) -> str:
+    return f"{record['image']} {record['engine']} {record['stage']} {record['name']}"
+
+
+def compare(records: List[Dict], baseline_path: str, threshold: float) -> List[Dict]:
+    """Records at least `threshold` times slower than the same record in a previous run"""
+    with open(baseline_path) as f:
+        baseline = {record_key(r): r for r in json.load(f)["results"]}
+
+    regressions = []
+    for record in records:
+        before = baseline.get(record_key(record))
+        # Sub-millisecond timings are too noisy to flag
+        if before is None or before["ms"] < 1.0:
+            continue
+        ratio = record["ms"] / before["ms"]
+        if ratio >= threshold:
+            regressions.append({
+                "key": record_key(record),
+                "before_ms": before["ms"],
+                "after_ms": record["ms"],
+                "ratio": round(ratio, 2)
+            })
+    return regressions
+
+
+def main():
+    # exifread logs one line per image without EXIF (every PNG/WebP)
+    logging.getLogger("exifread").setLevel(logging.ERROR)
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(corpus.SIZES), help="long edge in pixels (4:3)")
+    parser.add_argument("--contents", nargs="+", default=list(corpus.CONTENTS), choices=corpus.CONTENTS)
+    parser.add_argument("--formats", nargs="+", default=list(corpus.FORMATS), choices=list(corpus.FORMATS))
+    parser.add_argument("--engines", nargs="+", default=["forensics", "mock"], choices=["forensics", "mock"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    parser.add_argument("--compare", help="previous JSON output to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.2, help="slowdown ratio reported by --compare")
+    args = parser.parse_args()
+
+    records = run(args)
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pillow": PIL.__version__,
+            "opencv": cv2.__version__,
+            "machine": platform.machine()
+        },
+        "config": {
+            "sizes": args.sizes,
+            "contents": args.contents,
+            "formats": args.formats,
+            "engines": args.engines,
+            "repeat": args.repeat
+        },
+        "results": records
+    }
+    if args.compare:
+        report["regressions"] = compare(records, args.compare, args.threshold)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if report.get("regressions"):
+        print(f"⚠ {len(report['regressions'])} regressions over {args.threshold}x", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
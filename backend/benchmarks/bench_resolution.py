@@ -0,0 +1,122 @@
+"""
+Resolution policy benchmark: latency vs score drift per megapixel budget
+
+For each image size and budget, runs the ForensicAnalyzer layers, the
+mock AdvancedForensicAnalyzer and the detector preprocessing, and
+compares every layer score against the full-resolution run. "tensor_mad"
+is the mean absolute difference of the 224x224 model input, a proxy for
+detector drift that does not need model weights.
+
+Usage (from backend/):
+    python -m benchmarks.bench_resolution [--sizes 2 12 24 50] [--budgets 0 8 4 2 1] [--repeat 1]
+"""
+import argparse
+import io
+import json
+import math
+import statistics
+import time
+
+import numpy as np
+from PIL import Image
+
+from app.mock_main import AdvancedForensicAnalyzer
+from app.services.detector import ImageDetector
+from app.services.forensics import ForensicAnalyzer, run_layers
+from app.services.image_context import ImageContext
+from app.services.resolution import decode_within, megapixels_to_pixels, open_image, reduction_factor
+
+
+def make_photo(megapixels: float) -> bytes:
+    """Deterministic 4:3 JPEG with smooth shading, edges and sensor-like noise"""
+    width = int(math.sqrt(megapixels * 1_000_000 * 4 / 3))
+    height = width * 3 // 4
+    rng = np.random.default_rng(width)
+    y, x = np.ogrid[0:height, 0:width]
+    shade = 60 + 120 * (x / width) * (0.5 + 0.5 * np.cos(y / height * np.pi))
+    rings = 40 * (np.hypot(x - width / 2, y - height / 2) % (width / 8) < width / 32)
+    gray = shade + rings
+    arr = np.stack([gray, gray * 0.9 + 10, gray * 0.8 + 20], axis=2)
+    arr = np.clip(arr + rng.normal(0, 6, arr.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(arr).save(buffer, 'JPEG', quality=92)
+    return buffer.getvalue()
+
+
+def timed(fn, repeat: int):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, statistics.median(times) * 1000
+
+
+def run_forensics(data: bytes, budget: float):
+    context = ImageContext(data, "bench.jpg")
+    layers = run_layers(context, ForensicAnalyzer.LAYERS, {
+        "pixel_physics": budget,
+        "lighting_geometry": budget
+    })
+    return {name: layer["score"] for name, layer in layers.items()}
+
+
+def run_mock(data: bytes, budget: float, analyzer: AdvancedForensicAnalyzer):
+    img = open_image(io.BytesIO(data))
+    max_pixels = megapixels_to_pixels(budget)
+    reduced = None
+    if reduction_factor(img.size, max_pixels) > 1:
+        reduced = decode_within(open_image(io.BytesIO(data)), max_pixels)
+    layers = analyzer.analyze(img, "bench.jpg", "bench.jpg", reduced)
+    return {name: layer["score"] for name, layer in layers.items()}
+
+
+def run_tensor(data: bytes, budget: float, transform):
+    return ImageContext(data, "bench.jpg").tensor(transform, budget).numpy()
+
+
+def drift(scores, baseline):
+    return max(abs(scores[name] - baseline[name]) for name in baseline)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=float, nargs="+", default=[2, 12, 24, 50], help="megapixels")
+    parser.add_argument("--budgets", type=float, nargs="+", default=[0, 8, 4, 2, 1], help="megapixels, 0 = full")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    # Full resolution always runs first as the drift baseline
+    budgets = [0] + [budget for budget in args.budgets if budget]
+    mock = AdvancedForensicAnalyzer()
+    transform = ImageDetector().transform
+    results = []
+
+    for size in args.sizes:
+        data = make_photo(size)
+        baseline = None
+        for budget in budgets:
+            forensic_scores, forensic_ms = timed(lambda: run_forensics(data, budget), args.repeat)
+            mock_scores, mock_ms = timed(lambda: run_mock(data, budget, mock), args.repeat)
+            tensor, tensor_ms = timed(lambda: run_tensor(data, budget, transform), args.repeat)
+            if baseline is None:
+                baseline = (forensic_scores, mock_scores, tensor)
+
+            results.append({
+                "megapixels": size,
+                "budget": budget or "full",
+                "forensics_ms": round(forensic_ms, 1),
+                "mock_ms": round(mock_ms, 1),
+                "tensor_ms": round(tensor_ms, 1),
+                "forensics_max_score_drift": drift(forensic_scores, baseline[0]),
+                "mock_max_score_drift": drift(mock_scores, baseline[1]),
+                "tensor_mad": round(float(np.abs(tensor - baseline[2]).mean()), 4),
+                "forensics_scores": forensic_scores,
+                "mock_scores": mock_scores
+            })
+
+    print(json.dumps({"repeat": args.repeat, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
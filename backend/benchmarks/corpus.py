@@ -0,0 +1,75 @@
+"""
+Deterministic synthetic image corpus for the benchmarks
+
+Every image is a pure function of (content, size, format), so two runs on
+different commits measure byte-identical inputs.
+"""
+import io
+from typing import Dict, Iterator, Tuple
+
+import numpy as np
+from PIL import Image
+
+CONTENTS = ("gradient", "noise", "photo")
+
+# name -> (Pillow format, save options)
+FORMATS: Dict[str, Tuple[str, Dict]] = {
+    "jpeg50": ("JPEG", {"quality": 50}),
+    "jpeg75": ("JPEG", {"quality": 75}),
+    "jpeg95": ("JPEG", {"quality": 95}),
+    "png": ("PNG", {}),
+    "webp": ("WEBP", {"quality": 90}),
+}
+
+# Long edge in pixels; images are 4:3
+SIZES = (256, 1024, 2048, 4096, 7680)
+
+
+def render(content: str, width: int, height: int) -> np.ndarray:
+    """uint8 RGB array for one content type"""
+    rng = np.random.default_rng((CONTENTS.index(content), width, height))
+    y, x = np.ogrid[0:height, 0:width]
+
+    if content == "gradient":
+        # Smooth, noise-free shading: the "too clean" end of the spectrum
+        r = 255.0 * x / max(width - 1, 1) + 0 * y
+        g = 255.0 * y / max(height - 1, 1) + 0 * x
+        b = (r + g) / 2
+        arr = np.stack([r, g, b], axis=2)
+    elif content == "noise":
+        arr = rng.integers(0, 256, (height, width, 3)).astype(np.float64)
+    elif content == "photo":
+        # Shading, hard-edged rings and mild sensor-like noise
+        shade = 60 + 120 * (x / width) * (0.5 + 0.5 * np.cos(y / height * np.pi))
+        rings = 40 * (np.hypot(x - width / 2, y - height / 2) % (width / 8) < width / 32)
+        gray = shade + rings
+        arr = np.stack([gray, gray * 0.9 + 10, gray * 0.8 + 20], axis=2)
+        arr = arr + rng.normal(0, 6, arr.shape)
+    else:
+        raise ValueError(f"Unknown content: {content}")
+
+    return np.clip(arr, 0, 255).astype(np.uint8)
+
+
+def encode(arr: np.ndarray, fmt: str) -> bytes:
+    pil_format, options = FORMATS[fmt]
+    buffer = io.BytesIO()
+    Image.fromarray(arr).save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def generate(sizes=SIZES, contents=CONTENTS, formats=tuple(FORMATS)) -> Iterator[Dict]:
+    """Yield corpus entries in a stable order, rendering each raster once"""
+    for size in sizes:
+        width, height = size, size * 3 // 4
+        for content in contents:
+            arr = render(content, width, height)
+            for fmt in formats:
+                yield {
+                    "name": f"{content}-{fmt}-{width}x{height}",
+                    "content": content,
+                    "format": fmt,
+                    "width": width,
+                    "height": height,
+                    "data": encode(arr, fmt),
+                }
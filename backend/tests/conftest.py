@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# Point the app at a throwaway SQLite database and upload dir before it is imported
+_tmp = tempfile.mkdtemp(prefix="truthlens-test-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmp, 'test.db')}")
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_tmp, "uploads"))
+os.environ.setdefault("ANALYSIS_EXECUTOR", "thread")
+os.makedirs(os.environ["UPLOAD_DIR"], exist_ok=True)
@@ -0,0 +1,48 @@
+import pytest
+from app.services.analysis_store import MemoryAnalysisStore, SQLiteAnalysisStore
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def make_store(backend, tmp_path, clock, **limits):
+    if backend == "memory":
+        return MemoryAnalysisStore(clock=clock, **limits)
+    return SQLiteAnalysisStore(str(tmp_path / "analyses.db"), clock=clock, **limits)
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_store_evicts_least_recently_read_and_expires_by_age(backend, tmp_path):
+    clock = Clock()
+    store = make_store(backend, tmp_path, clock, max_entries=3, ttl=60)
+    for i in range(3):
+        clock.now += 1
+        store.put(f"a{i}", {"id": f"a{i}", "score": i / 2})
+
+    # Reading a0 makes a1 the least recently used
+    clock.now += 1
+    assert store.get("a0") == {"id": "a0", "score": 0.0}
+    store.put("a3", {"id": "a3", "score": 1.5})
+    assert store.get("a1") is None
+    assert [r["id"] for r in store.recent(2)] == ["a2", "a3"]
+    assert [r["id"] for r in store.recent(10)] == ["a0", "a2", "a3"]
+
+    clock.now += 58.5
+    assert len(store) == 2
+    stats = store.stats()
+    assert stats["backend"] == backend
+    assert (stats["entries"], stats["hits"], stats["misses"], stats["evicted"], stats["expired"]) == (2, 1, 1, 1, 1)
+    store.close()
+
+def test_sqlite_store_survives_reopen(tmp_path):
+    path = str(tmp_path / "analyses.db")
+    store = SQLiteAnalysisStore(path)
+    store.put("a0", {"id": "a0", "layers": {"pixel_physics": {"score": 12.5}}})
+    store.close()
+
+    reopened = SQLiteAnalysisStore(path)
+    assert reopened.get("a0")["layers"]["pixel_physics"]["score"] == 12.5
+    assert len(reopened) == 1
+    reopened.close()
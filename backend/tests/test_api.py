@@ -19,3 +19,390 @@ def test_get_models():
     assert response.status_code == 200
     assert isinstance(response.json(), list)
     assert "ensemble" in response.json()
+
+def make_jpeg(seed=0, size=(96, 128)):
+    import io
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    buffer = io.BytesIO()
+    Image.fromarray(rng.integers(0, 255, (*size, 3), dtype=np.uint8)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+def test_analyze_reuses_result_for_identical_upload():
+    data = make_jpeg(seed=1)
+    first = client.post("/api/analyze", files={"image": ("a.jpg", data, "image/jpeg")})
+    second = client.post("/api/analyze", files={"image": ("b.jpg", data, "image/jpeg")})
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert client.get("/api/cache/stats").json()["memory_hits"] >= 1
+
+    # The repeat reuses the result but is its own history entry
+    assert second.json()["id"] != first.json()["id"]
+    assert second.json()["filename"] == "b.jpg"
+    assert second.json()["layers"] == first.json()["layers"]
+    assert second.json()["image_url"] == first.json()["image_url"]
+    assert client.get(f"/api/analysis/{second.json()['id']}").json()["filename"] == "b.jpg"
+
+def test_analyze_runs_only_requested_layers():
+    data = make_jpeg(seed=3)
+    fast = client.post("/api/analyze?layers=fast", files={"image": ("a.jpg", data, "image/jpeg")})
+    assert fast.status_code == 200
+    assert fast.json()["layers_computed"] == ["digital_footprint"]
+    assert list(fast.json()["layers"]) == ["digital_footprint"]
+    assert fast.json()["overall_score"] == fast.json()["layers"]["digital_footprint"]["score"]
+
+    # Same bytes with a different selection is a different result
+    picked = client.post("/api/analyze?layers=fast,pixel_physics", files={"image": ("a.jpg", data, "image/jpeg")})
+    assert picked.json()["id"] != fast.json()["id"]
+    assert picked.json()["layers_computed"] == ["digital_footprint", "pixel_physics"]
+
+    bad = client.post("/api/analyze?layers=bogus", files={"image": ("a.jpg", data, "image/jpeg")})
+    assert bad.status_code == 400
+
+def test_thumbnails_are_served_as_immutable(monkeypatch):
+    from PIL import Image
+    import io
+    import os
+    from app.core.config import settings
+
+    result = client.post("/api/analyze?layers=fast", files={"image": ("t.jpg", make_jpeg(seed=4, size=(600, 800)), "image/jpeg")}).json()
+    assert set(result["thumbnails"]) == {"160", "480"}
+    assert result["image_url"].startswith("/uploads/") and result["image_url"] not in result["thumbnails"].values()
+
+    thumb = client.get(result["thumbnails"]["160"])
+    assert thumb.status_code == 200
+    assert max(Image.open(io.BytesIO(thumb.content)).size) == 160
+    assert "immutable" in thumb.headers["cache-control"]
+
+    # Revalidation costs a 304 with no body
+    again = client.get(result["thumbnails"]["160"], headers={"If-None-Match": thumb.headers["etag"]})
+    assert again.status_code == 304 and again.content == b""
+
+    item = next(item for item in client.get("/api/history").json() if item["id"] == result["id"])
+    assert item["thumbnail_url"] == result["thumbnails"]["160"]
+
+    # Only final stored files are served: not temp files, job uploads or files set aside
+    from app.api.analyze import upload_path
+    original = upload_path(result["image_url"])
+    os.makedirs(os.path.join(settings.UPLOAD_DIR, "jobs"), exist_ok=True)
+    for path in (original + ".evicting", os.path.join(os.path.dirname(original), "tmpabc.tmp"), os.path.join(settings.UPLOAD_DIR, "jobs", "j.jpg")):
+        with open(path, "wb") as f:
+            f.write(b"partial")
+        url = "/uploads/" + os.path.relpath(path, settings.UPLOAD_DIR).replace(os.sep, "/")
+        assert client.get(url).status_code == 404
+        os.remove(path)
+
+    # Stored rows keep the thumbnails they were written with
+    monkeypatch.setattr(settings, "THUMBNAIL_SIZES", [320])
+    monkeypatch.setattr(settings, "THUMBNAIL_FORMAT", "jpeg")
+    assert client.get(f"/api/analysis/{result['id']}").json()["thumbnails"] == result["thumbnails"]
+
+def test_failed_thumbnails_are_counted_and_left_out(monkeypatch):
+    from app.api import analyze
+    from app.core.metrics import THUMBNAIL_FAILURES
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(analyze, "write_thumbnails", fail)
+    failures = THUMBNAIL_FAILURES._value.get()
+    result = client.post("/api/analyze?layers=fast", files={"image": ("f.jpg", make_jpeg(seed=22), "image/jpeg")})
+
+    assert result.status_code == 200
+    assert result.json()["thumbnails"] == {}
+    assert THUMBNAIL_FAILURES._value.get() == failures + 1
+    item = next(item for item in client.get("/api/history").json() if item["id"] == result.json()["id"])
+    assert item["thumbnail_url"] == result.json()["image_url"]
+
+@pytest.mark.asyncio
+async def test_evicted_uploads_take_their_thumbnails_and_urls_with_them(monkeypatch):
+    import os
+    from datetime import datetime, timedelta, timezone
+    from sqlalchemy import update
+    from app.api.analyze import upload_path, upload_store
+    from app.db.database import AsyncSessionLocal
+    from app.db.models import Analysis, StoredFile
+
+    data = make_jpeg(seed=50, size=(600, 800))
+    result = client.post("/api/analyze?layers=fast", files={"image": ("e.jpg", data, "image/jpeg")}).json()
+    paths = [upload_path(url) for url in (result["image_url"], *result["thumbnails"].values())]
+    async with AsyncSessionLocal() as db:
+        content_hash = (await db.get(Analysis, result["id"])).content_hash
+        # Thumbnails count toward the upload's size, and so toward UPLOAD_MAX_BYTES
+        assert (await db.get(StoredFile, content_hash)).size == sum(os.path.getsize(p) for p in paths)
+        await db.execute(
+            update(StoredFile).where(StoredFile.content_hash == content_hash)
+            .values(last_used_at=datetime.now(timezone.utc) - timedelta(days=2))
+        )
+        await db.commit()
+
+    monkeypatch.setattr(upload_store, "max_age", 86400)
+    await upload_store.sweep()
+    assert not any(os.path.exists(p) for p in paths)
+
+    evicted = client.get(f"/api/analysis/{result['id']}").json()
+    assert (evicted["image_url"], evicted["image_evicted"], evicted["thumbnails"]) == (None, True, {})
+    item = next(item for item in client.get("/api/history").json() if item["id"] == result["id"])
+    assert item["image_evicted"] and item["thumbnail_url"] is None
+
+    # The cached result would link to missing files; the same upload stores them again
+    again = client.post("/api/analyze?layers=fast", files={"image": ("e.jpg", data, "image/jpeg")}).json()
+    assert all(os.path.exists(upload_path(url)) for url in (again["image_url"], *again["thumbnails"].values()))
+
+def test_batch_streams_one_line_per_archive_member():
+    import io
+    import json
+    import zipfile
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("one.jpg", make_jpeg(seed=10))
+        zf.writestr("two.jpg", make_jpeg(seed=11))
+        zf.writestr("notes.txt", "not an image")
+
+    response = client.post(
+        "/api/analyze/batch",
+        files=[("files", ("images.zip", archive.getvalue(), "application/zip"))]
+    )
+    lines = [json.loads(line) for line in response.text.splitlines()]
+
+    assert response.status_code == 200
+    assert sorted(line["filename"] for line in lines[:-1]) == ["one.jpg", "two.jpg"]
+    assert all(line["status"] == "ok" for line in lines[:-1])
+    assert lines[-1]["done"] and lines[-1]["succeeded"] == 2
+
+    history = client.get("/api/history").json()
+    assert {"one.jpg", "two.jpg"} <= {item["filename"] for item in history}
+
+def test_batch_sniffs_and_caps_each_plain_file(monkeypatch):
+    import json
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", 8 * 1024)
+    response = client.post(
+        "/api/analyze/batch",
+        files=[
+            ("files", ("ok.jpg", make_jpeg(seed=12), "image/jpeg")),
+            ("files", ("fake.jpg", b"%PDF-1.7" + b"\0" * 600, "image/jpeg")),
+            ("files", ("big.jpg", make_jpeg(seed=13, size=(256, 256)), "image/jpeg"))
+        ]
+    )
+    lines = {line["filename"]: line for line in map(json.loads, response.text.splitlines()[:-1])}
+
+    assert response.status_code == 200
+    assert lines["ok.jpg"]["status"] == "ok"
+    assert lines["fake.jpg"]["error"] == "File must be an image"
+    assert lines["big.jpg"]["error"] == "File too large"
+
+def test_analyze_rejects_oversized_and_disguised_uploads(monkeypatch):
+    import os
+    from app.core.config import settings
+
+    def stored_files():
+        return {os.path.join(root, name) for root, _, names in os.walk(settings.UPLOAD_DIR) for name in names}
+
+    before = stored_files()
+
+    fake = client.post("/api/analyze", files={"image": ("x.jpg", b"%PDF-1.7" + b"\0" * 64, "image/jpeg")})
+    assert fake.status_code == 400
+
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", 1024)
+    big = client.post("/api/analyze", files={"image": ("big.jpg", make_jpeg(seed=2, size=(256, 256)), "image/jpeg")})
+    assert big.status_code == 413
+
+    # Partially written files are removed
+    assert stored_files() == before
+
+def test_metrics_expose_stage_timings():
+    response = client.post(
+        "/api/analyze?timings=true",
+        files={"image": ("m.jpg", make_jpeg(seed=3), "image/jpeg")}
+    )
+    assert response.status_code == 200
+    assert {"upload", "decode", "forensics", "inference", "db_commit", "total"} <= set(response.json()["timings"])
+
+    metrics = client.get("/metrics").text
+    assert 'truthlens_layer_seconds_count{layer="pixel_physics"}' in metrics
+    assert "truthlens_verdicts_total" in metrics
+    assert 'truthlens_detector_fallbacks_total{reason=' in metrics
+    assert 'truthlens_db_query_seconds_count{operation="INSERT"}' in metrics
+
+def test_ready_is_separate_from_health():
+    # Without the lifespan nothing has started loading
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["state"] == "not_started"
+    assert client.get("/health").status_code == 200
+
+@pytest.mark.asyncio
+async def test_job_is_redelivered_after_its_worker_is_lost():
+    from datetime import datetime, timedelta, timezone
+    from app.api.jobs import job_queue
+    from sqlalchemy import update
+    from app.db.database import AsyncSessionLocal
+    from app.db.models import Job
+
+    created = client.post("/api/jobs?layers=fast", files={"image": ("j.jpg", make_jpeg(seed=20), "image/jpeg")})
+    assert created.status_code == 202
+    job_id = created.json()["id"]
+    assert created.headers["location"] == f"/api/jobs/{job_id}"
+    assert created.json()["status"] == "queued"
+
+    # A worker claims the job and dies; its lease keeps other workers off
+    async with AsyncSessionLocal() as db:
+        assert (await job_queue.claim(db)).id == job_id
+    assert not await job_queue.run_next()
+    assert client.get(f"/api/jobs/{job_id}").json()["status"] == "running"
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(Job).where(Job.id == job_id).values(lease_expires_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+        )
+        await db.commit()
+
+    assert await job_queue.run_next()
+    job = client.get(f"/api/jobs/{job_id}").json()
+    assert job["status"] == "succeeded"
+    assert job["attempts"] == 2
+    assert job["result"]["layers_computed"] == ["digital_footprint"]
+    assert client.get("/api/jobs/missing").status_code == 404
+
+@pytest.mark.asyncio
+async def test_history_pages_by_keyset_with_filters():
+    from datetime import datetime, timezone
+    from app.db.database import AsyncSessionLocal
+    from app.db.models import Analysis
+
+    # Rows in a year no other test writes to; two share a timestamp
+    stamps = [datetime(2001, 1, day, tzinfo=timezone.utc) for day in (1, 2, 2, 3, 4)]
+    async with AsyncSessionLocal() as db:
+        db.add_all(
+            Analysis(
+                id=f"history-{i}", filename=f"h{i}.jpg", file_path=f"h{i}.jpg",
+                verdict="fake" if i % 2 else "real", confidence=0.5, overall_score=20.0 * i,
+                metadata_={}, processing_time=0.1, created_at=stamp
+            )
+            for i, stamp in enumerate(stamps)
+        )
+        await db.commit()
+
+    window = {"since": "2001-01-01T00:00:00+00:00", "until": "2002-01-01T00:00:00+00:00"}
+    seen, cursor = [], None
+    while True:
+        page = client.get("/api/history", params={**window, "limit": 2, **({"cursor": cursor} if cursor else {})})
+        assert page.status_code == 200
+        assert "pixel_physics" not in page.json()[0]
+        seen += [item["id"] for item in page.json()]
+        cursor = page.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+    assert seen == ["history-4", "history-3", "history-2", "history-1", "history-0"]
+
+    fake = client.get("/api/history", params={**window, "verdict": "fake", "min_score": 30}).json()
+    assert [item["id"] for item in fake] == ["history-3"]
+    assert client.get("/api/history", params={"cursor": "not a cursor"}).status_code == 400
+
+def test_stream_multiplexes_layer_results_before_verdicts():
+    import base64
+
+    with client.websocket_connect("/api/ws/analyze") as ws:
+        for stream_id, seed in (("a", 30), ("b", 31)):
+            ws.send_json({"type": "analyze", "id": stream_id, "filename": f"{stream_id}.jpg",
+                          "image": base64.b64encode(make_jpeg(seed=seed)).decode()})
+        ws.send_json({"type": "analyze", "id": "c", "image": base64.b64encode(b"not an image").decode()})
+
+        messages = {"a": [], "b": [], "c": []}
+        while not (messages["a"] and messages["a"][-1]["type"] == "result"
+                   and messages["b"] and messages["b"][-1]["type"] == "result" and messages["c"]):
+            message = ws.receive_json()
+            messages[message["id"]].append(message)
+
+    assert messages["c"][0]["type"] == "error"
+    for stream_id in ("a", "b"):
+        *layers, result = messages[stream_id]
+        assert {m["layer"] for m in layers} == set(result["result"]["layers"])
+        assert result["result"]["verdict"] in ("real", "suspicious", "edited", "fake")
+
+def test_stream_survives_bad_frames_and_cancels_queued_analyses(monkeypatch):
+    import base64
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "STREAM_MAX_ANALYSES", 1)
+    with client.websocket_connect("/api/ws/analyze") as ws:
+        ws.send_text("not json")
+        ws.send_json(["list"])
+        # "b" waits for the only slot; its cancel must still be read
+        for stream_id, seed in (("a", 40), ("b", 41)):
+            ws.send_json({"type": "analyze", "id": stream_id, "image": base64.b64encode(make_jpeg(seed=seed)).decode()})
+        ws.send_json({"type": "cancel", "id": "b"})
+        ws.send_json({"type": "bogus", "id": "z"})
+
+        messages = []
+        while not {("a", "result"), ("z", "error")} <= {(m["id"], m["type"]) for m in messages}:
+            messages.append(ws.receive_json())
+
+    errors = [m for m in messages if m["type"] == "error"]
+    assert [(m["id"], m["status"]) for m in errors] == [("", 400), ("", 400), ("z", 400)]
+    assert not any(m["id"] == "b" for m in messages)
+
+@pytest.mark.asyncio
+async def test_batch_disconnect_cancels_running_items(tmp_path, monkeypatch):
+    import asyncio
+    from app.api import batch
+    from app.services.ingest import IngestedUpload
+
+    started, cancelled = asyncio.Event(), asyncio.Event()
+
+    async def stuck_pipeline(*args, **kwargs):
+        started.set()
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    monkeypatch.setattr(batch, "run_pipeline", stuck_pipeline)
+    path = tmp_path / "slow.jpg"
+    path.write_bytes(make_jpeg(seed=14))
+    uploads = [
+        IngestedUpload("1", str(path), "slow.jpg", "image/jpeg", "jpeg", path.stat().st_size, ""),
+        IngestedUpload("2", str(tmp_path / "bad.jpg"), "bad.jpg", "image/jpeg", "", 0, "", error="File must be an image")
+    ]
+
+    lines = batch._stream_results(uploads, "ensemble", None)
+    assert b"bad.jpg" in await lines.__anext__()
+    await started.wait()
+    # The client goes away while slow.jpg is still being analyzed
+    await lines.aclose()
+    assert cancelled.is_set()
+    assert not path.exists()
+
+@pytest.mark.asyncio
+async def test_job_run_stops_when_its_lease_cannot_be_extended(monkeypatch):
+    import asyncio
+    from app.db.database import AsyncSessionLocal
+    from app.services import jobs
+
+    created = client.post("/api/jobs?layers=fast", files={"image": ("h.jpg", make_jpeg(seed=21), "image/jpeg")})
+    stopped = asyncio.Event()
+
+    async def hang(db, job):
+        try:
+            await asyncio.Event().wait()
+        finally:
+            stopped.set()
+
+    queue = jobs.JobQueue(hang, visibility_timeout=0.3)
+    async with AsyncSessionLocal() as db:
+        job = await queue.claim(db, created.json()["id"])
+
+        def unavailable():
+            raise OSError("database unavailable")
+
+        # Every heartbeat fails from here on
+        monkeypatch.setattr(jobs, "AsyncSessionLocal", unavailable)
+        assert await asyncio.wait_for(queue._run(db, job), 5) == "running"
+    assert stopped.is_set()
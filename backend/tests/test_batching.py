@@ -0,0 +1,53 @@
+import asyncio
+import pytest
+import torch
+from app.services.batching import MicroBatcher
+
+def make_batcher(**kwargs):
+    calls = []
+
+    def forward(batch):
+        calls.append(batch.shape[0])
+        # Echo the first pixel of each image as its "probability"
+        return batch[:, 0, 0, 0].tolist()
+
+    return MicroBatcher(forward, **kwargs), calls
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_forward():
+    batcher, calls = make_batcher(max_batch_size=8, max_wait_ms=50)
+    tensors = [torch.full((3, 4, 4), float(i)) for i in range(5)]
+
+    results = await asyncio.gather(*(batcher.submit(t) for t in tensors))
+
+    assert results == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert calls == [5]
+    assert batcher.stats()["avg_batch_size"] == 5
+    await batcher.close()
+
+@pytest.mark.asyncio
+async def test_batches_are_capped_at_max_size():
+    batcher, calls = make_batcher(max_batch_size=2, max_wait_ms=50)
+    tensors = [torch.full((3, 4, 4), float(i)) for i in range(5)]
+
+    results = await asyncio.gather(*(batcher.submit(t) for t in tensors))
+
+    assert results == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert calls == [2, 2, 1]
+    assert batcher.stats()["max_batch_seen"] == 2
+    await batcher.close()
+
+@pytest.mark.asyncio
+async def test_forward_errors_reach_every_caller():
+    def forward(batch):
+        raise RuntimeError("boom")
+
+    batcher = MicroBatcher(forward, max_batch_size=4, max_wait_ms=20)
+    results = await asyncio.gather(
+        batcher.submit(torch.zeros(3, 4, 4)),
+        batcher.submit(torch.zeros(3, 4, 4)),
+        return_exceptions=True
+    )
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    await batcher.close()
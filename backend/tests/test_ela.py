@@ -0,0 +1,33 @@
+import os
+import numpy as np
+import pytest
+from PIL import Image
+from app.services.ela import ELAEngine
+
+engine = ELAEngine()
+
+# Reference: the original ForensicAnalyzer._perform_ela, round-tripping through a temp file
+
+def reference(file_path, quality):
+    img = Image.open(file_path)
+    temp_path = file_path + "_temp.jpg"
+    img.save(temp_path, 'JPEG', quality=quality)
+    original = np.array(img.convert('RGB'), dtype=np.int16)
+    compressed = np.array(Image.open(temp_path).convert('RGB'), dtype=np.int16)
+    os.remove(temp_path)
+    return np.abs(original - compressed)
+
+@pytest.mark.parametrize("quality", [85, 95])
+def test_in_memory_ela_matches_file_round_trip(tmp_path, quality):
+    rng = np.random.default_rng(3)
+    y, x = np.mgrid[0:240, 0:320]
+    base = np.stack([x, y, (x + y) / 2], axis=2) * 0.6
+    path = str(tmp_path / "fixture.jpg")
+    Image.fromarray(np.clip(base + rng.normal(0, 12, base.shape) + 20, 0, 255).astype(np.uint8)).save(path, 'JPEG', quality=90)
+
+    rgb = np.asarray(Image.open(path).convert('RGB'))
+    diff = engine.difference(rgb, quality)
+
+    assert diff.dtype == np.uint8
+    np.testing.assert_array_equal(diff, reference(path, quality))
+    assert float(np.var(diff)) == float(np.var(reference(path, quality)))
@@ -0,0 +1,57 @@
+import asyncio
+import os
+import threading
+import time
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+from app.services.executor import AnalysisExecutor
+
+@pytest.mark.asyncio
+async def test_process_and_thread_kinds_run_work_off_the_loop():
+    processes = AnalysisExecutor("process", 1)
+    threads = AnalysisExecutor("thread", 1)
+    try:
+        assert await processes.run(os.getpid) != os.getpid()
+        worker = await threads.run(threading.current_thread)
+        assert worker is not threading.current_thread() and worker.name.startswith("analysis")
+        assert processes.stats()["completed"] == threads.stats()["completed"] == 1
+        assert processes.stats()["pending"] == threads.stats()["pending"] == 0
+    finally:
+        await processes.shutdown()
+        await threads.shutdown()
+
+    with pytest.raises(ValueError):
+        AnalysisExecutor("fiber")
+
+@pytest.mark.asyncio
+async def test_broken_process_pool_is_replaced():
+    executor = AnalysisExecutor("process", 1)
+    try:
+        first = await executor.run(os.getpid)
+
+        # A worker dying (OOM, segfault) fails its job, not the ones after it
+        with pytest.raises(BrokenProcessPool):
+            await executor.run(os._exit, 1)
+        assert executor.stats()["failed"] == 1
+
+        assert await executor.run(os.getpid) not in (first, os.getpid())
+        assert executor.stats()["completed"] == 2
+    finally:
+        await executor.shutdown()
+
+@pytest.mark.asyncio
+async def test_shutdown_cancels_queued_work_and_waits_for_running():
+    executor = AnalysisExecutor("thread", 1)
+    running = asyncio.create_task(executor.run(time.sleep, 0.3))
+    queued = asyncio.create_task(executor.run(time.sleep, 0))
+    await asyncio.sleep(0.05)
+
+    await executor.shutdown()
+
+    assert await running is None
+    with pytest.raises(asyncio.CancelledError):
+        await queued
+    # Idempotent, and the next run starts a fresh pool
+    await executor.shutdown()
+    assert await executor.run(sum, [1, 2]) == 3
+    await executor.shutdown()
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from app.mock_main import AdvancedForensicAnalyzer
+
+analyzer = AdvancedForensicAnalyzer()
+
+# Reference implementations: the original patch-by-patch loops
+
+def loop_noise_patterns(arr):
+    gray = np.mean(arr, axis=2)
+    patch_size = 8
+    h, w = gray.shape
+    variances = []
+    for i in range(0, h - patch_size, patch_size * 2):
+        for j in range(0, w - patch_size, patch_size * 2):
+            patch = gray[i:i+patch_size, j:j+patch_size]
+            if 40 < np.mean(patch) < 215:
+                variances.append(np.var(patch))
+    if len(variances) < 10:
+        return 0.5
+    variances = np.array(variances)
+    cv = np.std(variances) / (np.mean(variances) + 1)
+    return min(cv, 1.0)
+
+def loop_local_contrast(gray):
+    block_size = 16
+    h, w = gray.shape
+    contrasts = []
+    for i in range(0, h - block_size, block_size):
+        for j in range(0, w - block_size, block_size):
+            contrasts.append(np.std(gray[i:i+block_size, j:j+block_size]))
+    return np.mean(contrasts) if contrasts else 30
+
+def loop_texture_patches(arr):
+    h, w = arr.shape[:2]
+    patch_size = 32
+    gray = np.mean(arr, axis=2)
+    patch_means = []
+    patch_stds = []
+    for i in range(0, h - patch_size, patch_size):
+        for j in range(0, w - patch_size, patch_size):
+            patch = gray[i:i+patch_size, j:j+patch_size]
+            patch_means.append(np.mean(patch))
+            patch_stds.append(np.std(patch))
+    if len(patch_stds) < 4:
+        return {'similarity': 0.5, 'variance': 100}
+    std_of_stds = np.std(patch_stds)
+    mean_std = np.mean(patch_stds)
+    similarity = 1 - (std_of_stds / (mean_std + 1))
+    return {'similarity': max(0, min(similarity, 1)), 'variance': np.var(patch_means)}
+
+# Synthetic corpus: smooth, noisy, flat, periodic, odd-sized and tiny images
+
+def corpus():
+    rng = np.random.default_rng(42)
+    images = {}
+    for h, w in [(8, 8), (17, 33), (64, 64), (100, 257), (256, 256), (481, 640)]:
+        y, x = np.mgrid[0:h, 0:w]
+        images[f"gradient_{h}x{w}"] = np.stack([x * 255 / w, y * 255 / h, (x + y) * 127 / (h + w)], axis=2)
+        images[f"noise_{h}x{w}"] = rng.integers(0, 256, (h, w, 3))
+        images[f"photo_{h}x{w}"] = np.clip(images[f"gradient_{h}x{w}"] + rng.normal(0, 10, (h, w, 3)), 0, 255)
+        images[f"checker_{h}x{w}"] = np.repeat((((x // 5) + (y // 5)) % 2 * 200 + 30)[..., None], 3, axis=2)
+    images["flat_128x96"] = np.full((128, 96, 3), 128)
+    images["dark_128x128"] = np.full((128, 128, 3), 10)
+    return {name: img.astype(np.uint8).astype(np.float32) for name, img in images.items()}
+
+CORPUS = corpus()
+
+@pytest.mark.parametrize("name", sorted(CORPUS))
+def test_noise_patterns_match_loop(name):
+    arr = CORPUS[name]
+    assert analyzer._analyze_noise_patterns(np.mean(arr, axis=2)) == loop_noise_patterns(arr)
+
+@pytest.mark.parametrize("name", sorted(CORPUS))
+def test_local_contrast_matches_loop(name):
+    gray = np.mean(CORPUS[name], axis=2)
+    assert analyzer._compute_local_contrast(gray) == loop_local_contrast(gray)
+
+@pytest.mark.parametrize("name", sorted(CORPUS))
+def test_texture_patches_match_loop(name):
+    arr = CORPUS[name]
+    assert analyzer._analyze_texture_patches(np.mean(arr, axis=2)) == loop_texture_patches(arr)
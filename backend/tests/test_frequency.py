@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from app.services.frequency import FrequencyEngine
+
+engine = FrequencyEngine()
+
+# Reference: the original float64 full-spectrum center-crop analysis
+
+def reference(gray):
+    h, w = gray.shape
+    size = min(h, w, 256)
+    y0, x0 = (h - size) // 2, (w - size) // 2
+    crop = gray[y0:y0 + size, x0:x0 + size] * np.outer(np.hanning(size), np.hanning(size))
+    magnitude = np.log(np.abs(np.fft.fftshift(np.fft.fft2(crop))) + 1)
+    center = size // 2
+    y, x = np.ogrid[:size, :size]
+    dist = np.sqrt((x - center) ** 2 + (y - center) ** 2)
+    high_freq = np.sum(magnitude[dist > size * 0.35]) / (np.sum(magnitude) + 1)
+    flat = magnitude.ravel()[magnitude.ravel() > 0]
+    flatness = np.exp(np.mean(np.log(flat + 1e-10))) / (np.mean(flat) + 1e-10)
+    return high_freq, min(flatness, 1.0)
+
+@pytest.mark.parametrize("shape", [(64, 64), (101, 130), (256, 256), (481, 640)])
+def test_half_spectrum_matches_full_spectrum(shape):
+    rng = np.random.default_rng(7)
+    y, x = np.mgrid[0:shape[0], 0:shape[1]]
+    gray = np.clip(128 + 60 * np.sin(x / 3.0) + rng.normal(0, 20, shape), 0, 255).round()
+    result = engine.analyze(gray)
+    high_freq, flatness = reference(gray)
+    assert result["high_freq"][0] == pytest.approx(high_freq, rel=1e-4)
+    assert result["flatness"][0] == pytest.approx(flatness, rel=1e-4)
+
+def test_crops_are_batched_and_profiles_find_periodic_artifacts():
+    rng = np.random.default_rng(3)
+    gray = rng.normal(128, 5, (600, 800))
+    # A period-8 grid pattern confined to the bottom-right corner
+    y, x = np.mgrid[0:256, 0:256]
+    gray[-256:, -256:] += 40 * np.cos(2 * np.pi * x / 8)
+
+    crops, origins = engine.crops(gray, grid=3)
+    assert crops.shape == (9, 256, 256) and origins[0] == (0, 0) and origins[-1] == (344, 544)
+    batched = engine.analyze(gray, grid=3)
+    for i in range(len(origins)):
+        single = engine.summarize(engine.log_magnitude(crops[i:i + 1]))
+        assert batched["high_freq"][i] == pytest.approx(float(single["high_freq"][0]), rel=1e-5)
+
+    profiles = engine.radial_profile(crops)
+    assert profiles.shape == (9, 129)
+    # 256 / 8 cycles per crop: a spike at radius 32 in the corner crop only
+    assert profiles[-1, 32] > 100 * np.median(profiles[-1, 1:])
+    assert profiles[4, 32] < 2 * np.median(profiles[4, 1:])
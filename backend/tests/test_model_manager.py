@@ -0,0 +1,162 @@
+import pytest
+from app.services.detector import ImageDetector
+from app.services.model_manager import ModelManager
+
+@pytest.mark.asyncio
+async def test_background_loading_reports_per_model_state():
+    manager = ModelManager(ImageDetector({"tiny": "resnet18", "broken": "no_such_arch"}, pretrained=False))
+    assert manager.readiness()["state"] == "not_started"
+
+    task = manager.start_loading()
+    assert manager.readiness()["state"] == "loading"
+    await task
+
+    readiness = manager.readiness()
+    assert readiness["ready"]
+    assert readiness["models"]["tiny"]["state"] == "ready"
+    assert readiness["models"]["tiny"]["memory_bytes"] > 0
+    assert "warmup_seconds" in readiness["models"]["tiny"]
+    assert readiness["models"]["broken"]["state"] == "failed"
+    assert list(manager.detector.models) == ["tiny"]
+
+    await manager.cleanup()
+    assert manager.readiness()["state"] == "not_started"
+
+def test_exported_backends_match_eager(tmp_path):
+    import torch
+    from app.services.inference import (
+        artifact_path, create_eager, export_onnx, export_torchscript, load_backend, parity, quantize_torch_static
+    )
+
+    model = create_eager("resnet18", pretrained=False)
+    torch.save(model.state_dict(), artifact_path(str(tmp_path), "tiny", "eager"))
+    export_torchscript(model, artifact_path(str(tmp_path), "tiny", "torchscript"))
+    export_onnx(model, artifact_path(str(tmp_path), "tiny", "onnx"))
+    batches = [torch.randn(2, 3, 224, 224, generator=torch.Generator().manual_seed(0))]
+    quantize_torch_static(model, artifact_path(str(tmp_path), "tiny", "int8"), batches)
+
+    reference = load_backend("eager", "tiny", "resnet18", str(tmp_path), pretrained=False)
+    for kind in ("torchscript", "onnx", "int8"):
+        backend = load_backend(kind, "tiny", "resnet18", str(tmp_path), pretrained=False)
+        assert parity(reference, backend, batches)["max_abs"] < 0.02
+
+    # Loading a model leaves the process-wide torch thread budget alone
+    threads = torch.get_num_threads()
+    load_backend("torchscript", "tiny", "resnet18", str(tmp_path), pretrained=False, threads=threads + 1)
+    assert torch.get_num_threads() == threads
+
+    # The conv blocks themselves run as quantized kernels, not just the head
+    int8 = load_backend("int8", "tiny", "resnet18", str(tmp_path), pretrained=False)
+    assert "quantized::conv2d" in str(int8.module.graph)
+
+def test_inference_pool_matches_in_process(tmp_path):
+    import torch
+    from app.services.inference import artifact_path, create_eager, load_backend
+    from app.services.inference_pool import InferencePool
+
+    model = create_eager("resnet18", pretrained=False)
+    torch.save(model.state_dict(), artifact_path(str(tmp_path), "tiny", "eager"))
+    reference = load_backend("eager", "tiny", "resnet18", str(tmp_path), pretrained=False)
+    batch = torch.randn(3, 3, 224, 224, generator=torch.Generator().manual_seed(0))
+
+    pool = InferencePool({"tiny": "resnet18"}, "eager", str(tmp_path), pretrained=False, workers=1, threads=1, warmup=False)
+    try:
+        statuses = pool.start()
+        assert statuses["tiny"]["state"] == "ready"
+        assert torch.allclose(pool.infer("tiny", batch), reference(batch), atol=1e-5)
+        assert pool.stats()["completed"] == 1 and pool.stats()["in_flight"] == 0
+    finally:
+        pool.close()
+
+@pytest.mark.asyncio
+async def test_cascade_exits_early_on_confident_cheap_model():
+    import io
+    from PIL import Image
+    from app.services.image_context import ImageContext
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), (120, 30, 200)).save(buffer, "JPEG")
+    context = ImageContext(buffer.getvalue())
+
+    detector = ImageDetector({"expensive": "resnet50", "cheap": "resnet18"}, pretrained=False, workers=0, thresholds={"cheap": 0.0})
+    await detector.load_models()
+    try:
+        # Ordered by latency measured at load, not by config order
+        assert detector.cascade_order() == ["cheap", "expensive"]
+        result = await detector.detect(context, "ensemble")
+        assert result["details"]["models_run"] == ["cheap"]
+        assert result["details"]["early_exit"]
+        assert result["details"]["model_seconds"]["cheap"] > 0
+
+        # Unreachable margin: escalate through every model
+        detector.thresholds = {"cheap": 1.0}
+        result = await detector.detect(context, "ensemble")
+        assert result["details"]["models_run"] == ["cheap", "expensive"]
+        assert not result["details"]["early_exit"]
+
+        # A benchmark profile for every model takes precedence
+        detector.latency_profile = {"resnet18": {"eager": 90.0}, "resnet50": {"eager": 40.0}}
+        assert detector.cascade_order() == ["expensive", "cheap"]
+    finally:
+        await detector.close()
+
+@pytest.mark.asyncio
+async def test_default_cascade_answers_confident_images_without_b7():
+    import io
+    from PIL import Image
+    from app.core.config import settings
+    from app.services.image_context import ImageContext
+
+    assert "efficientnet_b0" in settings.CASCADE_THRESHOLDS
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), (20, 160, 90)).save(buffer, "JPEG")
+    context = ImageContext(buffer.getvalue())
+
+    # The shipped models and thresholds, minus hub weights; a margin of 0 stands in
+    # for a confident B0 so the test does not depend on the untrained head
+    detector = ImageDetector(pretrained=False, workers=0, thresholds={**settings.CASCADE_THRESHOLDS, "efficientnet_b0": 0.0})
+    await detector.load_models()
+    try:
+        assert detector.cascade_order() == ["efficientnet_b0", "efficientnet"]
+        result = await detector.detect(context, "ensemble")
+        assert result["details"]["models_run"] == ["efficientnet_b0"]
+        assert result["details"]["early_exit"]
+    finally:
+        await detector.close()
+
+def test_inference_pool_replaces_dead_worker_and_fails_only_its_requests(tmp_path):
+    import time
+    import torch
+    from app.services.inference import load_backend
+    from app.services.inference_pool import InferencePool
+
+    # No exported weights: every worker must still build the same seeded head
+    reference = load_backend("eager", "tiny", "resnet18", str(tmp_path), pretrained=False)
+    batch = torch.randn(1, 3, 224, 224, generator=torch.Generator().manual_seed(0))
+    expected = reference(batch)
+
+    pool = InferencePool({"tiny": "resnet18"}, "eager", str(tmp_path), pretrained=False, workers=2, threads=1, warmup=False, timeout=30)
+    try:
+        pool.start()
+        for _ in range(4):
+            assert torch.allclose(pool.infer("tiny", batch), expected, atol=1e-5)
+
+        pool._processes[0].kill()
+        pool._processes[0].join()
+        # Traffic keeps flowing; a request that reaches the dead worker fails
+        # with the worker's death, not with a timeout
+        failures = 0
+        deadline = time.monotonic() + 120
+        while pool.stats()["restarts"] == 0 and time.monotonic() < deadline:
+            try:
+                assert torch.allclose(pool.infer("tiny", batch), expected, atol=1e-5)
+            except RuntimeError as e:
+                assert "worker 0 died" in str(e)
+                failures += 1
+        assert pool.stats()["restarts"] == 1
+        assert pool._processes[0].is_alive()
+        assert failures <= 1
+        assert torch.allclose(pool.infer("tiny", batch), expected, atol=1e-5)
+    finally:
+        pool.close()
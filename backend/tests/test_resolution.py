@@ -0,0 +1,63 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.services.image_context import ImageContext
+from app.services.resolution import ImageTooLarge
+
+
+def encode(size, fmt):
+    rng = np.random.default_rng(0)
+    buffer = io.BytesIO()
+    Image.fromarray(rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8)).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("fmt", ["JPEG", "PNG"])
+def test_reduced_raster_fits_budget_and_full_res_is_untouched(fmt):
+    context = ImageContext(encode((2000, 1500), fmt))
+
+    reduced = context.rgb_within(1.0)
+    assert reduced.shape[0] * reduced.shape[1] <= 1_000_000
+    assert context.gray_within(1.0).shape == reduced.shape[:2]
+    assert context.rgb.shape == (1500, 2000, 3)
+    # Images already within budget share the full decode
+    assert context.rgb_within(5.0) is context.rgb
+
+
+def test_pixel_limit_rejects_from_header():
+    context = ImageContext(encode((1200, 1000), "JPEG"), max_pixels=1_000_000)
+
+    with pytest.raises(ImageTooLarge):
+        context.dimensions
+
+
+@pytest.mark.asyncio
+async def test_process_executor_decodes_each_raster_once():
+    from app.api.analyze import decode_rasters, forensics
+    from app.core.config import settings
+    from app.services.detector import ImageDetector
+    from app.services.executor import AnalysisExecutor
+    from app.services.layers import ALL_LAYERS
+
+    context = ImageContext(encode((2000, 1500), "JPEG"))
+    budget = settings.LAYER_MAX_MEGAPIXELS.get("semantic_analysis")
+    executor = AnalysisExecutor("process", 1)
+    try:
+        # As run_pipeline does before submitting the forensic job
+        context.exif
+        decode_rasters(context, ALL_LAYERS)
+        decodes = context.decodes()
+        timings = {}
+        await forensics.analyze_all_layers(context, executor, timings, ALL_LAYERS)
+    finally:
+        await executor.shutdown()
+
+    # The worker's pickled copy arrived with every raster it reads
+    assert timings["decode"] == 0.0
+    # Detector preprocessing and thumbnails reuse the arrays decoded up front
+    context.tensor(ImageDetector(model_specs={}).transform, budget)
+    context.rgb_within(budget)
+    assert context.decodes() == decodes
@@ -0,0 +1,45 @@
+import numpy as np
+import orjson
+from datetime import datetime, timezone
+from app.core.config import settings
+from app.core.responses import json_response
+from app.schemas.analysis import LayerResult
+
+def test_fast_json_handles_numpy_like_to_python(monkeypatch):
+    layer = {
+        "name": "Pixel Physics",
+        "score": np.float64(42.5),
+        "confidence": np.float32(0.5),
+        "findings": [],
+        "details": {
+            "count": np.int64(3),
+            "flag": np.bool_(True),
+            "bad": np.float32("nan"),
+            "profile": np.array([1.0, np.inf]),
+            "at": datetime(2026, 1, 1, tzinfo=timezone.utc)
+        }
+    }
+    expected = {
+        "name": "Pixel Physics",
+        "score": 42.5,
+        "confidence": 0.5,
+        "findings": [],
+        "details": {"count": 3, "flag": True, "bad": 0.0, "profile": [1.0, 0.0], "at": "2026-01-01T00:00:00Z"}
+    }
+
+    assert orjson.loads(json_response(layer, LayerResult).body) == expected
+
+    # Trusted data skips the model entirely
+    monkeypatch.setattr(settings, "VALIDATE_RESPONSES", False)
+    assert orjson.loads(json_response({**layer, "extra": 1}, LayerResult).body) == {**expected, "extra": 1}
+
+def test_non_finite_floats_become_zero_not_null():
+    from app.core.responses import dumps
+
+    content = {"score": float("nan"), "confidence": np.float32("inf"), "layers": [{"score": float("-inf")}], "note": None}
+    assert orjson.loads(dumps(content)) == {"score": 0.0, "confidence": 0.0, "layers": [{"score": 0.0}], "note": None}
+
+    # Through the validated path too: pydantic accepts NaN for a float field
+    layer = {"name": "Pixel Physics", "score": float("nan"), "confidence": np.float64("nan"), "findings": [], "details": {}}
+    body = orjson.loads(json_response(layer, LayerResult).body)
+    assert (body["score"], body["confidence"]) == (0.0, 0.0)
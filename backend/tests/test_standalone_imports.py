@@ -0,0 +1,23 @@
+import os
+import subprocess
+import sys
+
+# The launchers run the mock server as backend.app.mock_main from the repo root
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def import_from_repo_root(module, tmp_path):
+    env = {k: v for k, v in os.environ.items() if k != "PYTHONPATH"}
+    return subprocess.run(
+        [sys.executable, "-c", f"import sys; sys.path.insert(0, {REPO_ROOT!r}); import {module}"],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=120
+    )
+
+def test_responses_import_without_app_on_path(tmp_path):
+    result = import_from_repo_root("backend.app.core.responses", tmp_path)
+    assert result.returncode == 0, result.stderr
+
+def test_mock_main_imports_from_repo_root(tmp_path):
+    result = import_from_repo_root("backend.app.mock_main", tmp_path)
+    assert result.returncode == 0, result.stderr
+    # Executor workers import it too; only the server's lifespan touches disk
+    assert os.listdir(tmp_path) == []
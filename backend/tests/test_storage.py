@@ -0,0 +1,68 @@
+import hashlib
+import os
+import pytest
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import update
+from app.db.database import AsyncSessionLocal, Base, engine
+from app.db.models import StoredFile
+from app.services.storage import UploadStore
+
+Base.metadata.create_all(bind=engine)
+
+def make_upload():
+    data = b"\xff\xd8\xff" + os.urandom(2048)
+    return data, hashlib.sha256(data).hexdigest()
+
+async def backdate(content_hash, **age):
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(StoredFile)
+            .where(StoredFile.content_hash == content_hash)
+            .values(last_used_at=datetime.now(timezone.utc) - timedelta(**age))
+        )
+        await db.commit()
+
+@pytest.mark.asyncio
+async def test_uploads_are_stored_once_and_swept_by_reference_and_age(tmp_path, monkeypatch):
+    store = UploadStore(str(tmp_path), max_age=86400, orphan_grace=3600, sweep_interval=0)
+
+    kept, kept_hash = make_upload()
+    path = await store.put_bytes(kept, kept_hash)
+    assert await store.put_bytes(kept, kept_hash) == path
+    assert os.path.relpath(path, tmp_path) == os.path.join(kept_hash[:2], kept_hash[2:4], f"{kept_hash}.jpg")
+    assert store.stats()["deduplicated"] == 1
+
+    orphan, orphan_hash = make_upload()
+    orphan_path = await store.put_bytes(orphan, orphan_hash)
+    stale, stale_hash = make_upload()
+    stale_path = await store.put_bytes(stale, stale_hash)
+    async with AsyncSessionLocal() as db:
+        for content_hash in (kept_hash, kept_hash, stale_hash):
+            await store.add_reference(db, content_hash)
+        await db.commit()
+
+    # Unreferenced past the grace period, and referenced but unused past max_age
+    await backdate(orphan_hash, hours=2)
+    await backdate(stale_hash, days=2)
+    # Files being evicted are set aside where they are never served
+    renames = []
+    replace = os.replace
+    monkeypatch.setattr(os, "replace", lambda src, dst: renames.append(dst) or replace(src, dst))
+    reclaimed = await store.sweep()
+    monkeypatch.undo()
+    assert renames and all(os.path.dirname(dst) == store.tmp_dir for dst in renames)
+
+    assert reclaimed == len(orphan) + len(stale)
+    assert os.path.exists(path) and not os.path.exists(orphan_path) and not os.path.exists(stale_path)
+    assert store.stats()["reclaimed_bytes"] == reclaimed
+    async with AsyncSessionLocal() as db:
+        assert await db.get(StoredFile, orphan_hash) is None
+        evicted = await db.get(StoredFile, stale_hash)
+        assert evicted.evicted_at is not None and evicted.ref_count == 1
+        assert (await db.get(StoredFile, kept_hash)).ref_count == 2
+
+    # The next identical upload brings an evicted file back
+    assert await store.put_bytes(stale, stale_hash) == stale_path
+    async with AsyncSessionLocal() as db:
+        assert (await db.get(StoredFile, stale_hash)).evicted_at is None
+    assert os.path.exists(stale_path)